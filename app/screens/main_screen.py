@@ -433,19 +433,19 @@ class MainScreen(Screen):
         # Directly update the note description or append, bypassing process_command chat flow
         nlp_service = self.app_instance.nlp_service
         # Find the note by title
-        note = next((n for n in nlp_service.notes if n.get('title') == note_title), None)
+        note = nlp_service.find_note_by_title(note_title)
         if not note:
             self.add_chat_message('agent', f"Note '{note_title}' not found.")
             return
         if update_type == 'replace_description':
-            note['description'] = new_text
+            nlp_service.update_note(note, {'description': new_text})
         elif update_type == 'append_description':
             current_desc = note.get('description', '')
             if current_desc:
-                note['description'] = current_desc + '\n' + new_text
+                nlp_service.update_note(note, {'description': current_desc + '\n' + new_text})
             else:
-                note['description'] = new_text
-        nlp_service._save_notes()
+                nlp_service.update_note(note, {'description': new_text})
+        nlp_service._save_notes(changed=[note])
         lang = self.get_language()
         if lang == 'he-IL':
             msg = f"התיאור עודכן לרשומה '{note_title}'"
@@ -706,9 +706,7 @@ class MainScreen(Screen):
                 msg = WELCOME_MESSAGE_HE if lang == 'he-IL' else WELCOME_MESSAGE_EN
                 self.show_welcome_popup(msg)
             self.welcome_shown = True
-        # Load notes from NLPService
-        self.app_instance.nlp_service.notes, self.app_instance.nlp_service.last_note_id = self.app_instance.nlp_service._load_notes_and_last_id()
-        
+        # NLPService already holds the notes; reloading them would rebuild every index and drop undo history
         # Refresh graph and notes display
         self.refresh_notes_display()
         
@@ -811,8 +809,19 @@ class MainScreen(Screen):
             fixed_command,
             language=lang
         )
+        self.handle_nlp_response(response)
+
+    def handle_nlp_response(self, response):
+        """Show an NLPService result: chat message, graph, notes list and microphone state."""
         print(f"[DEBUG] NLP Response: {response}")
-        
+        llm_future = response.get("llm_future")
+        if llm_future is not None:
+            # The rules found nothing; the model's answer arrives on a worker thread
+            text, lang = response.get("query_text"), self.get_language()
+            llm_future.add_done_callback(
+                lambda future: Clock.schedule_once(lambda dt: self.on_llm_selection(future, text, lang))
+            )
+
         # Add agent's response to chat
         if response.get("response"):
             self.add_chat_message('agent', response["response"], requires_confirmation=response.get("requires_confirmation", False))
@@ -820,32 +829,12 @@ class MainScreen(Screen):
         # Only update visualization if a search was performed and found_notes is present
         found_notes_data = response.get("found_notes") or response.get("matches")
         if found_notes_data:
-            all_notes = self.app_instance.nlp_service.notes
-            relations = self.app_instance.nlp_service.get_relations()
-            all_notes_by_id = {note['id']: note for note in all_notes}
-
-            found_ids = {note['id'] for note in found_notes_data}
-            display_ids = set(found_ids)
-
-            # Add parents and children (only direct)
-            for note_id in list(found_ids):
-                note = all_notes_by_id.get(note_id)
-                if note:
-                    parent_id = note.get('parent_id')
-                    if parent_id and parent_id in all_notes_by_id:
-                        display_ids.add(parent_id)
-                    children = note.get('children', [])
-                    for child_id in children:
-                        if child_id in all_notes_by_id:
-                            display_ids.add(child_id)
-
-            # Only show notes that are in display_ids
-            notes_to_display = [note for note in all_notes if note['id'] in display_ids]
-            # Only show relations between displayed notes
-            filtered_relations = [
-                rel for rel in relations
-                if rel['source'] in display_ids and rel['target'] in display_ids
-            ]
+            # The matches with their direct parents and children
+            subgraph = self.app_instance.nlp_service.subgraph(
+                [note['id'] for note in found_notes_data], hops=1, include=('parent', 'children')
+            )
+            notes_to_display, filtered_relations = subgraph['notes'], subgraph['relations']
+            display_ids = {note['id'] for note in notes_to_display}
             self.graph_widget.set_data(notes_to_display, filtered_relations)
             print(f"Found notes: {found_notes_data}")
             print(f"Display IDs: {display_ids}")
@@ -874,6 +863,14 @@ class MainScreen(Screen):
         else:
             print("[DEBUG] Confirmation required. Keeping microphone open.")
 
+    def on_llm_selection(self, future, text, lang):
+        """Apply the model's tool choice for an utterance the rules could not handle."""
+        if future.cancelled() or future.exception() is not None:
+            print(f"[DEBUG] Model tool selection dropped: {None if future.cancelled() else future.exception()}")
+            return
+        response = self.app_instance.nlp_service.apply_tool_selection(future.result(), text, lang)
+        self.handle_nlp_response(response)
+
     def create_sub_note(self, title):
         """Create a sub-note under the current context."""
         if not self.current_note_context:
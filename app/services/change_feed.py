@@ -0,0 +1,74 @@
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+class ChangeFeed:
+    """Append-only feed of note events (created/updated/done/deleted).
+
+    Unlike the journal, which is folded into the snapshot and dropped, the feed
+    keeps events until a consumer has read them. Readers remember the byte
+    offset they stopped at, so reading the changes since then costs time in
+    proportion to those changes only. Events are buffered by ``record`` and
+    written by ``commit``, which NLPService calls whenever it saves notes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._pending: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, op: str, note: Dict, when: Optional[str] = None):
+        event = {
+            'ts': when or datetime.now().isoformat(timespec='seconds'),
+            'op': op,
+            'id': note.get('id'),
+            'title': note.get('title'),
+            'parent_id': note.get('parent_id')
+        }
+        with self._lock:
+            self._pending.append(event)
+
+    def commit(self):
+        with self._lock:
+            if not self._pending:
+                return
+            events, self._pending = self._pending, []
+            data = ''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in events).encode('utf-8')
+            try:
+                with open(self.path, 'ab') as f:
+                    f.write(data)
+            except OSError as e:
+                print(f"[DEBUG] ChangeFeed write failed: {e}")
+
+    def size(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def read_from(self, offset: int) -> Tuple[List[Dict], int]:
+        """Events written after ``offset`` and the offset to continue from."""
+        self.commit()
+        with self._lock:
+            if offset > self.size():
+                offset = 0  # the feed was truncated after this offset was saved
+            events = []
+            if not os.path.exists(self.path):
+                return events, offset
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # partially written tail; picked up next time
+                    offset += len(line)
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        continue
+            return events, offset
+
+    def truncate(self):
+        """Drop every event; only safe once all readers are at the end."""
+        with self._lock:
+            if os.path.exists(self.path):
+                open(self.path, 'wb').close()
@@ -16,7 +16,14 @@ class ConfigService:
             'voice_energy_threshold': 100,
             'theme': 'default',
             'gemini_api_key': None,  # Will be populated from environment if available
-            'show_welcome_message': True
+            'show_welcome_message': True,
+            'storage_backend': 'json',  # 'json' (notes.json + journal) or 'sqlite'
+            'fsync_interval': 1.0,  # seconds between fsyncs of queued note writes
+            'substring_search': True,  # trigram index for finding notes by title fragments
+            'search_mode': 'match',  # 'match', 'ranked' (BM25, best match first) or 'semantic' (n-gram vectors)
+            'llm_context_budget': 2000,  # max characters of note context sent with a model request
+            'digest_time': '21:00',  # daily digest time (HH:MM), None to turn it off
+            'note_history': False  # keep past versions of the notebook (notes.history/)
         }
         self.config = self.load_config()
     
@@ -0,0 +1,702 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Set
+
+from app.services.intent_matcher import (
+    CREATE_HE_RE, DELETE_HE_RE, SUMMARIZE_HE_RE, SUMMARIZE_EN_RE, DEPENDS_HE_RE, DEPENDS_EN_RE,
+    TAG_HE_RE, TAG_EN_RE, TAG_SPLIT_RE, DONE_HE_RE, DONE_EN_RE, MUTATING_INTENT_WORDS, COMMAND_START_RES
+)
+from app.services.done_index import period_range
+from app.services.dependency_graph import DependencyCycleError
+from app.services.utterance_splitter import parse_multi_create
+
+# Spoken names of the periods period_range() recognizes (Hebrew, English)
+PERIOD_NAMES = {
+    'today': ("היום", "today"),
+    'yesterday': ("אתמול", "yesterday"),
+    'this_week': ("השבוע", "this week"),
+    'last_week': ("בשבוע שעבר", "last week"),
+    'this_month': ("החודש", "this month"),
+    'last_month': ("בחודש שעבר", "last month"),
+    'last_days': ("בימים האחרונים", "in the last days"),
+}
+
+
+class Turn:
+    """One user utterance, normalized once and shared by the state handlers."""
+
+    def __init__(self, text: str, language: str, normalized_text: str, intents: Set[str], escalate: bool = True):
+        self.text = text
+        self.language = language
+        self.normalized_text = normalized_text
+        self.intents = intents
+        self.is_hebrew = language == 'he-IL'
+        self.escalate = escalate  # False: never ask the model (bulk input, see process_commands)
+
+
+class ConversationState(ABC):
+    """Base class for a conversation state handler.
+
+    NLPService keeps one handler per state in a dispatch table and hands each
+    turn to the handler for the current ``conversation_state``. Within a
+    state, ``INTENT_HANDLERS`` maps intents (without their ``_he``/``_en``
+    suffix) to handler methods, tried in order; see ``is_command`` for the
+    triggers that can also be part of a search.
+    """
+
+    INTENT_HANDLERS = (('undo', 'undo'), ('redo', 'redo'))
+
+    @abstractmethod
+    def handle(self, nlp, turn: Turn) -> Dict:
+        """Answer one turn in this state."""
+
+    def handle_intent(self, nlp, turn: Turn, current_note: Optional[Dict] = None) -> Optional[Dict]:
+        """Run the first handler whose intent is in the turn; None if there is none."""
+        suffix = '_he' if turn.is_hebrew else '_en'
+        for intent, handler in self.INTENT_HANDLERS:
+            if intent + suffix in turn.intents and self.is_command(nlp, turn, intent + suffix):
+                return getattr(self, handler)(nlp, turn, current_note)
+        return None
+
+    @staticmethod
+    def is_command(nlp, turn: Turn, intent: str) -> bool:
+        """False when the trigger is part of a search: a note's exact title, or a find
+        request the command does not start ("find summary of the meeting")."""
+        start_re = COMMAND_START_RES.get(intent)
+        if start_re is None:
+            return True
+        if nlp.find_note_by_spoken_title(turn.normalized_text.strip(" ?.")):
+            return False
+        suffix = '_he' if turn.is_hebrew else '_en'
+        return bool(start_re.match(turn.normalized_text)) or 'find' + suffix not in turn.intents
+
+    @staticmethod
+    def reply(nlp, turn: Turn, result: Dict) -> Dict:
+        nlp.record_history('agent', result['response'], turn.language)
+        return result
+
+    def redo(self, nlp, turn: Turn, current_note: Optional[Dict] = None) -> Dict:
+        return self.undo(nlp, turn, redo=True)
+
+    def undo(self, nlp, turn: Turn, current_note: Optional[Dict] = None, redo: bool = False) -> Dict:
+        """Revert (or re-apply) the last change and say what it was."""
+        nlp.conversation_state = None  # the focused note may be the one that changed
+        deltas = nlp.redo() if redo else nlp.undo()
+        operation = "redo" if redo else "undo"
+        if deltas is None:
+            response = (
+                ("אין פעולה לביצוע מחדש." if redo else "אין פעולה לביטול.") if turn.is_hebrew
+                else ("Nothing to redo." if redo else "Nothing to undo.")
+            )
+            return self.reply(nlp, turn, {"operation": operation, "response": response, "requires_confirmation": False})
+        titles = {'add': [], 'update': [], 'remove': []}
+        for delta in deltas:
+            note = delta.get("note") or nlp.get_note_by_id(delta["id"]) or {}
+            title = note.get("title") or delta.get("before", {}).get("title", "")
+            if title not in titles[delta["op"]]:
+                titles[delta["op"]].append(title)
+        if redo:
+            labels = {'add': ("נוצרה מחדש", "Created again"), 'update': ("עודכנה מחדש", "Updated again"),
+                      'remove': ("נמחקה מחדש", "Deleted again")}
+        else:
+            labels = {'add': ("בוטלה יצירת", "Removed the new note"), 'update': ("בוטל עדכון", "Reverted the update to"),
+                      'remove': ("שוחזרה", "Restored")}
+        parts = [f"{labels[op][0 if turn.is_hebrew else 1]} '{', '.join(names)}'"
+                 for op, names in titles.items() if names]
+        return self.reply(nlp, turn, {
+            "operation": operation,
+            "response": "; ".join(parts),
+            "notes_updated": True,
+            "requires_confirmation": False
+        })
+
+
+class IdleState(ConversationState):
+    """No pending operation: the commands in INTENT_HANDLERS, a list of sub-notes, create (Hebrew triggers) or find."""
+
+    # Handlers take the note in focus (None when idle). "add tag" / "הוסף תגית" also
+    # contain the create triggers "add" / "הוסף", so the table runs before them.
+    INTENT_HANDLERS = ConversationState.INTENT_HANDLERS + (
+        ('digest', 'digest'),
+        ('next', 'next_tasks'),
+        ('depends', 'add_dependency'),
+        ('tag', 'add_tags'),
+        ('finished', 'finished'),
+        ('progress', 'progress'),
+        ('done', 'mark_done'),
+        ('summarize', 'summarize'),
+    )
+
+    def handle(self, nlp, turn: Turn) -> Dict:
+        result = self.handle_intent(nlp, turn)
+        if result:
+            return result
+        multi = self.multi_create(nlp, turn)
+        if multi:
+            return multi
+        if turn.is_hebrew and 'create_he' in turn.intents:
+            return self.create(nlp, turn)
+        return self.find(nlp, turn)
+
+    def multi_create(self, nlp, turn: Turn, current_note: Optional[Dict] = None,
+                     titles: Optional[List[str]] = None) -> Optional[Dict]:
+        """One confirmation for "add X, Y and Z to <note>".
+
+        With ``titles`` given the utterance is not parsed; they go under ``current_note``.
+        """
+        if titles:
+            parent = current_note
+        else:
+            plan = parse_multi_create(turn.normalized_text, turn.is_hebrew, nlp.find_note_by_spoken_title, current_note)
+            if not plan:
+                return None
+            titles, parent = plan['titles'], plan['parent']
+        listed = ", ".join(titles)
+        if len(titles) == 1:
+            response = (
+                f"האם להוסיף תת-רשומה בשם '{listed}' תחת '{parent['title']}'?" if turn.is_hebrew
+                else f"Do you want me to add a sub-note called '{listed}' under '{parent['title']}'?"
+            )
+        else:
+            response = (
+                f"האם להוסיף {len(titles)} תת-רשומות ({listed}) תחת '{parent['title']}'?" if turn.is_hebrew
+                else f"Do you want me to add {len(titles)} sub-notes ({listed}) under '{parent['title']}'?"
+            )
+        nlp.conversation_state = {
+            'operation': 'create',
+            'pending_note': {
+                'titles': titles,
+                'parent_id': parent['id'],
+                'nlp_service': nlp,
+                'original_text': turn.text,
+                'requires_confirmation': True
+            },
+            'confirm_action': 'create',
+            'pending_title': listed
+        }
+        return self.reply(nlp, turn, {"operation": "create_confirm", "response": response, "requires_confirmation": True})
+
+    def create(self, nlp, turn: Turn) -> Dict:
+        is_hebrew = turn.is_hebrew
+        # Use regex to remove trigger + optional 'רשומה חדשה' at the start
+        match = CREATE_HE_RE.match(turn.normalized_text)
+        title = match.group(1).strip() if match and match.group(1) else ''
+        if not title:
+            title = "ללא שם"  # fallback: Untitled
+        return self.ask_create(nlp, turn, title)
+
+    def digest(self, nlp, turn: Turn, current_note: Optional[Dict] = None) -> Dict:
+        """Read out the cached daily digest (built now if there is none yet)."""
+        digest = nlp.digests.digest or nlp.digests.build()
+        return self.reply(nlp, turn, {
+            "operation": "digest",
+            "response": nlp.digests.describe(turn.is_hebrew, digest),
+            "digest": digest,
+            "requires_confirmation": False
+        })
+
+    def resolve_note(self, nlp, turn: Turn, title: str) -> Optional[Dict]:
+        """The note a spoken title refers to: exact title first, else a single search match."""
+        note = nlp.find_note_by_spoken_title(title)
+        if note is None:
+            matches = nlp.tools['find'].run({'query': title, 'language': turn.language, 'nlp_service': nlp})['matches']
+            note = matches[0] if len(matches) == 1 else None
+        return note
+
+    def next_tasks(self, nlp, turn: Turn, current_note: Optional[Dict] = None) -> Dict:
+        """"What can I do next": open tasks with no unfinished dependencies.
+
+        A task list in focus (a note with children) narrows the answer to its subtree.
+        """
+        within = current_note if current_note and current_note.get('children') else None
+        notes = nlp.next_tasks(within=within)
+        titles = ", ".join(n['title'] for n in notes)
+        if turn.is_hebrew:
+            response = f"אפשר להמשיך עם: {titles}" if notes else "אין משימות פתוחות שאפשר להתחיל"
+        else:
+            response = f"You can do next: {titles}" if notes else "There are no open tasks ready to start"
+        return self.reply(nlp, turn, {
+            "operation": "next_tasks", "response": response, "matches": notes, "requires_confirmation": False
+        })
+
+    def add_dependency(self, nlp, turn: Turn, current_note: Optional[Dict] = None) -> Dict:
+        """"<note> depends on <other note>", or "depends on <other note>" for the note in focus."""
+        match = (DEPENDS_HE_RE if turn.is_hebrew else DEPENDS_EN_RE).match(turn.normalized_text)
+        note_title, prerequisite_title = (match.group(1), match.group(2)) if match else (None, None)
+        note = self.resolve_note(nlp, turn, note_title.strip()) if note_title else current_note
+        prerequisite = self.resolve_note(nlp, turn, prerequisite_title.strip(" ?.")) if prerequisite_title else None
+        if note is None or prerequisite is None:
+            response = "לא מצאתי את הרשומות" if turn.is_hebrew else "I couldn't find both notes"
+            return self.reply(nlp, turn, {"operation": "depends", "response": response, "requires_confirmation": False})
+        try:
+            nlp.add_dependency(note, prerequisite)
+        except DependencyCycleError:
+            response = (
+                f"'{prerequisite['title']}' כבר תלויה ב-'{note['title']}', זה ייצור מעגל"
+                if turn.is_hebrew
+                else f"'{prerequisite['title']}' already depends on '{note['title']}'; that would make a cycle"
+            )
+            return self.reply(nlp, turn, {"operation": "depends", "response": response, "requires_confirmation": False})
+        nlp.conversation_state = {'current_note': note}
+        response = (
+            f"'{note['title']}' תלויה עכשיו ב-'{prerequisite['title']}'" if turn.is_hebrew
+            else f"'{note['title']}' now depends on '{prerequisite['title']}'"
+        )
+        return self.reply(nlp, turn, {
+            "operation": "depends", "response": response, "notes_updated": True, "requires_confirmation": False
+        })
+
+    def add_tags(self, nlp, turn: Turn, current_note: Optional[Dict] = None) -> Dict:
+        """"add tag urgent" for the note in focus, or "add tag urgent to note shopping list"."""
+        match = (TAG_HE_RE if turn.is_hebrew else TAG_EN_RE).match(turn.normalized_text)
+        if not match:
+            return self.find(nlp, turn)
+        tags = [tag.strip(" ?.") for tag in TAG_SPLIT_RE.split(match.group(1)) if tag.strip(" ?.")]
+        note = self.resolve_note(nlp, turn, match.group(2).strip(" ?.")) if match.group(2) else current_note
+        if note is None or not tags:
+            response = (
+                "לאיזו רשומה להוסיף את התגית? קודם תמצא רשומה" if turn.is_hebrew
+                else "Which note should I tag? Find a note first"
+            )
+            return self.reply(nlp, turn, {"operation": "tag", "response": response, "requires_confirmation": False})
+        added = nlp.add_tags(note, tags)
+        nlp.conversation_state = {'current_note': note}
+        if turn.is_hebrew:
+            response = (f"נוספו תגיות ל-'{note['title']}': {', '.join(added)}" if added
+                        else f"ל-'{note['title']}' כבר יש את התגיות האלה")
+        else:
+            response = (f"Tagged '{note['title']}' with {', '.join(added)}" if added
+                        else f"'{note['title']}' already has those tags")
+        return self.reply(nlp, turn, {
+            "operation": "tag", "response": response, "notes_updated": bool(added), "requires_confirmation": False
+        })
+
+    def mark_done(self, nlp, turn: Turn, current_note: Optional[Dict] = None) -> Dict:
+        """"mark as done" for the note in focus, or "mark <note> as done"."""
+        match = (DONE_HE_RE if turn.is_hebrew else DONE_EN_RE).match(turn.normalized_text)
+        title = (match.group(1) or '').strip(" ?.") if match else ''
+        if title.lower() in ('it', 'this', 'this note', 'זה', 'זאת', 'הרשומה'):
+            title = ''
+        note = self.resolve_note(nlp, turn, title) if title else current_note
+        if note is None:
+            response = "איזו רשומה לסמן כבוצעה?" if turn.is_hebrew else "Which note should I mark as done?"
+            return self.reply(nlp, turn, {"operation": "done", "response": response, "requires_confirmation": False})
+        nlp.mark_done(note)
+        nlp.conversation_state = {'current_note': note}
+        response = (
+            f"'{note['title']}' סומנה כבוצעה" if turn.is_hebrew else f"Marked '{note['title']}' as done"
+        )
+        return self.reply(nlp, turn, {
+            "operation": "done", "response": response, "notes_updated": True, "requires_confirmation": False
+        })
+
+    def finished(self, nlp, turn: Turn, current_note: Optional[Dict] = None) -> Dict:
+        """"What did I finish last week": notes done in the named period, from the done_date index."""
+        start, end, period = period_range(turn.normalized_text)
+        notes = nlp.done_notes(start, end)
+        titles = ", ".join(n['title'] for n in notes[:10]) + (f" (+{len(notes) - 10})" if len(notes) > 10 else "")
+        period_name = PERIOD_NAMES[period][0 if turn.is_hebrew else 1]
+        if turn.is_hebrew:
+            response = f"סיימת {len(notes)} משימות {period_name}" + (f": {titles}" if notes else "")
+        else:
+            response = f"You finished {len(notes)} tasks {period_name}" + (f": {titles}" if notes else "")
+        return self.reply(nlp, turn, {
+            "operation": "finished", "response": response, "matches": notes, "requires_confirmation": False
+        })
+
+    def progress(self, nlp, turn: Turn, current_note: Optional[Dict] = None) -> Dict:
+        """Completions per day over a period (the last 7 days by default) and the open task count."""
+        start, end, period = period_range(turn.normalized_text)
+        days = nlp.done_index.histogram(start, end)
+        done, still_open = sum(days.values()), len(nlp.done_index.open)
+        per_day = ", ".join(f"{day}: {count}" for day, count in days.items())
+        period_name = PERIOD_NAMES[period][0 if turn.is_hebrew else 1]
+        if turn.is_hebrew:
+            response = f"{period_name} הושלמו {done} משימות" + (f" ({per_day})" if days else "")
+            response += f". משימות פתוחות: {still_open}."
+        else:
+            response = f"{done} tasks done {period_name}" + (f" ({per_day})" if days else "")
+            response += f". Open tasks: {still_open}."
+        return self.reply(nlp, turn, {
+            "operation": "progress", "response": response, "histogram": days, "requires_confirmation": False
+        })
+
+    def summarize(self, nlp, turn: Turn, current_note: Optional[Dict] = None) -> Dict:
+        """Answer "summarize <note>", or a bare "summarize" about the note in focus."""
+        match = (SUMMARIZE_HE_RE if turn.is_hebrew else SUMMARIZE_EN_RE).match(turn.normalized_text)
+        title = match.group(1).strip(" ?.") if match else ""
+        note = self.resolve_note(nlp, turn, title) if title else current_note
+        if note is None:
+            response = (
+                "איזו רשומה לסכם?" if turn.is_hebrew else "Which note should I summarize?"
+            )
+            return self.reply(nlp, turn, {"operation": "summarize", "response": response, "requires_confirmation": False})
+        nlp.conversation_state = {'current_note': note}
+        response = nlp.summaries.describe(note['id'], turn.is_hebrew)
+        return self.reply(nlp, turn, {
+            "operation": "summarize",
+            "response": response,
+            "summary": nlp.summaries.summary(note['id']),
+            "requires_confirmation": False
+        })
+
+    def ask_create(self, nlp, turn: Turn, title: str) -> Dict:
+        is_hebrew = turn.is_hebrew
+        # Check if note exists
+        existing_note = nlp.find_note_by_title(title)
+        if existing_note:
+            response = (
+                f"רשומה בשם '{title}' כבר קיימת." if is_hebrew
+                else f"A note with the name '{title}' already exists."
+            )
+            return self.reply(nlp, turn, {"operation": "create", "response": response, "requires_confirmation": False})
+        # Prompt for confirmation before creating
+        response = (
+            f"האם ליצור רשומה חדשה בשם '{title}'?" if is_hebrew
+            else f"Do you want me to create a new note called '{title}'?"
+        )
+        nlp.conversation_state = {
+            'operation': 'create',
+            'pending_note': {
+                'title': title,
+                'nlp_service': nlp,
+                'original_text': turn.text,
+                'requires_confirmation': True
+            },
+            'confirm_action': 'create',
+            'pending_title': title
+        }
+        return self.reply(nlp, turn, {"operation": "create_confirm", "response": response, "requires_confirmation": True})
+
+    def find(self, nlp, turn: Turn, query: Optional[str] = None, escalate: bool = True) -> Dict:
+        # --- Find command: update context if single note found ---
+        response = nlp.tools['find'].run({'query': query or turn.text, 'language': turn.language, 'nlp_service': nlp})
+        matches = response.get('matches', [])
+        if not matches and query is None and escalate:
+            self.escalate(nlp, turn, response)
+        if len(matches) == 1:
+            print(f"[DEBUG CONTEXT] Switching context to note: {matches[0]}")
+            nlp.conversation_state = {'current_note': matches[0]}
+            response_text = (
+                "נמצאה רשומה אחת. האם תרצה לעדכן, למחוק או להוסיף תת-רשומה?"
+                if turn.is_hebrew
+                else "Found 1 note. Would you like to update, delete, or add a sub-note?"
+            )
+            return {
+                "response": response_text,
+                "matches": matches,
+                "requires_confirmation": True
+            }
+        return response
+
+    @staticmethod
+    def escalate(nlp, turn: Turn, response: Dict):
+        """Nothing matched and it is not clearly a search: let the model pick a tool in the background."""
+        if nlp.llm and turn.escalate and nlp.intent_classifier.confident(turn.normalized_text) not in ('find', 'yes', 'no'):
+            response["llm_future"] = nlp.select_tool_async(turn.text, turn.language)
+            response["query_text"] = turn.text
+
+    @staticmethod
+    def classified_intent(nlp, turn: Turn) -> Optional[str]:
+        """The classifier's confident intent; one that changes notes also needs one of its words."""
+        intent = nlp.intent_classifier.confident(turn.normalized_text)
+        words = MUTATING_INTENT_WORDS.get(intent)
+        if words is not None and not any(word in turn.normalized_text.lower() for word in words):
+            return None
+        return intent
+
+    def ask_delete(self, nlp, turn: Turn, note: Dict) -> Dict:
+        nlp.conversation_state = {
+            'operation': 'delete',
+            'pending_note': {
+                'target_id': note['id'],
+                'requires_confirmation': True
+            },
+            'confirm_action': 'delete',
+            'found_note': note,
+            'current_note': note
+        }
+        response = (
+            f"האם למחוק את הרשומה {note['title']}?" if turn.is_hebrew
+            else f"Delete the note {note['title']}?"
+        )
+        print(f"[DEBUG DELETE] Returning delete confirmation: {response}")
+        return self.reply(nlp, turn, {'response': response, 'requires_confirmation': True})
+
+    def apply_selection(self, nlp, turn: Turn, selection: Dict) -> Dict:
+        """Act on the model's {"tool", "params", "response"} reply the way the rules would have."""
+        tool = selection.get('tool')
+        params = selection.get('params') or {}
+        if tool == 'find' and params.get('query'):
+            return self.find(nlp, turn, query=params['query'])
+        if tool == 'create' and params.get('title'):
+            parent = nlp.find_note_by_spoken_title(params['parent_id']) if params.get('parent_id') else None
+            if parent:
+                return self.multi_create(nlp, turn, parent, [params['title']])
+            return self.ask_create(nlp, turn, params['title'])
+        target = params.get('target_id')
+        note = (nlp.get_note_by_id(target) or nlp.find_note_by_spoken_title(target)) if target else None
+        if tool == 'delete' and note:
+            return self.ask_delete(nlp, turn, note)
+        if tool == 'update' and note and params.get('updates'):
+            return UpdateContentState.ask_update(nlp, turn, note, {'target_id': note['id'], 'nlp_service': nlp},
+                                                 str(params['updates']))
+        response = selection.get('response') or (
+            "לא הבנתי. תוכל לנסח שוב?" if turn.is_hebrew else "I didn't understand. Could you rephrase?"
+        )
+        return self.reply(nlp, turn, {"operation": "unknown", "response": response, "requires_confirmation": False})
+
+
+class CurrentNoteState(IdleState):
+    """A note is in focus: the shared commands about it, a sub-note, update or delete; otherwise create or find."""
+
+    INTENT_HANDLERS = IdleState.INTENT_HANDLERS + (('subnote', 'add_sub_note'),)
+
+    def handle(self, nlp, turn: Turn) -> Dict:
+        current_note = nlp.conversation_state['current_note']
+        print(f"[DEBUG CONTEXT] Using current_note from context: {current_note}")
+        is_hebrew = turn.is_hebrew
+        result = self.handle_intent(nlp, turn, current_note)
+        if result:
+            return result
+        update = ('update_he' if is_hebrew else 'update_en') in turn.intents
+        # Delete intent: trigger phrase, or regex for Hebrew variants
+        delete = 'delete' in turn.intents or bool(is_hebrew and DELETE_HE_RE.search(turn.normalized_text))
+        # A list is only split into sub-notes when it is not new content ("add to description: a, b")
+        if not update and not delete:
+            multi = self.multi_create(nlp, turn, current_note)
+            if multi:
+                return multi
+        if is_hebrew and 'create_he' in turn.intents:
+            return self.create(nlp, turn)
+        # Detect update intent directly after generic prompt
+        if update:
+            return self.ask_update_content(nlp, turn, current_note)
+        # Detect delete intent directly after generic prompt
+        if delete:
+            return self.ask_delete(nlp, turn, current_note)
+        # No trigger phrase: a title is a search; the classifier is only asked when nothing matched
+        result = self.find(nlp, turn, escalate=False)
+        if result.get('matches'):
+            return result
+        intent = self.classified_intent(nlp, turn)
+        if intent == 'delete':
+            return self.ask_delete(nlp, turn, current_note)
+        if intent == 'update':
+            return self.ask_update_content(nlp, turn, current_note)
+        if intent == 'add_sub_note':
+            return self.add_sub_note(nlp, turn, current_note)
+        self.escalate(nlp, turn, result)
+        return result
+
+    def ask_update_content(self, nlp, turn: Turn, current_note: Dict) -> Dict:
+        # Prompt for new content
+        response = (
+            "מה תרצה לעדכן? אנא אמור את התוכן החדש לרשומה." if turn.is_hebrew
+            else "What would you like to update? Please say the new content for the note."
+        )
+        nlp.conversation_state = {
+            'operation': 'update_pending_content',
+            'pending_note': {
+                'target_id': current_note['id'],
+                'nlp_service': nlp
+            },
+            'current_note': current_note
+        }
+        return self.reply(nlp, turn, {"operation": "update_ask_content", "response": response, "requires_confirmation": False})
+
+    def add_sub_note(self, nlp, turn: Turn, current_note: Dict) -> Dict:
+        is_hebrew = turn.is_hebrew
+        # Extract sub-note title
+        extract_result = nlp.tools['extract_sub_note_title'].run({'text': turn.text, 'language': turn.language})
+        title = extract_result.get('title', '').strip()
+        if not title:
+            response = extract_result.get('response', 'Please specify the sub-note title.')
+            return self.reply(nlp, turn, {"operation": "add_sub_note", "response": response, "requires_confirmation": False})
+        # Check if sub-note already exists under this parent
+        parent_id = current_note['id']
+        if nlp.find_child_by_title(parent_id, title):
+            response = (
+                f"רשומת משנה בשם '{title}' כבר קיימת תחת {current_note['title']}." if is_hebrew
+                else f"A sub-note called '{title}' already exists under {current_note['title']}."
+            )
+            return self.reply(nlp, turn, {"operation": "add_sub_note", "response": response, "requires_confirmation": False})
+        # Prompt for confirmation before creating sub-note
+        response = (
+            f"האם להוסיף תת-רשומה בשם '{title}' תחת '{current_note['title']}'?" if is_hebrew
+            else f"Do you want me to add a sub-note called '{title}' under '{current_note['title']}'?"
+        )
+        nlp.conversation_state = {
+            'operation': 'create',
+            'pending_note': {
+                'title': title,
+                'parent_id': parent_id,
+                'nlp_service': nlp,
+                'original_text': turn.text,
+                'requires_confirmation': True
+            },
+            'confirm_action': 'create',
+            'pending_title': title
+        }
+        return self.reply(nlp, turn, {"operation": "add_sub_note_confirm", "response": response, "requires_confirmation": True})
+
+
+class ConfirmState(ConversationState):
+    """Waiting for yes/no on a pending create, update or delete."""
+
+    operation = None
+
+    def handle(self, nlp, turn: Turn) -> Dict:
+        print(f"[DEBUG NLP] In {self.operation} confirmation state: {nlp.conversation_state}")
+        # "בטל פעולה אחרונה" contains "בטל": drop the pending action and undo the last one
+        result = self.handle_intent(nlp, turn)
+        if result:
+            return result
+        intent_result = nlp.tools['confirmation_intent'].run(
+            {'text': turn.text, 'language': turn.language, 'pending_action': self.operation}
+        )
+        print(f"[DEBUG NLP] ConfirmationIntentTool result: {intent_result}")
+        answer = intent_result['intent']
+        if answer == 'ambiguous':
+            # No yes/no phrase; the classifier may still recognise the reply ("בטח", "yep")
+            answer = {'yes': 'yes', 'no': 'no'}.get(nlp.intent_classifier.confident(turn.normalized_text), answer)
+        if answer == 'yes':
+            print(f"[DEBUG NLP] User confirmed {self.operation}.")
+            result = self.confirm(nlp, nlp.conversation_state.get('pending_note'))
+            nlp.conversation_state = None
+            return self.reply(nlp, turn, result)
+        if answer == 'no':
+            print(f"[DEBUG NLP] User denied {self.operation}.")
+            nlp.conversation_state = None
+            response = "בסדר, ביטלתי את הפעולה." if turn.is_hebrew else "OK, I've cancelled the action."
+            return self.reply(nlp, turn, self.cancelled(response))
+        # Ambiguous: prompt again for confirmation
+        return self.reply(nlp, turn, self.ask_again(nlp, turn))
+
+    @abstractmethod
+    def confirm(self, nlp, pending_note: Dict) -> Dict:
+        """Carry out the pending operation; returns its result."""
+
+    @abstractmethod
+    def cancelled(self, response: str) -> Dict:
+        """The result for a "no", around the given response text."""
+
+    @abstractmethod
+    def ask_again(self, nlp, turn: Turn) -> Dict:
+        """The prompt repeated when the reply was neither yes nor no."""
+
+
+class CreateConfirmState(ConfirmState):
+    operation = 'create'
+
+    def confirm(self, nlp, pending_note: Dict) -> Dict:
+        # Actually create the note (or sub-note)
+        return nlp.tools['create'].run(pending_note)
+
+    def cancelled(self, response: str) -> Dict:
+        return {"operation": "create_cancel", "response": response, "requires_confirmation": False}
+
+    def ask_again(self, nlp, turn: Turn) -> Dict:
+        pending_title = nlp.conversation_state.get('pending_title', '')
+        response = (
+            f"אנא אשר או בטל: ליצור רשומה חדשה בשם '{pending_title}'?" if turn.is_hebrew
+            else f"Please confirm or cancel: create a new note called '{pending_title}'?"
+        )
+        return {"operation": "create_confirm", "response": response, "requires_confirmation": True}
+
+
+class UpdateConfirmState(ConfirmState):
+    operation = 'update'
+
+    def confirm(self, nlp, pending_note: Dict) -> Dict:
+        pending_note["requires_confirmation"] = False
+        pending_note.setdefault('nlp_service', nlp)
+        result = nlp.tools['update'].run(pending_note)
+        result["notes_updated"] = True
+        return result
+
+    def cancelled(self, response: str) -> Dict:
+        return {"response": response}
+
+    def ask_again(self, nlp, turn: Turn) -> Dict:
+        current_note = nlp.conversation_state.get('current_note')
+        updates = nlp.conversation_state.get('pending_note', {}).get('updates', '')
+        response = (
+            f"אנא אשר או בטל: לעדכן את הרשומה '{current_note['title']}' עם התוכן הבא?\n{updates}" if turn.is_hebrew
+            else f"Please confirm or cancel: update the note '{current_note['title']}' with the following content?\n{updates}"
+        )
+        return {"operation": "update_confirm", "response": response, "requires_confirmation": True}
+
+
+class DeleteConfirmState(ConfirmState):
+    operation = 'delete'
+
+    def confirm(self, nlp, pending_note: Dict) -> Dict:
+        pending_note["requires_confirmation"] = False
+        pending_note.setdefault('nlp_service', nlp)
+        return nlp.tools['delete'].run(pending_note)
+
+    def cancelled(self, response: str) -> Dict:
+        return {"response": response, "operation": "delete_cancel"}
+
+    def ask_again(self, nlp, turn: Turn) -> Dict:
+        current_note = nlp.conversation_state.get('current_note')
+        response = (
+            f"אנא אשר או בטל: למחוק את הרשומה '{current_note['title']}'?" if turn.is_hebrew
+            else f"Please confirm or cancel: delete the note '{current_note['title']}'?"
+        )
+        return {"operation": "delete_confirm", "response": response, "requires_confirmation": True}
+
+
+class UpdateContentState(ConversationState):
+    """After 'update': the next utterance is the new content for the note."""
+
+    def handle(self, nlp, turn: Turn) -> Dict:
+        current_note = nlp.conversation_state.get('current_note')
+        pending_note = nlp.conversation_state.get('pending_note', {})
+        # Check if the user input is a confirmation/denial (should not be treated as content)
+        intent_result = nlp.tools['confirmation_intent'].run({'text': turn.text, 'language': turn.language, 'pending_action': 'update'})
+        if intent_result['intent'] in ('yes', 'no'):
+            # User said 'yes' or 'no' instead of providing content
+            response = (
+                "אנא אמור את התוכן החדש לעדכון הרשומה." if turn.is_hebrew
+                else "Please provide the new content to update the note."
+            )
+            return self.reply(nlp, turn, {"operation": "update_ask_content", "response": response, "requires_confirmation": False})
+        # Otherwise, treat as new content
+        return self.ask_update(nlp, turn, current_note, pending_note, turn.text.strip())
+
+    @classmethod
+    def ask_update(cls, nlp, turn: Turn, current_note: Dict, pending_note: Dict, content: str) -> Dict:
+        pending_note['updates'] = content
+        response = (
+            f"האם לעדכן את הרשומה '{current_note['title']}' עם התוכן הבא?\n{content}" if turn.is_hebrew
+            else f"Update the note '{current_note['title']}' with the following content?\n{content}"
+        )
+        nlp.conversation_state = {
+            'operation': 'update',
+            'pending_note': pending_note,
+            'confirm_action': 'update',
+            'current_note': current_note
+        }
+        return cls.reply(nlp, turn, {"operation": "update_confirm", "response": response, "requires_confirmation": True})
+
+
+def state_key(conversation_state) -> str:
+    """Dispatch key for a conversation_state dict."""
+    if not conversation_state:
+        return 'idle'
+    operation = conversation_state.get('operation')
+    if operation:
+        return operation
+    return 'current_note' if conversation_state.get('current_note') else 'idle'
+
+
+def default_state_handlers() -> Dict[str, ConversationState]:
+    return {
+        'idle': IdleState(),
+        'current_note': CurrentNoteState(),
+        'create': CreateConfirmState(),
+        'update': UpdateConfirmState(),
+        'delete': DeleteConfirmState(),
+        'update_pending_content': UpdateContentState(),
+    }
@@ -0,0 +1,218 @@
+import heapq
+from typing import Callable, Dict, List, Optional, Set
+
+
+class DependencyCycleError(ValueError):
+    """Raised when a dependency would make a note (indirectly) depend on itself."""
+
+
+class DependencyGraph:
+    """Dependency edges between notes ("Buy Airbox" depends on "Fix AirBox").
+
+    Edges are stored on the dependent note as ``relations['depends_on']`` and
+    mirrored here in forward (``dependents``) and reverse (``depends_on``)
+    adjacency sets. A topological order is kept up to date with the
+    Pearce-Kelly algorithm: adding an edge that already agrees with the order
+    is O(1), otherwise only the nodes between the two endpoints are searched
+    and reordered, and reaching the source again means the edge closes a
+    cycle. Each note also keeps a count of its open prerequisites, so the set
+    of open leaf tasks with nothing left to wait for ("what can I do next") is
+    maintained as notes change and read in time proportional to its size.
+    Deleting a note drops its id from its dependents' stored edges (see
+    NLPService._remove_subtree); stored edges whose prerequisite is missing
+    anyway (older notebooks, or not restored yet during an undo) are skipped,
+    remembered in ``waiting`` and linked when that note is added again.
+    """
+
+    def __init__(self, get_note: Callable[[str], Optional[Dict]]):
+        self.get_note = get_note
+        self.depends_on: Dict[str, Set[str]] = {}  # note -> notes it waits for
+        self.dependents: Dict[str, Set[str]] = {}  # note -> notes waiting for it
+        self.order: Dict[str, int] = {}  # topological position; prerequisites come first
+        self.blocked: Dict[str, int] = {}  # note -> open prerequisites
+        self.open: Set[str] = set()
+        self.ready: Set[str] = set()
+        self.waiting: Dict[str, Set[str]] = {}  # missing prerequisite -> notes whose stored edges name it
+        self._next_order = 0
+
+    @staticmethod
+    def stored_edges(note: Dict) -> List[str]:
+        return list((note.get('relations') or {}).get('depends_on') or [])
+
+    def rebuild(self, notes: List[Dict]):
+        self.depends_on.clear()
+        self.dependents.clear()
+        self.order.clear()
+        self.blocked.clear()
+        self.open.clear()
+        self.ready.clear()
+        self.waiting.clear()
+        self._next_order = 0
+        for note in notes:
+            self._add_node(note)
+        for note in notes:
+            for prerequisite in self.stored_edges(note):
+                self._add_stored_edge(prerequisite, note["id"])
+        for note in notes:
+            self._refresh(note["id"])
+
+    def _add_node(self, note: Dict):
+        note_id = note["id"]
+        self.depends_on[note_id] = set()
+        self.dependents[note_id] = set()
+        self.order[note_id] = self._next_order
+        self._next_order += 1
+        self.blocked[note_id] = 0
+        if not note.get('done'):
+            self.open.add(note_id)
+
+    def _add_stored_edge(self, prerequisite: str, note_id: str):
+        try:
+            self.add_edge(prerequisite, note_id)
+        except (DependencyCycleError, KeyError):
+            # Unknown (deleted) prerequisite, or a cycle in hand-edited data
+            print(f"[DEBUG] Ignoring dependency {note_id} -> {prerequisite}")
+            if prerequisite not in self.order:
+                self.waiting.setdefault(prerequisite, set()).add(note_id)
+
+    def add(self, note: Dict) -> List[str]:
+        """Add a note; returns the dependents whose stored edges to it were linked again."""
+        note_id = note["id"]
+        self._add_node(note)
+        for prerequisite in self.stored_edges(note):
+            self._add_stored_edge(prerequisite, note_id)
+        relinked = []
+        # A restored note (undo) gets back the dependents that still name it
+        for dependent in sorted(self.waiting.pop(note_id, ()), key=lambda i: self.order.get(i, -1)):
+            dependent_note = self.get_note(dependent)
+            if dependent in self.order and dependent_note and note_id in self.stored_edges(dependent_note):
+                self._add_stored_edge(note_id, dependent)
+                relinked.append(dependent)
+        self._refresh(note_id)
+        self._refresh(note.get("parent_id"))
+        return relinked
+
+    def update(self, note: Dict, old_parent_id: Optional[str] = None):
+        """Sync a changed note: its stored edges, done state and leaf state."""
+        note_id = note["id"]
+        if note_id not in self.order:
+            return
+        stored = set(self.stored_edges(note))
+        for prerequisite in self.depends_on[note_id] - stored:
+            self.remove_edge(prerequisite, note_id)
+        for prerequisite in stored - self.depends_on[note_id]:
+            self._add_stored_edge(prerequisite, note_id)
+        was_open, is_open = note_id in self.open, not note.get('done')
+        if was_open != is_open:
+            if is_open:
+                self.open.add(note_id)
+            else:
+                self.open.discard(note_id)
+            for dependent in self.dependents[note_id]:
+                self.blocked[dependent] += 1 if is_open else -1
+                self._refresh(dependent)
+        self._refresh(note_id)
+        if old_parent_id != note.get("parent_id"):
+            self._refresh(old_parent_id)
+            self._refresh(note.get("parent_id"))
+
+    def remove(self, note: Dict):
+        note_id = note["id"]
+        if note_id not in self.order:
+            return
+        for prerequisite in list(self.depends_on[note_id]):
+            self.remove_edge(prerequisite, note_id)
+        for dependent in list(self.dependents[note_id]):
+            self.remove_edge(note_id, dependent)
+            self.waiting.setdefault(note_id, set()).add(dependent)
+        for table in (self.depends_on, self.dependents, self.order, self.blocked):
+            del table[note_id]
+        self.open.discard(note_id)
+        self.ready.discard(note_id)
+        self._refresh(note.get("parent_id"))
+
+    def creates_cycle(self, prerequisite: str, note_id: str) -> bool:
+        """Whether ``note_id`` depending on ``prerequisite`` would close a cycle."""
+        if prerequisite == note_id:
+            return True
+        if self.order[prerequisite] < self.order[note_id]:
+            return False  # already agrees with the topological order
+        return self._forward(note_id, self.order[prerequisite]) is None
+
+    def add_edge(self, prerequisite: str, note_id: str):
+        """Make ``note_id`` wait for ``prerequisite``; raises DependencyCycleError on a cycle."""
+        if prerequisite not in self.order or note_id not in self.order:
+            raise KeyError(prerequisite if prerequisite not in self.order else note_id)
+        if prerequisite in self.depends_on[note_id]:
+            return
+        if prerequisite == note_id:
+            raise DependencyCycleError(note_id)
+        lower, upper = self.order[note_id], self.order[prerequisite]
+        if lower < upper:
+            # Pearce-Kelly: only nodes ordered between the endpoints can be affected
+            forward = self._forward(note_id, upper)
+            if forward is None:
+                raise DependencyCycleError(note_id)
+            backward = self._backward(prerequisite, lower)
+            self._reorder(backward, forward)
+        self.depends_on[note_id].add(prerequisite)
+        self.dependents[prerequisite].add(note_id)
+        if prerequisite in self.open:
+            self.blocked[note_id] += 1
+            self._refresh(note_id)
+
+    def remove_edge(self, prerequisite: str, note_id: str):
+        if prerequisite not in self.depends_on.get(note_id, ()):
+            return
+        self.depends_on[note_id].discard(prerequisite)
+        self.dependents[prerequisite].discard(note_id)
+        if prerequisite in self.open:
+            self.blocked[note_id] -= 1
+            self._refresh(note_id)
+
+    def _forward(self, start: str, upper: int) -> Optional[List[str]]:
+        """Nodes reachable from ``start`` ordered below ``upper``; None if the node at ``upper`` is reached."""
+        seen, stack = {start}, [start]
+        while stack:
+            for nxt in self.dependents[stack.pop()]:
+                position = self.order[nxt]
+                if position == upper:
+                    return None
+                if position < upper and nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        return list(seen)
+
+    def _backward(self, start: str, lower: int) -> List[str]:
+        seen, stack = {start}, [start]
+        while stack:
+            for prev in self.depends_on[stack.pop()]:
+                if self.order[prev] > lower and prev not in seen:
+                    seen.add(prev)
+                    stack.append(prev)
+        return list(seen)
+
+    def _reorder(self, backward: List[str], forward: List[str]):
+        # Reuse the affected positions: everything reaching the prerequisite goes first
+        backward.sort(key=self.order.__getitem__)
+        forward.sort(key=self.order.__getitem__)
+        nodes = backward + forward
+        for node, position in zip(nodes, sorted(self.order[n] for n in nodes)):
+            self.order[node] = position
+
+    def _refresh(self, note_id: Optional[str]):
+        if note_id is None or note_id not in self.order:
+            return
+        note = self.get_note(note_id)
+        if note and note_id in self.open and not self.blocked[note_id] and not note.get('children'):
+            self.ready.add(note_id)
+        else:
+            self.ready.discard(note_id)
+
+    def next_tasks(self, k: int = 5, within: Optional[Set[str]] = None) -> List[str]:
+        """Up to ``k`` ready tasks, earliest in the topological order first."""
+        ready = self.ready if within is None else self.ready & within
+        return heapq.nsmallest(k, ready, key=self.order.__getitem__)
+
+    def topological_order(self) -> List[str]:
+        return sorted(self.order, key=self.order.__getitem__)
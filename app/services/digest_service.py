@@ -0,0 +1,203 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from app.services.change_feed import ChangeFeed
+from app.services.done_index import DoneIndex
+
+
+class DigestService:
+    """Daily digest of notes created, updated, completed and deleted.
+
+    The digest is built from the change feed starting at the offset where the
+    previous digest stopped, so building it costs time in proportion to that
+    day's changes and not to the size of the notebook. The latest digest and
+    the feed offset are saved next to the notes, so the digest can be shown
+    (or spoken) at once, even after a restart. ``start`` schedules a build
+    every day at the configured time with a ``threading.Timer``; the build
+    itself is handed to ``dispatch`` so it runs on the thread that owns the
+    notes (the Kivy main thread in the app).
+    """
+
+    MAX_TITLES = 10  # titles named per section when the digest is spoken
+    ROTATE_BYTES = 1024 * 1024  # truncate the feed once this much has been digested
+
+    def __init__(self, feed: ChangeFeed, state_path: str, done_index: Optional[DoneIndex] = None):
+        self.feed = feed
+        self.done_index = done_index
+        self.state_path = state_path
+        self.state = self._load_state()
+        self.on_ready: Optional[Callable[[Dict], None]] = None
+        self.dispatch: Optional[Callable[[Callable[[], None]], None]] = None
+        self._timer = None
+        self._digest_time = None
+        self._lock = threading.Lock()
+
+    @property
+    def digest(self) -> Optional[Dict]:
+        """The latest digest, without rebuilding it."""
+        return self.state.get('digest')
+
+    def _load_state(self) -> Dict:
+        try:
+            if os.path.exists(self.state_path):
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"[DEBUG] Error loading digest state: {e}")
+        return {'offset': 0, 'digest': None}
+
+    def _save_state(self):
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+    def build(self, now: Optional[datetime] = None) -> Dict:
+        """Digest the changes since the last digest and cache the result."""
+        with self._lock:
+            now = now or datetime.now()
+            events, offset = self.feed.read_from(self.state.get('offset', 0))
+            previous = self.state.get('digest')
+            digest = self.summarize(events)
+            digest['since'] = previous['until'] if previous else (events[0]['ts'] if events else None)
+            digest['until'] = now.isoformat(timespec='seconds')
+            if self.done_index is not None:
+                # Counts come from the done_date index in O(log N), not from a scan
+                digest['done_count'] = self.done_index.count(digest['since'], digest['until'])
+                digest['open_count'] = len(self.done_index.open)
+            self.state = {'offset': offset, 'digest': digest}
+            self._save_state()
+            if offset >= self.ROTATE_BYTES and offset >= self.feed.size():
+                # Everything in the feed has been digested; a crash before the next
+                # save is harmless because read_from resets offsets past the end
+                self.feed.truncate()
+                self.state['offset'] = 0
+                self._save_state()
+            print(f"[DEBUG] Built digest from {len(events)} changes")
+            return digest
+
+    @staticmethod
+    def summarize(events) -> Dict:
+        """Fold events into the net change per note, in first-seen order."""
+        created, updated, completed, deleted = {}, {}, {}, {}
+        for event in events:
+            note_id, title, op = event.get('id'), event.get('title'), event.get('op')
+            if op == 'created':
+                created[note_id] = title
+            elif op == 'deleted':
+                # Created and deleted on the same day: leave it out entirely
+                if created.pop(note_id, None) is None:
+                    deleted[note_id] = title
+                updated.pop(note_id, None)
+                completed.pop(note_id, None)
+            elif op == 'done':
+                completed[note_id] = title
+                updated.pop(note_id, None)
+            elif op == 'undone':
+                completed.pop(note_id, None)
+            elif op == 'updated':
+                if note_id in created:
+                    created[note_id] = title
+                elif note_id in completed:
+                    completed[note_id] = title
+                else:
+                    updated[note_id] = title
+        return {
+            'created': list(created.values()),
+            'updated': list(updated.values()),
+            'completed': list(completed.values()),
+            'deleted': list(deleted.values()),
+            'changes': len(events)
+        }
+
+    def describe(self, is_hebrew: bool, digest: Optional[Dict] = None) -> str:
+        """Spoken text of a digest (the cached one by default)."""
+        digest = digest or self.digest
+        if digest is None:
+            return "עדיין אין סיכום יומי" if is_hebrew else "There is no daily digest yet"
+        if is_hebrew:
+            sections = [("נוצרו", 'created'), ("עודכנו", 'updated'), ("הושלמו", 'completed'), ("נמחקו", 'deleted')]
+            empty = "לא היו שינויים ברשומות מאז הסיכום הקודם."
+        else:
+            sections = [("Created", 'created'), ("Updated", 'updated'), ("Completed", 'completed'), ("Deleted", 'deleted')]
+            empty = "No notes changed since the last digest."
+        parts = []
+        for label, key in sections:
+            titles = digest.get(key) or []
+            if not titles:
+                continue
+            named = ', '.join(str(t) for t in titles[:self.MAX_TITLES])
+            more = len(titles) - self.MAX_TITLES
+            if more > 0:
+                named += f" (+{more})"
+            parts.append(f"{label} {len(titles)}: {named}.")
+        text = " ".join(parts) if parts else empty
+        if digest.get('open_count') is not None:
+            text += (f" משימות פתוחות: {digest['open_count']}." if is_hebrew
+                     else f" Open tasks: {digest['open_count']}.")
+        return text
+
+    # --- scheduling ---
+
+    @staticmethod
+    def next_run(digest_time: str, now: datetime) -> datetime:
+        hour, minute = (int(part) for part in digest_time.split(':'))
+        run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return run if run > now else run + timedelta(days=1)
+
+    def start(self, digest_time: Optional[str], on_ready: Optional[Callable[[Dict], None]] = None,
+              dispatch: Optional[Callable[[Callable[[], None]], None]] = None):
+        """Build a digest every day at ``digest_time`` ("HH:MM"); None disables it.
+
+        ``dispatch(fn)`` must run ``fn`` on the thread that changes the notes;
+        without it the build runs on the timer thread. A digest missed while
+        the app was closed is built right away.
+        """
+        self.stop()
+        if not digest_time:
+            return
+        self._digest_time = digest_time
+        self.on_ready = on_ready
+        self.dispatch = dispatch
+        last_due = self.next_run(digest_time, datetime.now()) - timedelta(days=1)
+        digest = self.digest
+        if digest is None or digest.get('until', '') < last_due.isoformat(timespec='seconds'):
+            self._fire()
+        else:
+            self._schedule()
+
+    def _schedule(self):
+        if not self._digest_time:
+            return
+        now = datetime.now()
+        delay = (self.next_run(self._digest_time, now) - now).total_seconds()
+        self._timer = threading.Timer(delay, self._fire)
+        self._timer.daemon = True
+        self._timer.start()
+        print(f"[DEBUG] Next digest in {int(delay)}s")
+
+    def _fire(self):
+        try:
+            if self.dispatch:
+                self.dispatch(self._build_and_notify)
+            else:
+                self._build_and_notify()
+        finally:
+            self._schedule()
+
+    def _build_and_notify(self):
+        try:
+            digest = self.build()
+            if self.on_ready:
+                self.on_ready(digest)
+        except Exception as e:
+            print(f"[DEBUG] Digest failed: {e}")
+
+    def stop(self):
+        self._digest_time = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
@@ -0,0 +1,118 @@
+import re
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class DoneIndex:
+    """Completed notes sorted by done_date, plus the set of open notes.
+
+    ``entries`` is a sorted list of (done_date, id) kept in order with bisect,
+    so range, count and per-day histogram queries cost O(log N + k). Dates are
+    ISO strings, which sort chronologically; ranges are half-open
+    ``[start, end)``. Done notes without a done_date are kept in ``undated``.
+    """
+
+    def __init__(self):
+        self.entries: List[Tuple[str, str]] = []
+        self.dates: Dict[str, str] = {}  # id -> done_date of the entry in ``entries``
+        self.open: Set[str] = set()
+        self.undated: Set[str] = set()
+
+    def rebuild(self, notes: List[Dict]):
+        self.dates = {}
+        self.open = set()
+        self.undated = set()
+        for note in notes:
+            if not note.get('done'):
+                self.open.add(note["id"])
+            elif note.get('done_date'):
+                self.dates[note["id"]] = str(note['done_date'])
+            else:
+                self.undated.add(note["id"])
+        self.entries = sorted((date, note_id) for note_id, date in self.dates.items())
+
+    def add(self, note: Dict):
+        note_id = note["id"]
+        if not note.get('done'):
+            self.open.add(note_id)
+        elif note.get('done_date'):
+            date = str(note['done_date'])
+            self.dates[note_id] = date
+            insort(self.entries, (date, note_id))
+        else:
+            self.undated.add(note_id)
+
+    def remove(self, note_id: str):
+        self.open.discard(note_id)
+        self.undated.discard(note_id)
+        date = self.dates.pop(note_id, None)
+        if date is not None:
+            i = bisect_left(self.entries, (date, note_id))
+            if i < len(self.entries) and self.entries[i] == (date, note_id):
+                del self.entries[i]
+
+    def update(self, note: Dict):
+        self.remove(note["id"])
+        self.add(note)
+
+    def _slice(self, start: Optional[str], end: Optional[str]) -> Tuple[int, int]:
+        lo = bisect_left(self.entries, (start,)) if start else 0
+        hi = bisect_left(self.entries, (end,)) if end else len(self.entries)
+        return lo, hi
+
+    def range(self, start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+        """Ids of notes done in ``[start, end)``, oldest first."""
+        lo, hi = self._slice(start, end)
+        return [note_id for _, note_id in self.entries[lo:hi]]
+
+    def count(self, start: Optional[str] = None, end: Optional[str] = None) -> int:
+        lo, hi = self._slice(start, end)
+        return max(0, hi - lo)
+
+    def histogram(self, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, int]:
+        """Completions per day (YYYY-MM-DD) in ``[start, end)``; days without any are left out."""
+        lo, hi = self._slice(start, end)
+        days: Dict[str, int] = {}
+        for date, _ in self.entries[lo:hi]:
+            days[date[:10]] = days.get(date[:10], 0) + 1
+        return days
+
+    def latest(self) -> Optional[str]:
+        return self.entries[-1][0] if self.entries else None
+
+
+LAST_DAYS_RE = re.compile(r'(?:last|past)\s+(\d+)\s+days|(\d+)\s+הימים\s+האחרונים|(\d+)\s+ימים\s+אחרונים')
+
+
+def period_range(text: str, now: Optional[datetime] = None) -> Tuple[str, str, str]:
+    """(start, end, key) of the period a spoken phrase names; the last 7 days by default.
+
+    ``key`` is one of today, yesterday, this_week, last_week, this_month,
+    last_month or last_days, for wording the reply.
+    """
+    now = now or datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow = today + timedelta(days=1)
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    text = text.lower()
+    match = LAST_DAYS_RE.search(text)
+    if match:
+        days = int(next(group for group in match.groups() if group))
+        start, end, key = tomorrow - timedelta(days=days), tomorrow, 'last_days'
+    elif 'yesterday' in text or 'אתמול' in text:
+        start, end, key = today - timedelta(days=1), today, 'yesterday'
+    elif 'today' in text or 'היום' in text:
+        start, end, key = today, tomorrow, 'today'
+    elif 'last week' in text or 'שבוע שעבר' in text or 'שבוע הקודם' in text:
+        start, end, key = week_start - timedelta(days=7), week_start, 'last_week'
+    elif 'this week' in text or 'השבוע' in text:
+        start, end, key = week_start, tomorrow, 'this_week'
+    elif 'last month' in text or 'חודש שעבר' in text or 'חודש הקודם' in text:
+        start, end, key = (month_start - timedelta(days=1)).replace(day=1), month_start, 'last_month'
+    elif 'this month' in text or 'החודש' in text:
+        start, end, key = month_start, tomorrow, 'this_month'
+    else:
+        start, end, key = tomorrow - timedelta(days=7), tomorrow, 'last_days'
+    return start.isoformat(timespec='seconds'), end.isoformat(timespec='seconds'), key
@@ -0,0 +1,55 @@
+# Example utterances per intent, used to train the on-device IntentClassifier.
+# Taken from the welcome messages, the conversation tests and everyday phrasing.
+INTENT_EXAMPLES = {
+    'create': [
+        "צור רשימת קניות", "תיצור רשומה רשימת קניות", "צור רשומה חדשה", "תיצרי רשומה חדשה בשם פגישה",
+        "רשום לי משימה חדשה", "כתוב רשומה על הפגישה", "זכור לקנות מתנה", "רשומה חדשה בשם תיקון רכב",
+        "תיצרו רשימה לטיול", "צור פתק חדש", "תרשום שצריך להתקשר לאמא", "פתח רשומה חדשה",
+        "create note shopping list", "create a new note called meeting", "new note groceries",
+        "make a note about the trip", "write down call the bank", "remember to buy a gift",
+        "add a new note called car repair", "start a new list for the vacation", "note down pick up the kids",
+        "create a list called books to read", "make a new note", "open a new note for work",
+    ],
+    'update': [
+        "עדכן תיאור של הרשומה", "עדכן רשומה חלב", "שנה את התיאור", "ערוך את הרשומה", "לעדכן את התוכן",
+        "הוסף לתיאור להביא מסמכים", "תעדכן את הרשומה", "תשנה את הכותרת", "אני רוצה לעדכן את הרשומה",
+        "תוסיף לתיאור שצריך לשלם", "לעדכן רשומה", "תערוך את התוכן",
+        "update note groceries", "update the description", "change the text of this note", "edit this note",
+        "modify the description", "append get bread to the description", "add to note groceries get bread",
+        "i want to update this note", "rename the note", "change the title", "edit the content",
+        "add to description buy milk",
+    ],
+    'delete': [
+        "מחק", "תמחק", "תמחוק את הרשומה", "למחוק", "מחק רשומה", "תמחק רשומה חלב", "הסר את הרשומה",
+        "תוריד את הרשומה הזאת", "אני רוצה למחוק את זה", "תעיף את הרשומה", "תמחק את זה", "מחק את הפתק",
+        "delete", "delete note groceries", "remove this note", "erase the note", "delete it",
+        "remove it", "get rid of this note", "throw this note away", "i want to delete this", "trash this note",
+        "delete the milk note", "erase it",
+    ],
+    'find': [
+        "תמצא רשימת קניות", "תמצא רשומה חלב", "מצא את הפגישה", "חפש רשימת קניות", "איפה כתבתי על הפגישה",
+        "הראה לי את רשימת הקניות", "אני מחפש את הרשומה על הרכב", "תמצאי את המתכון", "תמצאו רשימה",
+        "איפה הרשומה של הטיול", "תראה לי את המשימות", "חפש פתק על הבנק",
+        "find note groceries", "find groceries", "search for the meeting", "look for shopping list",
+        "where is my note about the car", "show me the groceries list", "where did i write about the meeting",
+        "find the recipe", "search notes for bank", "look up the trip note", "show me my tasks", "find list",
+    ],
+    'add_sub_note': [
+        "הוסף תת רשומה חלב", "תוסיף תת רשומה בשם ביצים", "תת רשומה לחם", "הוסף תת-רשומה", "תוסיף תת-רשומה בשם שמן",
+        "צור תת רשומה", "תוסיף פריט לרשימה", "הוסף פריט בשם עגבניות", "תוסיף תת משימה", "עוד פריט לרשימה",
+        "add sub-note called oil change", "add a sub-note", "add child note milk", "sub note eggs",
+        "add a child note called tires", "create a sub-note named bread", "add an item to this list",
+        "new sub-note called butter", "add a sub task", "add item cheese", "child note called filters",
+        "add another item", "sub-note named apples",
+    ],
+    'yes': [
+        "כן", "כן תעדכן", "כן תמחק", "בטח", "אשר", "בצע", "לך על זה", "כן בבקשה", "נכון", "אוקיי", "סבבה", "מאשר",
+        "yes", "yes please", "sure", "okay", "ok", "go ahead", "do it", "confirm", "yep", "yeah",
+        "that's right", "correct", "absolutely",
+    ],
+    'no': [
+        "לא", "בטל", "אל תבצע", "לא רוצה", "אל תוסיף", "אל תעדכן", "לא תודה", "עזוב", "תבטל", "ממש לא", "שכח מזה",
+        "no", "cancel", "don't", "do not", "nope", "stop", "never mind", "no thanks", "forget it", "abort",
+        "don't do it", "not now", "leave it",
+    ],
+}
@@ -0,0 +1,203 @@
+import re
+from typing import Dict, Iterable, List, Set
+
+# Trigger phrases per intent. A phrase may appear under several intents.
+INTENT_PHRASES: Dict[str, List[str]] = {
+    'subnote_he': ["תת רשומה", "תת-רשומה", "תוסיף תת רשומה", "הוסף תת רשומה"],
+    'subnote_en': ["sub-note", "sub note", "child note", "add sub-note", "add child note"],
+    'create_he': ["צור", "הוסף", "חדש", "כתוב", "רשום", "זכור", "תיצור", "תיצרי", "תיצרו"],
+    'update_he': [
+        "עדכן", "שנה", "ערוך", "הוסף ל", "לעדכן", "לעדכן תוכן", "לעדכן רשומה", "לעדכן את הרשומה", "לעדכן את התוכן"
+    ],
+    'update_en': ["update", "change", "modify", "edit", "add to", "append"],
+    'delete': [
+        "מחק", "תמחק", "תמחוק", "למחוק", "מחק רשומה", "תמחק רשומה", "תמחוק רשומה",
+        "delete", "remove", "erase", "delete note", "remove note", "erase note"
+    ],
+    'find_he': ["תמצא", "תמצאי", "מצא", "חפש", "תחפש", "איפה", "הראה לי", "תראה לי"],
+    'find_en': ["find", "search", "look for", "where is", "show me"],
+    'summarize_he': ["סכם", "תסכם", "תסכמי", "סיכום של"],
+    'summarize_en': ["summarize", "summarise", "summary of", "sum up"],
+    'digest_he': ["סיכום יומי", "סיכום היום", "מה השתנה היום"],
+    'digest_en': ["daily digest", "daily summary", "today's digest", "what changed today"],
+    'depends_he': ["תלוי ב", "תלויה ב", "תלויות ב"],
+    'depends_en': ["depends on", "blocked by", "waits for"],
+    'tag_he': ["הוסף תגית", "תוסיף תגית", "הוסף תג ", "תוסיף תג ", "תייג", "תתייג"],
+    'tag_en': ["add tag", "add the tag", "add tags", "tag it", "tag this", "tag as"],
+    'finished_he': ["מה סיימתי", "מה השלמתי", "כמה סיימתי", "כמה משימות סיימתי", "מה בוצע"],
+    'finished_en': [
+        "what did i finish", "what did i complete", "what have i finished", "what have i completed",
+        "how many did i finish", "how many tasks did i finish", "what got done"
+    ],
+    'progress_he': ["דוח התקדמות", "התקדמות", "איך אני מתקדם"],
+    'progress_en': ["progress report", "my progress", "how am i doing"],
+    'done_he': ["סמן כבוצע", "כבוצע", "כהושלם", "סיימתי עם", "זה בוצע"],
+    'done_en': ["mark as done", "mark done", "as done", "mark as complete", "as completed", "mark complete", "it's done"],
+    'next_he': ["מה הבא", "מה אפשר לעשות", "מה לעשות עכשיו", "המשימה הבאה", "המשימות הבאות"],
+    'next_en': ["do next", "what's next", "what is next", "next task", "next tasks"],
+    'undo_he': ["בטל פעולה אחרונה", "בטל את הפעולה האחרונה", "תבטל פעולה אחרונה", "תבטל את הפעולה האחרונה"],
+    'undo_en': ["undo", "take that back"],
+    'redo_he': ["בצע שוב", "בצע מחדש", "החזר את הפעולה"],
+    'redo_en': ["redo"],
+    # Confirmation replies (matched against lower-cased text)
+    'yes_he': ["כן", "תוסיף", "צור", "הוסף", "בצע", "אשר", "לך על זה"],
+    'no_he': ["לא", "בטל", "אל", "לא רוצה", "אל תבצע", "אל תוסיף", "אל תעדכן"],
+    'yes_delete_he': [
+        "תמחק", "מחק", "כן תמחק", "כן מחק", "כן",
+        "תמחק רשומה", "מחק רשומה", "כן תמחק רשומה", "כן מחק רשומה"
+    ],
+    'yes_en': ["yes", "add", "create", "go ahead", "do it", "confirm", "okay", "sure"],
+    'no_en': ["no", "cancel", "don't", "do not", "nope", "stop", "never", "don't do it"],
+}
+
+# Triggers that also occur inside ordinary words ("הסכם" holds "סכם"); they only
+# count when they stand as whole words
+WHOLE_WORD_INTENTS = {
+    'find_he', 'find_en', 'summarize_he', 'summarize_en', 'undo_en', 'redo_en', 'progress_he', 'progress_en', 'done_en'
+}
+
+# Words one of which must appear before the intent classifier's guess may change a note;
+# looser than the trigger phrases, so a bare title ("ביצים", "car") is never a command
+MUTATING_INTENT_WORDS: Dict[str, List[str]] = {
+    'delete': ["מחק", "מחוק", "הסר", "תסיר", "תוריד", "תעיף", "delete", "remove", "erase", "get rid", "trash", "throw"],
+    'update': [
+        "עדכן", "שנה", "ערוך", "הוסף ל", "תוסיף ל", "update", "change", "edit", "modify", "rename", "append", "add to"
+    ],
+    'add_sub_note': ["תת", "פריט", "sub", "child", "item"],
+    'create': ["צור", "חדש", "רשום", "כתוב", "זכור", "create", "new", "make a", "write down", "remember", "note down"],
+}
+
+# Hebrew create command: trigger, then an optional 'רשומה חדשה', then the title
+CREATE_HE_RE = re.compile(r'^(?:' + '|'.join(INTENT_PHRASES['create_he']) + r')\s*(?:רשומה)?\s*(?:חדשה)?\s*(.*)')
+DELETE_HE_RE = re.compile(r"\b(מחק|תמחק|תמחוק|למחוק)\b")
+# "summarize Fiat Tipo" / "סכם את פיאט טיפו"; the group is the note title (may be empty)
+SUMMARIZE_HE_RE = re.compile(r'^(?:תסכמי|תסכם|סכם|סיכום של)\s*(?:את\s+)?(?:ה?רשומה\s+)?(.*)$')
+SUMMARIZE_EN_RE = re.compile(
+    r'^(?:please\s+)?(?:summarize|summarise|sum up|give me a summary of|summary of)\s*(?:the\s+)?(?:note\s+)?(.*)$',
+    re.IGNORECASE
+)
+
+# "<note> depends on <prerequisite>"; without the first group the note in focus is meant
+DEPENDS_HE_RE = re.compile(r'^(?:(.+?)\s+)?(?:תלוי|תלויה|תלויות)\s+ב-?\s*(.+)$')
+DEPENDS_EN_RE = re.compile(r'^(?:(.+?)\s+)?(?:depends on|is blocked by|blocked by|waits for)\s+(?:the\s+)?(.+)$', re.IGNORECASE)
+
+# "mark [<note>] as done"; without a note (or with "it"/"this") the note in focus is meant
+DONE_HE_RE = re.compile(r'^(?:סמן|תסמן|תסמני)\s+(?:את\s+)?(?:(.+?)\s+)?(?:כבוצע|כבוצעה|כהושלם|כהושלמה|כגמור)$')
+DONE_EN_RE = re.compile(
+    r'^(?:please\s+)?mark\s+(?:(?!as\s)(?:the\s+)?(?:note\s+)?(.+?)\s+)?(?:as\s+)?(?:done|complete|completed|finished)$',
+    re.IGNORECASE
+)
+# "add tag urgent [to note shopping list]"; the second group names the note, else the one in focus
+TAG_HE_RE = re.compile(
+    r'^(?:הוסף|תוסיף|תוסיפי|תייג|תתייג)\s+(?:(?:את\s+)?(?:תגית|תג|תגיות)\s+)?(.+?)'
+    r'(?:\s+(?:לרשומה\s+|ל-)(.+))?$'
+)
+TAG_EN_RE = re.compile(
+    r'^(?:please\s+)?(?:add\s+(?:the\s+)?tags?|tag\s+(?:it|this(?:\s+note)?)(?:\s+(?:as|with))?|tag\s+as)\s+(.+?)'
+    r'(?:\s+to\s+(?:the\s+)?(?:note\s+)?(.+))?$',
+    re.IGNORECASE
+)
+TAG_SPLIT_RE = re.compile(r'\s*,\s*|\s+and\s+|\s+ו(?=\S)')
+
+
+def _alternation(intent: str) -> str:
+    # Longest first, so "summary of" is tried before a shorter phrase it starts with
+    return '|'.join(re.escape(phrase) for phrase in sorted(INTENT_PHRASES[intent], key=len, reverse=True))
+
+
+def _start_re(intent: str):
+    return re.compile(r'^(?:please\s+)?(?:' + _alternation(intent) + r')(?!\w)', re.IGNORECASE)
+
+
+_WHOLE_WORD_RES = {
+    intent: re.compile(r'(?<!\w)(?:' + _alternation(intent) + r')(?!\w)') for intent in WHOLE_WORD_INTENTS
+}
+
+# Commands whose trigger can also be part of a search ("find summary of the meeting"):
+# inside a find request or a note title they only count when the command starts the
+# utterance, as these patterns require
+COMMAND_START_RES = {
+    'summarize_he': SUMMARIZE_HE_RE,
+    'summarize_en': SUMMARIZE_EN_RE,
+    'undo_he': _start_re('undo_he'),
+    'undo_en': _start_re('undo_en'),
+    'redo_he': _start_re('redo_he'),
+    'redo_en': _start_re('redo_en'),
+    'progress_he': _start_re('progress_he'),
+    'progress_en': _start_re('progress_en'),
+    'done_he': DONE_HE_RE,
+    'done_en': DONE_EN_RE,
+}
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher (Aho-Corasick automaton).
+
+    Built once from phrase -> labels; ``labels_in`` walks the text a single
+    time and returns the labels of every phrase that occurs in it, so the cost
+    does not grow with the number of phrases.
+    """
+
+    def __init__(self, patterns: Dict[str, Iterable[str]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[Set[str]] = [set()]
+        for phrase, labels in patterns.items():
+            state = 0
+            for ch in phrase:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(set())
+                state = nxt
+            self.out[state].update(labels)
+        self._link_failures()
+
+    def _link_failures(self):
+        # Breadth-first, so a state's failure target is finished before its children
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(ch, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                self.out[nxt] |= self.out[self.fail[nxt]]
+
+    def labels_in(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        state = 0
+        goto, fail, out = self.goto, self.fail, self.out
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+
+def _build_matcher(intent_phrases: Dict[str, List[str]]) -> AhoCorasick:
+    patterns: Dict[str, Set[str]] = {}
+    for intent, phrases in intent_phrases.items():
+        for phrase in phrases:
+            patterns.setdefault(phrase, set()).add(intent)
+    return AhoCorasick(patterns)
+
+
+# Shared by process_command and ConfirmationIntentTool
+INTENT_MATCHER = _build_matcher(INTENT_PHRASES)
+
+
+def detect_intents(text: str) -> Set[str]:
+    """Names of all intents with a trigger phrase in ``text``."""
+    found = INTENT_MATCHER.labels_in(text)
+    for intent in found & WHOLE_WORD_INTENTS:
+        if not _WHOLE_WORD_RES[intent].search(text):
+            found.discard(intent)
+    return found
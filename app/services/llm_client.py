@@ -0,0 +1,149 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Dict, Hashable, Optional
+
+import requests
+
+
+class LLMError(Exception):
+    """The model could not be reached or did not return usable JSON."""
+
+
+class LLMClient:
+    """Gemini generateContent over REST, run on worker threads.
+
+    ``generate_json`` returns a Future right away so the UI thread never waits
+    on the network. Each request has a deadline; ``cancel_pending`` drops every
+    request submitted so far (call it when the user speaks again). Parsed
+    replies are kept in an LRU cache keyed by the caller's cache key.
+    """
+
+    DEFAULT_BASE_URL = 'https://generativelanguage.googleapis.com'
+
+    def __init__(self, api_key: str, model: str = 'gemini-2.0-flash', base_url: Optional[str] = None,
+                 timeout: float = 8.0, max_workers: int = 2, cache_size: int = 64):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = (base_url or self.DEFAULT_BASE_URL).rstrip('/')
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Hashable, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._pending: Dict[Future, int] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm')
+        self._session = requests.Session()
+
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/v1beta/models/{self.model}:generateContent"
+
+    def generate_json(self, prompt: str, cache_key: Optional[Hashable] = None,
+                      timeout: Optional[float] = None) -> Future:
+        """Ask the model for a JSON object; the Future resolves to the parsed dict.
+
+        The Future fails with LLMError (network error, deadline, bad JSON) or
+        CancelledError (dropped by ``cancel_pending``).
+        """
+        future: Future = Future()
+        if cache_key is not None:
+            with self._lock:
+                cached = self._cache.get(cache_key)
+                if cached is not None:
+                    self._cache.move_to_end(cache_key)
+            if cached is not None:
+                print(f"[DEBUG LLM] Cache hit: {cache_key}")
+                future.set_running_or_notify_cancel()
+                future.set_result(cached)
+                return future
+        deadline = time.monotonic() + (timeout or self.timeout)
+        with self._lock:
+            self._pending[future] = self._generation
+        self._executor.submit(self._run, future, prompt, cache_key, deadline)
+        return future
+
+    def cancel_pending(self):
+        """Drop all outstanding requests; ones already on the wire are discarded when they return."""
+        with self._lock:
+            self._generation += 1
+            pending = list(self._pending)
+        for future in pending:
+            future.cancel()
+        if pending:
+            print(f"[DEBUG LLM] Cancelled {len(pending)} pending requests")
+
+    def close(self):
+        self.cancel_pending()
+        self._executor.shutdown(wait=False)
+        self._session.close()
+
+    def _run(self, future: Future, prompt: str, cache_key: Optional[Hashable], deadline: float):
+        if not future.set_running_or_notify_cancel():
+            self._forget(future)
+            return
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMError("Deadline passed before the request was sent")
+            result = self._request(prompt, remaining)
+        except Exception as e:
+            self._finish(future, error=e if isinstance(e, LLMError) else LLMError(str(e)))
+            return
+        if cache_key is not None:
+            with self._lock:
+                self._cache[cache_key] = result
+                self._cache.move_to_end(cache_key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        self._finish(future, result=result)
+
+    def _finish(self, future: Future, result: Optional[Dict] = None, error: Optional[Exception] = None):
+        with self._lock:
+            stale = self._pending.pop(future, None) != self._generation
+        if stale:
+            future.set_exception(CancelledError())
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _forget(self, future: Future):
+        with self._lock:
+            self._pending.pop(future, None)
+
+    def _request(self, prompt: str, timeout: float) -> Dict:
+        body = {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": {"responseMimeType": "application/json", "temperature": 0}
+        }
+        try:
+            response = self._session.post(self.url, params={'key': self.api_key}, json=body, timeout=timeout)
+        except requests.Timeout:
+            raise LLMError(f"No reply within {timeout:.1f}s")
+        except requests.RequestException as e:
+            raise LLMError(f"Request failed: {e}")
+        if response.status_code != 200:
+            raise LLMError(f"HTTP {response.status_code}: {response.text[:200]}")
+        try:
+            text = response.json()['candidates'][0]['content']['parts'][0]['text']
+        except (ValueError, KeyError, IndexError) as e:
+            raise LLMError(f"Unexpected response shape: {e}")
+        return self.parse_json(text)
+
+    @staticmethod
+    def parse_json(text: str) -> Dict:
+        """Parse the model's JSON, tolerating a markdown code fence around it."""
+        text = text.strip()
+        if text.startswith('```'):
+            text = text.split('\n', 1)[1] if '\n' in text else ''
+            text = text.rsplit('```', 1)[0]
+        try:
+            parsed = json.loads(text)
+        except ValueError as e:
+            raise LLMError(f"Model did not return JSON: {e}")
+        if not isinstance(parsed, dict):
+            raise LLMError("Model returned JSON that is not an object")
+        return parsed
@@ -1,11 +1,36 @@
-import google.generativeai as genai
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+import copy
 import json
 import os
 from kivy.utils import platform
 import re
 import unicodedata
 import traceback
+from app.services.note_journal import NoteJournal
+from app.services.note_store import NoteStore
+from app.services.note_persister import NotePersister
+from app.services.note_index import NoteIndex
+from app.services.text_index import InvertedIndex, TrigramIndex, normalize, tokenize
+from app.services.llm_client import LLMClient
+from app.services.prompt_builder import PromptBuilder
+from app.services.intent_classifier import default_classifier
+from app.services.vector_index import VectorIndex
+from app.services.summary_service import SummaryService
+from app.services.change_feed import ChangeFeed
+from app.services.digest_service import DigestService
+from app.services.dependency_graph import DependencyCycleError, DependencyGraph
+from app.services.relation_index import NEIGHBOR_KINDS, RelationIndex
+from app.services.tag_index import TagIndex
+from app.services.done_index import DoneIndex
+from app.services.undo_history import UndoHistory
+from app.services.note_versions import NoteVersions
+from concurrent.futures import Future
+from app.services.search_cache import SearchCache
+from app.services.intent_matcher import detect_intents
+from app.services.conversation_states import Turn, state_key, default_state_handlers
 
 class NoteTool:
     """Base class for note management tools"""
@@ -21,7 +46,8 @@ class CreateNoteTool(NoteTool):
         self.nlp_service = nlp_service
 
     def run(self, params: Dict) -> Dict:
-        notes = self.nlp_service.notes
+        if params.get("titles"):
+            return self.run_many(params)
         title = params.get("title")
         description = params.get("description")
         parent_id = params.get("parent_id")
@@ -32,7 +58,7 @@ class CreateNoteTool(NoteTool):
             description = ""
         is_hebrew = title and any(c > 'z' for c in title)
         # Duplicate detection
-        existing_note = next((n for n in notes if n["title"] == title and n["parent_id"] == parent_id), None)
+        existing_note = nlp_service.find_child_by_title(parent_id, title)
         if existing_note and not params.get('override_confirmed'):
             response = (
                 f"רשומה בשם '{title}' כבר קיימת. האם להחליף אותה?" if is_hebrew
@@ -44,8 +70,11 @@ class CreateNoteTool(NoteTool):
                 "requires_confirmation": True,
                 "pending_note": {**params, 'override_confirmed': True}
             }
+        removed_ids, pruned = [], []
         if existing_note and params.get('override_confirmed'):
-            notes.remove(existing_note)
+            # The replaced note takes its sub-notes with it instead of orphaning them
+            removed, pruned = nlp_service._remove_subtree(existing_note)
+            removed_ids = [n["id"] for n in removed]
         # Assign a new unique ID
         nlp_service.last_note_id += 1
         new_note = {
@@ -60,15 +89,18 @@ class CreateNoteTool(NoteTool):
             "links": [],
             "tags": []
         }
-        notes.append(new_note)
+        nlp_service.add_note(new_note)
         print(f"[DEBUG] Added new note: {new_note}")
-        print(f"[DEBUG] Notes after creation: {len(notes)}")
+        print(f"[DEBUG] Notes after creation: {len(nlp_service.notes)}")
+        changed = [new_note] + pruned
         if parent_id:
-            parent = next(n for n in notes if n["id"] == parent_id)
-            parent["children"].append(new_note["id"])
+            # add_note already linked the new id into the parent's children
+            parent = nlp_service.get_note_by_id(parent_id)
+            if parent:
+                changed.append(parent)
         print("[DEBUG] CreateNoteTool: calling _save_notes...")
         if nlp_service:
-            nlp_service._save_notes()
+            nlp_service._save_notes(changed=changed, removed=removed_ids)
         response = (
             f'נוצרה רשומה: {title}' if is_hebrew
             else f'Created note: {title}'
@@ -79,40 +111,71 @@ class CreateNoteTool(NoteTool):
             "requires_confirmation": False
         }
 
+    def run_many(self, params: Dict) -> Dict:
+        """Create one note per entry of ``titles`` under the same parent, saved once.
+
+        Titles that already exist under the parent are skipped, not overridden.
+        """
+        nlp_service = params.get("nlp_service", self.nlp_service)
+        titles = params["titles"]
+        parent_id = params.get("parent_id")
+        is_hebrew = any(c > 'z' for c in "".join(titles))
+        created, skipped = [], []
+        with nlp_service.batch():
+            for title in titles:
+                if nlp_service.find_child_by_title(parent_id, title):
+                    skipped.append(title)
+                    continue
+                self.run({**params, "titles": None, "title": title})
+                created.append(title)
+        response = (
+            f"נוצרו {len(created)} רשומות: {', '.join(created)}" if is_hebrew
+            else f"Created {len(created)} notes: {', '.join(created)}"
+        )
+        if skipped:
+            response += (
+                f". כבר קיימות: {', '.join(skipped)}" if is_hebrew
+                else f". Already existed: {', '.join(skipped)}"
+            )
+        return {
+            "operation": "create",
+            "response": response,
+            "created": created,
+            "skipped": skipped,
+            "requires_confirmation": False
+        }
+
 class UpdateNoteTool(NoteTool):
     def run(self, params: Dict) -> Dict:
-        notes = params['nlp_service'].notes
+        nlp_service = params['nlp_service']
         target_id = params.get("target_id")
         updates = params.get("updates", "")
         update_type = params.get("update_type", "field_update")
         is_hebrew = target_id and any(c > 'z' for c in target_id)
-        note = next((n for n in notes if n["id"] == target_id), None)
-        if not note:
-            note = next((n for n in notes if n["title"] == target_id), None)
+        note = nlp_service.get_note_by_id(target_id) or nlp_service.find_note_by_title(target_id)
         if note:
             if update_type == "replace_description":
-                note["description"] = updates
+                nlp_service.update_note(note, {"description": updates})
             elif update_type == "append_description":
                 current_desc = note.get("description", "")
                 if current_desc:
-                    note["description"] = current_desc + "\n" + updates
+                    nlp_service.update_note(note, {"description": current_desc + "\n" + updates})
                 else:
-                    note["description"] = updates
+                    nlp_service.update_note(note, {"description": updates})
             elif update_type == "field_update":
                 if isinstance(updates, dict):
-                    note.update(updates)
+                    nlp_service.update_note(note, updates)
                 elif isinstance(updates, str):
                     # fallback: append to description
                     current_desc = note.get("description", "")
                     if current_desc:
-                        note["description"] = current_desc + "\n" + updates
+                        nlp_service.update_note(note, {"description": current_desc + "\n" + updates})
                     else:
-                        note["description"] = updates
+                        nlp_service.update_note(note, {"description": updates})
             print(f"[DEBUG] Updated note: {note}")
             print("[DEBUG] UpdateNoteTool: calling _save_notes...")
-            nlp_service = params.get("nlp_service")
             if nlp_service:
-                nlp_service._save_notes()
+                nlp_service._save_notes(changed=[note])
             response = (
                 f"עודכנה רשומה: {note['title']}" if is_hebrew
                 else f"Updated note: {note['title']}"
@@ -133,21 +196,17 @@ class UpdateNoteTool(NoteTool):
 
 class DeleteNoteTool(NoteTool):
     def run(self, params: Dict) -> Dict:
-        notes = params['nlp_service'].notes
+        nlp_service = params['nlp_service']
         target_id = params.get("target_id")
-        note = next((n for n in notes if n["id"] == target_id), None)
-        if not note:
-            note = next((n for n in notes if n["title"] == target_id), None)
+        note = nlp_service.get_note_by_id(target_id) or nlp_service.find_note_by_title(target_id)
         if note:
-            notes.remove(note)
-            print(f"[DEBUG] Deleted note: {note}")
-            print("[DEBUG] DeleteNoteTool: calling _save_notes...")
-            nlp_service = params.get("nlp_service")
-            if nlp_service:
-                nlp_service._save_notes()
+            removed = nlp_service.delete_subtree(note)
+            print(f"[DEBUG] Deleted note: {note} ({len(removed) - 1} sub-notes)")
             return {
                 "operation": "delete",
-                "response": f"Deleted note: {note['title']}"
+                "response": f"Deleted note: {note['title']}",
+                "deleted_ids": [n["id"] for n in removed],
+                "notes_updated": True
             }
         print(f"[DEBUG] Note not found with id: {target_id}")
         return {
@@ -156,6 +215,9 @@ class DeleteNoteTool(NoteTool):
         }
 
 class FindNoteTool(NoteTool):
+    TOP_K = 5  # ranked mode: most matches to report
+    DOMINANCE = 2.0  # ranked mode: score ratio at which the best match is picked outright
+
     def extract_search_term(self, query):
         # Remove all known Hebrew prefixes from the start, repeatedly
         while True:
@@ -171,34 +233,53 @@ class FindNoteTool(NoteTool):
             query = new_query
         return query.strip()
 
-    def run(self, params: Dict) -> Dict:
-        notes = params['nlp_service'].notes
-        query = params.get("query", "")
-        orig_query = query
-        query = self.extract_search_term(query)
-        is_hebrew = query and any(c > 'z' for c in query)
-        matches = []
-        print(f"[DEBUG FIND] Original Query: {orig_query} | Extracted: {query}")
-        # 1. Try exact title match first
-        for note in notes:
-            title = note.get("title") or ""
-            if title == query:
+    def ranked_matches(self, nlp_service, query: str) -> List[Dict]:
+        """BM25 (or vector) top-k; a best hit that clearly beats the runner-up is returned alone."""
+        if nlp_service.search_mode == 'semantic' and nlp_service.vector_index is not None:
+            ranked = nlp_service.vector_index.search(query, self.TOP_K)
+        else:
+            ranked = nlp_service.text_index.rank(query, self.TOP_K, nlp_service.index.position)
+        print(f"[DEBUG FIND] Ranked: {ranked}")
+        if len(ranked) > 1 and ranked[0][1] >= self.DOMINANCE * ranked[1][1]:
+            ranked = ranked[:1]
+        return [nlp_service.index.get(note_id) for note_id, _ in ranked]
+
+    def match(self, nlp_service, query: str) -> List[Dict]:
+        # A query made only of tags and and/or/not is answered from the tag index
+        tagged = nlp_service.tag_index.query(query)
+        if tagged is not None:
+            print(f"[DEBUG FIND] Tag query: {query}")
+            return nlp_service.notes_in_order(tagged)
+        if nlp_service.search_mode in ('ranked', 'semantic'):
+            matches = self.ranked_matches(nlp_service, query)
+        else:
+            # 1. Try exact title match first
+            matches = nlp_service.find_notes_by_title(query)
+            if matches:
                 print(f"[DEBUG FIND] -> Exact title match!")
-                matches.append(note)
-        # 2. If no exact match, fallback to substring match
+        # 2. If no exact match, fallback to substring match (trigram candidates, verified)
+        if not matches and nlp_service.substring_index:
+            matches = nlp_service.notes_in_order(nlp_service.substring_index.search(query))
+        # 3. Then the word index (Hebrew prefixes stripped, English case-folded)
         if not matches:
-            for note in notes:
-                title = note.get("title") or ""
-                desc = note.get("description") or ""
-                print(f"[DEBUG FIND] Checking note: title='{title}', desc='{desc}'")
-                if is_hebrew:
-                    if query in title or query in desc:
-                        print(f"[DEBUG FIND] -> Matched (hebrew, substring)!")
-                        matches.append(note)
-                else:
-                    if query.lower() in title.lower() or query.lower() in desc.lower():
-                        print(f"[DEBUG FIND] -> Matched (en, substring)!")
-                        matches.append(note)
+            matches = nlp_service.notes_in_order(nlp_service.text_index.search(query))
+        return matches
+
+    def run(self, params: Dict) -> Dict:
+        nlp_service = params['nlp_service']
+        orig_query = params.get("query", "")
+        cache_key = (" ".join(orig_query.split()), params.get("language"), nlp_service.search_mode)
+        cached = nlp_service.search_cache.get(cache_key, nlp_service.version)
+        if cached is not None:
+            query, match_ids = cached
+            matches = [nlp_service.get_note_by_id(note_id) for note_id in match_ids]
+            print(f"[DEBUG FIND] Cache hit: {orig_query}")
+        else:
+            query = self.extract_search_term(orig_query)
+            print(f"[DEBUG FIND] Original Query: {orig_query} | Extracted: {query}")
+            matches = self.match(nlp_service, query)
+            nlp_service.search_cache.put(cache_key, nlp_service.version, (query, [n["id"] for n in matches]))
+        is_hebrew = query and any(c > 'z' for c in query)
         print(f"[DEBUG] Found {len(matches)} matches: {matches}")
         response = f"נמצאו {len(matches)} רשומות" if is_hebrew else f"Found {len(matches)} notes"
         if len(matches) == 1:
@@ -221,6 +302,11 @@ class FindNoteTool(NoteTool):
         }
 
 class ExtractSubNoteTitleTool:
+    NAMED_HE_RE = re.compile(r"(?:בשם|השם)\s*['\"]?([^'\"]+)['\"]?")
+    SUBNOTE_HE_RE = re.compile(r"(?:תוסיף\s*)?תת[- ]?רשומה(?: בשם)?\s*['\"]?([^'\"]+)['\"]?")
+    NAMED_EN_RE = re.compile(r"(?:called|named|titled)\s*['\"]?([^'\"]+)['\"]?", re.IGNORECASE)
+    SUBNOTE_EN_RE = re.compile(r"(?:sub[- ]?note|child note)\s*(?:called|named|titled)?\s*['\"]?([^'\"]+)['\"]?", re.IGNORECASE)
+
     def __init__(self):
         pass
     def run(self, params: Dict) -> Dict:
@@ -231,12 +317,12 @@ class ExtractSubNoteTitleTool:
         debug_info = {}
         if is_hebrew:
             # Try to extract after 'בשם' or 'השם'
-            match = re.search(r"(?:בשם|השם)\s*['\"]?([^'\"]+)['\"]?", text)
+            match = self.NAMED_HE_RE.search(text)
             if match:
                 title = match.group(1).strip()
             else:
                 # Try to extract after 'תוסיף תת רשומה', 'תת רשומה', 'תת-רשומה', etc.
-                match = re.search(r"(?:תוסיף\s*)?תת[- ]?רשומה(?: בשם)?\s*['\"]?([^'\"]+)['\"]?", text)
+                match = self.SUBNOTE_HE_RE.search(text)
                 if match:
                     title = match.group(1).strip()
                 else:
@@ -249,12 +335,12 @@ class ExtractSubNoteTitleTool:
                             title = candidate
         else:
             # Try to extract after 'called', 'named', 'titled'
-            match = re.search(r"(?:called|named|titled)\s*['\"]?([^'\"]+)['\"]?", text, re.IGNORECASE)
+            match = self.NAMED_EN_RE.search(text)
             if match:
                 title = match.group(1).strip()
             else:
                 # Try to extract after 'sub-note' or 'child note'
-                match = re.search(r"(?:sub[- ]?note|child note)\s*(?:called|named|titled)?\s*['\"]?([^'\"]+)['\"]?", text, re.IGNORECASE)
+                match = self.SUBNOTE_EN_RE.search(text)
                 if match:
                     title = match.group(1).strip()
                 else:
@@ -272,12 +358,10 @@ class ExtractSubNoteTitleTool:
             return {'title': '', 'success': False, 'debug': debug_info, 'response': 'Could not extract sub-note title. Please specify the title.'}
 
 class ConfirmationIntentTool:
+    # Affirmative and negative phrases live in intent_matcher.INTENT_PHRASES
+    # (yes_he, no_he, yes_delete_he, yes_en, no_en) and are matched in one pass
     def __init__(self):
-        # Define affirmative and negative phrases for both languages
-        self.affirmative_he = ["כן", "תוסיף", "צור", "הוסף", "בצע", "אשר", "לך על זה"]
-        self.negative_he = ["לא", "בטל", "אל", "לא רוצה", "אל תבצע", "אל תוסיף", "אל תעדכן"]
-        self.affirmative_en = ["yes", "add", "create", "go ahead", "do it", "confirm", "okay", "sure"]
-        self.negative_en = ["no", "cancel", "don't", "do not", "nope", "stop", "never", "don't do it"]
+        pass
 
     def run(self, params: Dict) -> Dict:
         text = params.get('text', '').strip()
@@ -285,50 +369,104 @@ class ConfirmationIntentTool:
         operation = params.get('pending_action', None)  # Pass this from process_command if available
         normalized_text = unicodedata.normalize('NFKC', text.lower())
         is_hebrew = language == 'he-IL'
+        intents = detect_intents(normalized_text)
         if is_hebrew:
             # Special: if pending action is delete, treat more delete phrases as yes
-            if operation == 'delete':
-                delete_confirm_phrases = [
-                    "תמחק", "מחק", "כן תמחק", "כן מחק", "כן",
-                    "תמחק רשומה", "מחק רשומה", "כן תמחק רשומה", "כן מחק רשומה"
-                ]
-                for phrase in delete_confirm_phrases:
-                    if phrase in normalized_text:
-                        return {'intent': 'yes'}
-            for phrase in self.affirmative_he:
-                if phrase in normalized_text:
-                    return {'intent': 'yes'}
-            for phrase in self.negative_he:
-                if phrase in normalized_text:
-                    return {'intent': 'no'}
+            if operation == 'delete' and 'yes_delete_he' in intents:
+                return {'intent': 'yes'}
+            if 'yes_he' in intents:
+                return {'intent': 'yes'}
+            if 'no_he' in intents:
+                return {'intent': 'no'}
         else:
-            for phrase in self.affirmative_en:
-                if phrase in normalized_text:
-                    return {'intent': 'yes'}
-            for phrase in self.negative_en:
-                if phrase in normalized_text:
-                    return {'intent': 'no'}
+            if 'yes_en' in intents:
+                return {'intent': 'yes'}
+            if 'no_en' in intents:
+                return {'intent': 'no'}
         return {'intent': 'ambiguous'}
 
+class SaveBatch:
+    """Note changes collected while NLPService is in a batch, persisted once at the end."""
+
+    def __init__(self):
+        self.changed: Dict[str, Dict] = {}
+        self.removed: Dict[str, None] = {}
+        self.full = False
+
+    def record(self, changed: Optional[List[Dict]], removed: Optional[List[str]]):
+        if changed is None and removed is None:
+            self.full = True
+            return
+        for note_id in removed or []:
+            self.changed.pop(note_id, None)
+            self.removed[note_id] = None
+        for note in changed or []:
+            self.changed[note["id"]] = note
+            self.removed.pop(note["id"], None)
+
 class NLPService:
-    def __init__(self, api_key: Optional[str] = None):
+    # Confirmation replies used by process_commands for the auto_yes / auto_no policies
+    BATCH_REPLIES = {'he-IL': ('כן', 'לא'), 'en': ('yes', 'no')}
+
+    def __init__(self, api_key: Optional[str] = None, storage_backend: str = 'json', fsync_interval: float = 1.0,
+                 substring_search: bool = True, search_mode: str = 'match', llm_context_budget: int = 2000,
+                 note_history: bool = False):
         self.api_key = api_key
-        self.model = None
-        if api_key:
-            try:
-                genai.configure(api_key=api_key)
-                self.model = genai.GenerativeModel('gemini-2.0-flash')
-            except Exception as e:
-                print(f"[DEBUG] Error initializing Gemini model: {e}")
-                
+        # Tool selection fallback for utterances the rules cannot place (needs an API key)
+        self.llm = LLMClient(api_key) if api_key else None
+        self.prompt_builder = PromptBuilder(budget_chars=llm_context_budget)
+        # On-device intent classifier; only utterances it is unsure about go to the model
+        self.intent_classifier = default_classifier()
+
         # Migrate notes from old location if needed
         self._migrate_notes_if_needed()
         
         # Initialize notes file path and load notes
         self.notes_file = self._get_notes_file_path()
+        self.journal = NoteJournal(self.notes_file)
+        # Note events kept until the daily digest has read them (the journal is compacted away)
+        self.change_feed = ChangeFeed(os.path.splitext(self.notes_file)[0] + '.changes')
+        # Completed notes by done_date, plus the open ones
+        self.done_index = DoneIndex()
+        self.digests = DigestService(self.change_feed, os.path.splitext(self.notes_file)[0] + '.digest.json',
+                                     done_index=self.done_index)
+        self.index = NoteIndex()
+        self.text_index = InvertedIndex()
+        self.tag_index = TagIndex()
+        # Optional trigram index that keeps substring semantics for title fragments
+        self.substring_index = TrigramIndex() if substring_search else None
+        # 'match' (all matches, notebook order), 'ranked' (BM25 top-k) or 'semantic' (n-gram vectors)
+        self.search_mode = search_mode
+        # Dense n-gram vectors for 'semantic' search; only kept when that mode is configured
+        self.vector_index = VectorIndex() if search_mode == 'semantic' else None
+        # 'depends_on' relations with a maintained topological order and ready set
+        self.dependencies = DependencyGraph(lambda note_id: self.index.get(note_id))
+        # Graph edges (parent -> child, prerequisite -> dependent) for visualization
+        self.relation_index = RelationIndex()
+        # Inverse deltas of note changes, one step per save, for "undo" / "redo"
+        self.history = UndoHistory()
+        # Subtree summaries cached per note, invalidated along the path to the root
+        self.summaries = SummaryService(self)
+        # Bumped on every note mutation; cached search results from older versions are discarded
+        self.version = 0
+        self.search_cache = SearchCache()
+        # Note writes are handed to a background thread so the UI never waits on the disk
+        self.persister = NotePersister(self.journal, fsync_interval=fsync_interval)
+        # Optional SQLite backend; None keeps notes.json + journal as the source of truth
+        self.note_store = None
+        if storage_backend == 'sqlite':
+            self.note_store = NoteStore(os.path.splitext(self.notes_file)[0] + '.db')
+        # Optional past versions of the notebook (structurally shared), for notes_at()
+        self.versions = None
         self.notes, self.last_note_id = self._load_notes_and_last_id()
+        if note_history:
+            self.versions = NoteVersions(os.path.splitext(self.notes_file)[0] + '.history',
+                                         write=self.persister.append_to)
+            self.versions.sync(self.notes)
         self.conversation_state = None  # Track conversation state
+        self.state_handlers = default_state_handlers()  # state key -> ConversationState handler
         self.conversation_history = []  # Store recent user/agent messages
+        self._batch = None  # SaveBatch while inside batch()
         
         # Initialize tools with notes
         self.tools = {
@@ -426,381 +564,443 @@ The JSON must be in this exact format:
         return file_path
 
     def _load_notes_and_last_id(self):
+        if self.note_store:
+            return self._load_from_store()
+        return self._load_json_notes()
+
+    def _load_json_notes(self):
+        # Queued writes must land before the files are read back
+        self.persister.flush()
         try:
+            notes, last_note_id = [], None
             if os.path.exists(self.notes_file):
                 print(f"[DEBUG] Loading notes from: {self.notes_file}")
                 with open(self.notes_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                     notes = data.get('notes', [])
                     last_note_id = data.get('last_note_id')
-                    if last_note_id is None:
-                        # Infer from max existing note ID
-                        max_id = 0
-                        for n in notes:
-                            try:
-                                max_id = max(max_id, int(n.get('id', 0)))
-                            except Exception:
-                                pass
-                        last_note_id = max_id
-                    print(f"[DEBUG] Loaded {len(notes)} notes, last_note_id={last_note_id}")
-                    return notes, last_note_id
             else:
                 print(f"[DEBUG] Notes file does not exist: {self.notes_file}")
+            notes, last_note_id = self.journal.replay(notes, last_note_id)
+            if last_note_id is None:
+                # Infer from max existing note ID
+                max_id = 0
+                for n in notes:
+                    try:
+                        max_id = max(max_id, int(n.get('id', 0)))
+                    except Exception:
+                        pass
+                last_note_id = max_id
+            print(f"[DEBUG] Loaded {len(notes)} notes, last_note_id={last_note_id}")
+            return notes, last_note_id
         except Exception as e:
             print(f"[DEBUG] Error loading notes: {e}")
         return [], 0
 
-    def _save_notes(self):
-        import os
-        print(f"[DEBUG] _save_notes called. File: {self.notes_file}")
-        # Log file contents before saving
-        if os.path.exists(self.notes_file):
-            with open(self.notes_file, 'r', encoding='utf-8') as f:
-                before = f.read()
-            print(f"[DEBUG] notes.json BEFORE save:\n{before}")
+    def _save_notes(self, changed: Optional[List[Dict]] = None, removed: Optional[List[str]] = None):
+        """Persist notes.
+
+        With ``changed``/``removed`` only those notes are appended to the journal;
+        without arguments the whole notebook is written as a fresh snapshot. JSON
+        writes are queued on the background persister; call ``flush()`` to wait.
+        """
+        if self._batch is not None:
+            self._batch.record(changed, removed)
+            return
+        self.change_feed.commit()
+        self.history.seal()
+        if self.versions is not None:
+            if changed is not None or removed is not None:
+                self.versions.record(changed or [], removed or [])
+            else:
+                self.versions.sync(self.notes)
+        if self.note_store:
+            if changed is not None or removed is not None:
+                self.note_store.save(changed or [], removed or [], self.last_note_id)
+            else:
+                self.note_store.replace_all(self.notes, self.last_note_id)
+            print(f"[DEBUG] Saved notes to SQLite store: {self.note_store.db_path}")
+            return
+        if changed is not None or removed is not None:
+            records = [NoteJournal.delete_record(note_id, self.last_note_id) for note_id in removed or []]
+            records += [NoteJournal.put_record(note, self.last_note_id) for note in changed or []]
+            self.persister.append(NoteJournal.encode(records))
+            print(f"[DEBUG] Queued {len(records)} note changes for: {self.journal.journal_path}")
+            return
+        print(f"[DEBUG] Queued snapshot of {len(self.notes)} notes for: {self.notes_file}")
+        payload = json.dumps({'last_note_id': self.last_note_id, 'notes': self.notes}, ensure_ascii=False)
+        self.persister.write_snapshot(payload)
+
+    @contextmanager
+    def batch(self):
+        """Collect every save made inside the block and persist them once on exit.
+
+        Conversation history is not recorded while a batch is open.
+        """
+        if self._batch is not None:
+            yield self._batch
+            return
+        self._batch = SaveBatch()
+        try:
+            yield self._batch
+        finally:
+            batch, self._batch = self._batch, None
+            if batch.full:
+                self._save_notes()
+            elif batch.changed or batch.removed:
+                self._save_notes(changed=list(batch.changed.values()), removed=list(batch.removed))
+
+    def record_history(self, role: str, text: str, language: str):
+        if self._batch is not None:
+            return
+        self.conversation_history.append({'role': role, 'text': text, 'language': language})
+        if len(self.conversation_history) > 10:
+            self.conversation_history = self.conversation_history[-10:]
+
+    def flush(self):
+        """Block until all queued note writes are on disk (call on shutdown)."""
+        self.change_feed.commit()
+        # Also with SQLite: the version history is written through the persister
+        self.persister.flush()
+
+    def _load_from_store(self):
+        """Load notes from the SQLite store, importing notes.json the first time it is used."""
+        if self.note_store.is_empty():
+            notes, last_note_id = self._load_json_notes()
+            if notes:
+                print(f"[DEBUG] Importing {len(notes)} notes from {self.notes_file} into SQLite store")
+                self.note_store.replace_all(notes, last_note_id)
+        return self.note_store.load()
+
+    @property
+    def notes(self) -> List[Dict]:
+        return self._notes
+
+    @notes.setter
+    def notes(self, notes: List[Dict]):
+        # Assigning a new list (load, reset) rebuilds every index over it
+        self._notes = notes
+        self.version += 1
+        self.summaries.clear()
+        self.history.clear()
+        self.index.rebuild(notes)
+        self.dependencies.rebuild(notes)
+        self.relation_index.rebuild(notes, self.dependencies.depends_on)
+        self.text_index.rebuild(notes)
+        self.tag_index.rebuild(notes)
+        self.done_index.rebuild(notes)
+        if self.substring_index:
+            self.substring_index.rebuild(notes)
+        if self.vector_index is not None:
+            self.vector_index.rebuild(notes)
+
+    def add_note(self, note: Dict):
+        """Append a note to the notebook and index it."""
+        self.version += 1
+        self.summaries.invalidate(note.get("parent_id"))
+        self.change_feed.record('created', note)
+        self.history.record_add(note)
+        self.index.add(note)
+        self._notes.append(note)
+        relinked = self.dependencies.add(note)
+        self.relation_index.sync(note, self.dependencies.depends_on.get(note["id"], ()))
+        for dependent_id in relinked:
+            self.relation_index.sync(self.index.get(dependent_id), self.dependencies.depends_on[dependent_id])
+        self.text_index.add(note)
+        self.tag_index.add(note)
+        self.done_index.add(note)
+        if self.substring_index:
+            self.substring_index.add(note)
+        if self.vector_index is not None:
+            self.vector_index.add(note)
+
+    def update_note(self, note: Dict, changes: Dict):
+        """Apply field changes to a note, keeping the indexes in sync."""
+        self.version += 1
+        self.summaries.invalidate(note["id"])  # old path, in case the note moves
+        if "done" in changes and bool(changes["done"]) != bool(note.get("done")):
+            event = 'done' if changes["done"] else 'undone'
         else:
-            print("[DEBUG] notes.json does not exist before save.")
-        print(f"[DEBUG] Saving {len(self.notes)} notes to: {self.notes_file}")
-        with open(self.notes_file, 'w', encoding='utf-8') as f:
-            import json
-            json.dump({'last_note_id': self.last_note_id, 'notes': self.notes}, f, ensure_ascii=False, indent=2)
-        # Log file contents after saving
-        with open(self.notes_file, 'r', encoding='utf-8') as f:
-            after = f.read()
-        print(f"[DEBUG] notes.json AFTER save:\n{after}")
-        print("[DEBUG] Notes saved successfully")
+            event = 'updated'
+        old_parent_id = note.get("parent_id")
+        self.history.record_update(note, changes)
+        self.index.update(note, changes)
+        self.dependencies.update(note, old_parent_id)
+        self.relation_index.sync(note, self.dependencies.depends_on.get(note["id"], ()))
+        self.summaries.invalidate(note["id"])
+        self.change_feed.record(event, note)
+        if "tags" in changes:
+            self.tag_index.update(note)
+        if "done" in changes or "done_date" in changes:
+            self.done_index.update(note)
+        if "title" in changes or "description" in changes:
+            self.text_index.update(note)
+            if self.substring_index:
+                self.substring_index.update(note)
+            if self.vector_index is not None:
+                self.vector_index.update(note)
+
+    def remove_note(self, note: Dict, unlink: bool = True):
+        """Remove a note from the notebook, keeping the order of the others."""
+        self.version += 1
+        self.summaries.invalidate(note["id"])
+        self.change_feed.record('deleted', note)
+        siblings = self.index.children.get(note.get("parent_id"))
+        in_parent = siblings.index(note["id"]) if unlink and siblings and note["id"] in siblings else None
+        self.history.record_remove(note, in_parent)
+        # Positions only grow along the list, so the note's slot is found by binary search
+        slot = bisect_left(self._notes, self.index.position[note["id"]], key=lambda n: self.index.position[n["id"]])
+        self.index.remove(note, unlink=unlink)
+        self.dependencies.remove(note)
+        self.relation_index.remove(note["id"])
+        self.text_index.remove(note["id"])
+        self.tag_index.remove(note["id"])
+        self.done_index.remove(note["id"])
+        if self.substring_index:
+            self.substring_index.remove(note["id"])
+        if self.vector_index is not None:
+            self.vector_index.remove(note["id"])
+        del self._notes[slot]
+
+    def delete_subtree(self, note: Dict) -> List[Dict]:
+        """Delete a note with all its descendants, persisted as a single batch."""
+        removed, pruned = self._remove_subtree(note)
+        parent = self.get_note_by_id(note["parent_id"]) if note.get("parent_id") else None
+        self._save_notes(changed=([parent] if parent else []) + pruned, removed=[n["id"] for n in removed])
+        return removed
+
+    def _remove_subtree(self, note: Dict) -> Tuple[List[Dict], List[Dict]]:
+        """Remove a note and its descendants; returns them and the notes that depended on them.
+
+        The removed ids are first dropped from the dependents' stored
+        ``relations['depends_on']``, as updates, so an undo restores them.
+        """
+        # O(subtree): only the root is unlinked from its parent's children list
+        removed = [self.index.get(note_id) for note_id in self.index.descendants(note["id"])]
+        removed_ids = {n["id"] for n in removed}
+        pruned_ids = {dependent_id for note_id in removed_ids
+                      for dependent_id in self.dependencies.dependents.get(note_id, ())} - removed_ids
+        pruned = [self.index.get(dependent_id) for dependent_id in sorted(pruned_ids, key=self.index.position.get)]
+        for dependent in pruned:
+            relations = dict(dependent.get("relations") or {})
+            relations["depends_on"] = [i for i in relations.get("depends_on") or [] if i not in removed_ids]
+            self.update_note(dependent, {"relations": relations})
+        for descendant in removed[1:]:
+            self.remove_note(descendant, unlink=False)
+        self.remove_note(note)
+        return removed, pruned
+
+    def add_dependency(self, note: Dict, prerequisite: Dict):
+        """Make ``note`` wait for ``prerequisite``; raises DependencyCycleError on a cycle."""
+        if self.dependencies.creates_cycle(prerequisite["id"], note["id"]):
+            raise DependencyCycleError(note["id"])
+        relations = dict(note.get("relations") or {})
+        depends_on = list(relations.get("depends_on") or [])
+        if prerequisite["id"] in depends_on:
+            return
+        relations["depends_on"] = depends_on + [prerequisite["id"]]
+        self.update_note(note, {"relations": relations})
+        self._save_notes(changed=[note])
+
+    def add_tags(self, note: Dict, tags: List[str]) -> List[str]:
+        """Add tags a note does not have yet; returns the ones added."""
+        existing = {normalize(tag) for tag in note.get("tags") or []}
+        added = []
+        for tag in tags:
+            if tag and normalize(tag) not in existing:
+                existing.add(normalize(tag))
+                added.append(tag)
+        if added:
+            self.update_note(note, {"tags": list(note.get("tags") or []) + added})
+            self._save_notes(changed=[note])
+        return added
+
+    def mark_done(self, note: Dict, done: bool = True):
+        """Set a note's done flag; done_date records when it was completed."""
+        done_date = datetime.now().isoformat(timespec='seconds') if done else None
+        self.update_note(note, {"done": done, "done_date": done_date})
+        self._save_notes(changed=[note])
+
+    def done_notes(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """Notes completed in ``[start, end)`` (ISO dates), oldest first."""
+        return [self.index.get(note_id) for note_id in self.done_index.range(start, end)]
+
+    def next_tasks(self, k: int = 5, within: Optional[Dict] = None) -> List[Dict]:
+        """Open leaf tasks whose prerequisites are all done, optionally under one note."""
+        scope = set(self.index.descendants(within["id"])) if within else None
+        return [self.index.get(note_id) for note_id in self.dependencies.next_tasks(k, scope)]
+
+    def notes_at(self, version: Optional[int] = None, when=None) -> List[Dict]:
+        """The notebook as saved at ``version`` or at a time (datetime or ISO string).
+
+        Needs ``note_history``; without it only the current notebook (no arguments) is known.
+        """
+        if self.versions is None:
+            return [] if version is not None or when is not None else list(self.notes)
+        return self.versions.notes_at(version, when)
+
+    def undo(self) -> Optional[List[Dict]]:
+        """Revert the last saved change; returns its deltas, or None if there is nothing to undo."""
+        deltas = self.history.pop_undo()
+        if deltas is not None:
+            self._apply_deltas(deltas, undo=True)
+        return deltas
+
+    def redo(self) -> Optional[List[Dict]]:
+        deltas = self.history.pop_redo()
+        if deltas is not None:
+            self._apply_deltas(deltas, undo=False)
+        return deltas
+
+    def _apply_deltas(self, deltas: List[Dict], undo: bool):
+        touched = set()
+        self.history.suspended = True
+        try:
+            if undo:
+                removed = []  # a deleted subtree is restored together, parents first
+                for delta in reversed(deltas):
+                    if delta["op"] == "remove":
+                        removed.append(delta)
+                        continue
+                    self._restore_removed(removed, touched)
+                    removed = []
+                    if delta["op"] == "add":
+                        note = self.index.get(delta["note"]["id"])
+                        if note:
+                            touched.update((note["id"], note.get("parent_id")))
+                            self.remove_note(note)
+                    else:
+                        self._apply_update(delta["id"], delta["before"], touched)
+                self._restore_removed(removed, touched)
+            else:
+                for delta in deltas:
+                    if delta["op"] == "add":
+                        note = dict(copy.deepcopy(delta["note"]), children=[])
+                        self.add_note(note)
+                        touched.update((note["id"], note.get("parent_id")))
+                    elif delta["op"] == "update":
+                        self._apply_update(delta["id"], delta["after"], touched)
+                    else:
+                        note = self.index.get(delta["note"]["id"])
+                        if note:
+                            touched.update((note["id"], note.get("parent_id")))
+                            self.remove_note(note, unlink=delta["position"] is not None)
+        finally:
+            self.history.suspended = False
+        touched.discard(None)
+        self._save_notes(changed=[self.index.get(i) for i in touched if self.index.get(i)],
+                         removed=[i for i in touched if not self.index.get(i)])
+
+    def _apply_update(self, note_id: str, values: Dict, touched: set):
+        note = self.index.get(note_id)
+        if note:
+            touched.update((note_id, note.get("parent_id"), values.get("parent_id")))
+            self.update_note(note, copy.deepcopy(values))
+
+    def _restore_removed(self, deltas: List[Dict], touched: set):
+        """Re-add removed notes parents first; add_note rebuilds the children lists in their old order."""
+        if not deltas:
+            return
+        by_id = {delta["note"]["id"]: delta for delta in deltas}
+        stack = [delta for delta in reversed(deltas) if delta["note"].get("parent_id") not in by_id]
+        while stack:
+            delta = stack.pop()
+            note = dict(copy.deepcopy(delta["note"]), children=[])
+            self.add_note(note)
+            touched.update((note["id"], note.get("parent_id")))
+            siblings = self.index.children.get(note.get("parent_id"))
+            if delta["position"] is not None and siblings:
+                siblings.remove(note["id"])
+                siblings.insert(delta["position"], note["id"])
+            stack.extend(by_id[child_id] for child_id in reversed(delta["note"].get("children", ())) if child_id in by_id)
+
+    def get_note_by_id(self, note_id: str) -> Optional[Dict]:
+        return self.index.get(note_id)
+
+    def find_note_by_title(self, title: str) -> Optional[Dict]:
+        return self.index.find_by_title(title)
+
+    def find_notes_by_title(self, title: str) -> List[Dict]:
+        return self.index.find_all_by_title(title)
+
+    def notes_in_order(self, note_ids) -> List[Dict]:
+        """Resolve ids to notes, in notebook order."""
+        position = self.index.position
+        return [self.index.get(note_id) for note_id in sorted(note_ids, key=lambda i: position.get(i, 0))]
+
+    def find_note_by_spoken_title(self, text: str) -> Optional[Dict]:
+        """Exact title, else a note whose normalized title (case, niqqud, final letters) equals ``text``."""
+        text = text.strip()
+        note = self.find_note_by_title(text)
+        if note or not text:
+            return note
+        wanted = tokenize(text)
+        for candidate in self.notes_in_order(self.text_index.search(text)):
+            if tokenize(candidate.get("title")) == wanted:
+                return candidate
+        return None
+
+    def find_child_by_title(self, parent_id: Optional[str], title: str) -> Optional[Dict]:
+        """Find a note by title among the children of ``parent_id`` (None for top-level notes)."""
+        return self.index.find_child_by_title(parent_id, title)
 
     def get_relations(self) -> List[Dict]:
         """Get relationships between notes for graph visualization."""
-        relations = []
-        for note in self.notes:
-            if note.get("parent_id"):
-                relations.append({"source": note["parent_id"], "target": note["id"]})
-        return relations
+        return self.relation_index.relations()
+
+    def subgraph(self, note_ids, hops: int = 1, include=('parent', 'children')) -> Dict:
+        """Notes within ``hops`` steps of ``note_ids`` and the relations between them.
+
+        ``include`` picks the steps to follow: 'parent', 'children', 'depends_on'
+        (prerequisites) and 'dependents'. Cost follows the size of the result.
+        """
+        unknown = set(include) - set(NEIGHBOR_KINDS)
+        if unknown:
+            raise ValueError(f"Unknown relation kinds: {sorted(unknown)}")
+        found = {note_id for note_id in note_ids if self.index.get(note_id)}
+        frontier = list(found)
+        for _ in range(hops):
+            next_frontier = []
+            for note_id in frontier:
+                for neighbor in self._neighbors(note_id, include):
+                    if neighbor not in found and self.index.get(neighbor):
+                        found.add(neighbor)
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        return {"notes": self.notes_in_order(found), "relations": self.relation_index.between(found)}
+
+    def _neighbors(self, note_id: str, include):
+        note = self.index.get(note_id)
+        if 'parent' in include and note.get("parent_id"):
+            yield note["parent_id"]
+        if 'children' in include:
+            yield from note.get("children", ())
+        if 'depends_on' in include:
+            yield from self.dependencies.depends_on.get(note_id, ())
+        if 'dependents' in include:
+            yield from self.dependencies.dependents.get(note_id, ())
 
-    def process_command(self, text: str, language: str = 'en') -> Dict:
+    def process_command(self, text: str, language: str = 'en', escalate: bool = True) -> Dict:
+        """Handle one utterance; ``escalate=False`` never sends unmatched text to the model."""
         try:
             print(f"[DEBUG NLP] process_command called with text: '{text}', language: {language}, conversation_state: {self.conversation_state}")
             print(f"[DEBUG NLP] re module id: {id(re) if 're' in globals() else 'NOT FOUND'}")
+            # The user spoke again: answers to earlier model requests are no longer wanted
+            if self.llm:
+                self.llm.cancel_pending()
             # Add to conversation history
-            self.conversation_history.append({'role': 'user', 'text': text, 'language': language})
-            if len(self.conversation_history) > 10:
-                self.conversation_history = self.conversation_history[-10:]
+            self.record_history('user', text, language)
             print(f"[DEBUG NLP] Raw text repr: {repr(text)}")
             # Normalize text for robust matching
             normalized_text = unicodedata.normalize('NFKC', text.strip())
-            is_hebrew = language == 'he-IL'
+            # Every trigger phrase found in the utterance, in a single pass (case-insensitive)
+            intents = detect_intents(normalized_text.lower())
 
-            # --- Handle multi-turn state for update/delete/add_sub_note/create after find ---
-            if self.conversation_state and self.conversation_state.get('operation') == 'create':
-                # Confirmation for create (including sub-notes)
-                pending_note = self.conversation_state.get('pending_note')
-                pending_title = self.conversation_state.get('pending_title', '')
-                pending_action = 'create'
-                intent_result = self.tools['confirmation_intent'].run({'text': text, 'language': language, 'pending_action': pending_action})
-                is_yes = intent_result['intent'] == 'yes'
-                is_no = intent_result['intent'] == 'no'
-                if is_yes:
-                    # Actually create the note (or sub-note)
-                    result = self.tools['create'].run(pending_note)
-                    self.conversation_state = None
-                    self.conversation_history.append({'role': 'agent', 'text': result['response'], 'language': language})
-                    return result
-                elif is_no:
-                    self.conversation_state = None
-                    response = "בסדר, ביטלתי את הפעולה." if is_hebrew else "OK, I've cancelled the action."
-                    self.conversation_history.append({'role': 'agent', 'text': response, 'language': language})
-                    return {"operation": "create_cancel", "response": response, "requires_confirmation": False}
-                else:
-                    # Ask again
-                    response = (
-                        f"אנא אשר או בטל: ליצור רשומה חדשה בשם '{pending_title}'?" if is_hebrew
-                        else f"Please confirm or cancel: create a new note called '{pending_title}'?"
-                    )
-                    self.conversation_history.append({'role': 'agent', 'text': response, 'language': language})
-                    return {"operation": "create_confirm", "response": response, "requires_confirmation": True}
-            # --- Sub-note creation intent detection (add_sub_note) ---
-            if self.conversation_state and self.conversation_state.get('current_note'):
-                current_note = self.conversation_state['current_note']
-                # Detect sub-note intent (Hebrew and English)
-                subnote_triggers_he = ["תת רשומה", "תת-רשומה", "תוסיף תת רשומה", "הוסף תת רשומה"]
-                subnote_triggers_en = ["sub-note", "sub note", "child note", "add sub-note", "add child note"]
-                if (is_hebrew and any(trigger in normalized_text for trigger in subnote_triggers_he)) or (not is_hebrew and any(trigger in normalized_text for trigger in subnote_triggers_en)):
-                    # Extract sub-note title
-                    extract_result = self.tools['extract_sub_note_title'].run({'text': text, 'language': language})
-                    title = extract_result.get('title', '').strip()
-                    if not title:
-                        response = extract_result.get('response', 'Please specify the sub-note title.')
-                        self.conversation_history.append({'role': 'agent', 'text': response, 'language': language})
-                        return {"operation": "add_sub_note", "response": response, "requires_confirmation": False}
-                    # Check if sub-note already exists under this parent
-                    notes = self.notes
-                    parent_id = current_note['id']
-                    existing_note = next((n for n in notes if n["title"] == title and n.get("parent_id") == parent_id), None)
-                    if existing_note:
-                        response = (
-                            f"רשומת משנה בשם '{title}' כבר קיימת תחת {current_note['title']}." if is_hebrew
-                            else f"A sub-note called '{title}' already exists under {current_note['title']}."
-                        )
-                        self.conversation_history.append({'role': 'agent', 'text': response, 'language': language})
-                        return {"operation": "add_sub_note", "response": response, "requires_confirmation": False}
-                    # Prompt for confirmation before creating sub-note
-                    response = (
-                        f"האם להוסיף תת-רשומה בשם '{title}' תחת '{current_note['title']}'?" if is_hebrew
-                        else f"Do you want me to add a sub-note called '{title}' under '{current_note['title']}'?"
-                    )
-                    self.conversation_state = {
-                        'operation': 'create',
-                        'pending_note': {
-                            'title': title,
-                            'parent_id': parent_id,
-                            'nlp_service': self,
-                            'original_text': text,
-                            'requires_confirmation': True
-                        },
-                        'confirm_action': 'create',
-                        'pending_title': title
-                    }
-                    self.conversation_history.append({'role': 'agent', 'text': response, 'language': language})
-                    return {"operation": "add_sub_note_confirm", "response": response, "requires_confirmation": True}
-            # Hebrew create intent detection
-            create_triggers_he = [
-                "צור", "הוסף", "חדש", "כתוב", "רשום", "זכור",
-                "תיצור", "תיצרי", "תיצרו"
-            ]
-            if is_hebrew and any(trigger in normalized_text for trigger in create_triggers_he):
-                # Use regex to remove trigger + optional 'רשומה חדשה' at the start
-                pattern = r'^(?:' + '|'.join(create_triggers_he) + r')\s*(?:רשומה)?\s*(?:חדשה)?\s*(.*)'
-                match = re.match(pattern, normalized_text)
-                title = match.group(1).strip() if match and match.group(1) else ''
-                if not title:
-                    title = "ללא שם"  # fallback: Untitled
-                # Check if note exists
-                notes = self.notes
-                existing_note = next((n for n in notes if n["title"] == title), None)
-                if existing_note:
-                    response = (
-                        f"רשומה בשם '{title}' כבר קיימת." if is_hebrew
-                        else f"A note with the name '{title}' already exists."
-                    )
-                    self.conversation_history.append({'role': 'agent', 'text': response, 'language': language})
-                    return {"operation": "create", "response": response, "requires_confirmation": False}
-                # Prompt for confirmation before creating
-                response = (
-                    f"האם ליצור רשומה חדשה בשם '{title}'?" if is_hebrew
-                    else f"Do you want me to create a new note called '{title}'?"
-                )
-                self.conversation_state = {
-                    'operation': 'create',
-                    'pending_note': {
-                        'title': title,
-                        'nlp_service': self,
-                        'original_text': text,
-                        'requires_confirmation': True
-                    },
-                    'confirm_action': 'create',
-                    'pending_title': title
-                }
-                self.conversation_history.append({'role': 'agent', 'text': response, 'language': language})
-                return {"operation": "create_confirm", "response": response, "requires_confirmation": True}
-            # --- Handle multi-turn state for update/delete/add_sub_note after find ---
-            if self.conversation_state and self.conversation_state.get('current_note'):
-                print(f"[DEBUG CONTEXT] Using current_note from context: {self.conversation_state['current_note']}")
-                current_note = self.conversation_state['current_note']
-                is_hebrew = language == 'he-IL'
-                # Detect update intent directly after generic prompt
-                update_triggers_he = [
-                    "עדכן", "שנה", "ערוך", "הוסף ל", "לעדכן", "לעדכן תוכן", "לעדכן רשומה", "לעדכן את הרשומה", "לעדכן את התוכן"
-                ]
-                update_triggers_en = [
-                    "update", "change", "modify", "edit", "add to", "append"
-                ]
-                update_intent = (
-                    (is_hebrew and any(trigger in normalized_text for trigger in update_triggers_he)) or
-                    (not is_hebrew and any(trigger in normalized_text for trigger in update_triggers_en))
-                )
-                if update_intent:
-                    # Prompt for new content
-                    response = (
-                        "מה תרצה לעדכן? אנא אמור את התוכן החדש לרשומה." if is_hebrew
-                        else "What would you like to update? Please say the new content for the note."
-                    )
-                    self.conversation_state = {
-                        'operation': 'update_pending_content',
-                        'pending_note': {
-                            'target_id': current_note['id'],
-                            'nlp_service': self
-                        },
-                        'current_note': current_note
-                    }
-                    self.conversation_history.append({'role': 'agent', 'text': response, 'language': language})
-                    return {"operation": "update_ask_content", "response": response, "requires_confirmation": False}
-                # Detect delete intent directly after generic prompt
-                delete_phrases = [
-                    "מחק", "תמחק", "תמחוק", "למחוק", "מחק רשומה", "תמחק רשומה", "תמחוק רשומה",
-                    "delete", "remove", "erase", "delete note", "remove note", "erase note"
-                ]
-                # Use regex for Hebrew variants
-                delete_intent = any(phrase in normalized_text for phrase in delete_phrases) or (
-                    is_hebrew and re.search(r"\b(מחק|תמחק|תמחוק|למחוק)\b", normalized_text)
-                )
-                if delete_intent:
-                    found_note = current_note
-                    self.conversation_state = {
-                        'operation': 'delete',
-                        'pending_note': {
-                            'target_id': found_note['id'],
-                            'requires_confirmation': True
-                        },
-                        'confirm_action': 'delete',
-                        'found_note': found_note,
-                        'current_note': found_note
-                    }
-                    response = (
-                        f"האם למחוק את הרשומה {found_note['title']}?" if is_hebrew
-                        else f"Delete the note {found_note['title']}?"
-                    )
-                    print(f"[DEBUG DELETE] Returning delete confirmation: {response}")
-                    self.conversation_history.append({'role': 'agent', 'text': response, 'language': language})
-                    return {'response': response, 'requires_confirmation': True}
-            # --- Existing confirmation state for update/delete ---
-            if self.conversation_state and self.conversation_state.get('operation') == 'update':
-                print(f"[DEBUG NLP] In update confirmation state: {self.conversation_state}")
-                is_hebrew = language == 'he-IL'
-                pending_action = 'update'
-                intent_result = self.tools['confirmation_intent'].run({'text': text, 'language': language, 'pending_action': pending_action})
-                print(f"[DEBUG NLP] ConfirmationIntentTool result: {intent_result}")
-                print(f"[DEBUG NLP] Operation: update")
-                print(f"[DEBUG NLP] Pending note: {self.conversation_state.get('pending_note')}")
-                is_yes = intent_result['intent'] == 'yes'
-                is_no = intent_result['intent'] == 'no'
-                if is_yes:
-                    print("[DEBUG NLP] User confirmed update.")
-                    pending_note = self.conversation_state.get("pending_note")
-                    pending_note["requires_confirmation"] = False
-                    if 'nlp_service' not in pending_note:
-                        pending_note['nlp_service'] = self
-                    tool = self.tools.get('update')
-                    if tool:
-                        result = tool.run(pending_note)
-                        result["notes_updated"] = True
-                    else:
-                        result = {"response": "Error: Update tool not found."}
-                    self.conversation_state = None
-                    print(f"[DEBUG NLP] Returning result after update confirmation: {result}")
-                    self.conversation_history.append({'role': 'agent', 'text': result['response'], 'language': language})
-                    return result
-                elif is_no:
-                    print("[DEBUG NLP] User denied update.")
-                    self.conversation_state = None
-                    result = {
-                        "response": "בסדר, ביטלתי את הפעולה." if is_hebrew else "OK, I've cancelled the action."
-                    }
-                    self.conversation_history.append({'role': 'agent', 'text': result['response'], 'language': language})
-                    return result
-                else:
-                    # Ambiguous: prompt again for confirmation
-                    current_note = self.conversation_state.get('current_note')
-                    updates = self.conversation_state.get('pending_note', {}).get('updates', '')
-                    response = (
-                        f"אנא אשר או בטל: לעדכן את הרשומה '{current_note['title']}' עם התוכן הבא?\n{updates}" if is_hebrew
-                        else f"Please confirm or cancel: update the note '{current_note['title']}' with the following content?\n{updates}"
-                    )
-                    self.conversation_history.append({'role': 'agent', 'text': response, 'language': language})
-                    return {"operation": "update_confirm", "response": response, "requires_confirmation": True}
-            # --- Confirmation state for delete ---
-            if self.conversation_state and self.conversation_state.get('operation') == 'delete':
-                print(f"[DEBUG NLP] In delete confirmation state: {self.conversation_state}")
-                is_hebrew = language == 'he-IL'
-                pending_action = 'delete'
-                intent_result = self.tools['confirmation_intent'].run({'text': text, 'language': language, 'pending_action': pending_action})
-                print(f"[DEBUG NLP] ConfirmationIntentTool result: {intent_result}")
-                print(f"[DEBUG NLP] Operation: delete")
-                print(f"[DEBUG NLP] Pending note: {self.conversation_state.get('pending_note')}")
-                is_yes = intent_result['intent'] == 'yes'
-                is_no = intent_result['intent'] == 'no'
-                if is_yes:
-                    print("[DEBUG NLP] User confirmed delete.")
-                    pending_note = self.conversation_state.get("pending_note")
-                    pending_note["requires_confirmation"] = False
-                    if 'nlp_service' not in pending_note:
-                        pending_note['nlp_service'] = self
-                    tool = self.tools.get('delete')
-                    if tool:
-                        result = tool.run(pending_note)
-                    else:
-                        result = {"response": "Error: Delete tool not found.", "operation": "delete"}
-                    self.conversation_state = None
-                    print(f"[DEBUG NLP] Returning result after delete confirmation: {result}")
-                    self.conversation_history.append({'role': 'agent', 'text': result['response'], 'language': language})
-                    return result
-                elif is_no:
-                    print("[DEBUG NLP] User denied delete.")
-                    self.conversation_state = None
-                    result = {
-                        "response": "בסדר, ביטלתי את הפעולה." if is_hebrew else "OK, I've cancelled the action.",
-                        "operation": "delete_cancel"
-                    }
-                    self.conversation_history.append({'role': 'agent', 'text': result['response'], 'language': language})
-                    return result
-                else:
-                    # Ambiguous: prompt again for confirmation
-                    current_note = self.conversation_state.get('current_note')
-                    response = (
-                        f"אנא אשר או בטל: למחוק את הרשומה '{current_note['title']}'?" if is_hebrew
-                        else f"Please confirm or cancel: delete the note '{current_note['title']}'?"
-                    )
-                    self.conversation_history.append({'role': 'agent', 'text': response, 'language': language})
-                    return {"operation": "delete_confirm", "response": response, "requires_confirmation": True}
-            # --- Multi-turn: handle pending update content ---
-            if self.conversation_state and self.conversation_state.get('operation') == 'update_pending_content':
-                # The user's message is the new content for the update
-                current_note = self.conversation_state.get('current_note')
-                pending_note = self.conversation_state.get('pending_note', {})
-                # Check if the user input is a confirmation/denial (should not be treated as content)
-                intent_result = self.tools['confirmation_intent'].run({'text': text, 'language': language, 'pending_action': 'update'})
-                if intent_result['intent'] in ('yes', 'no'):
-                    # User said 'yes' or 'no' instead of providing content
-                    is_hebrew = language == 'he-IL'
-                    response = (
-                        "אנא אמור את התוכן החדש לעדכון הרשומה." if is_hebrew
-                        else "Please provide the new content to update the note."
-                    )
-                    self.conversation_history.append({'role': 'agent', 'text': response, 'language': language})
-                    return {"operation": "update_ask_content", "response": response, "requires_confirmation": False}
-                # Otherwise, treat as new content
-                pending_note['updates'] = text.strip()
-                # Prompt for confirmation
-                is_hebrew = language == 'he-IL'
-                response = (
-                    f"האם לעדכן את הרשומה '{current_note['title']}' עם התוכן הבא?\n{text.strip()}" if is_hebrew
-                    else f"Update the note '{current_note['title']}' with the following content?\n{text.strip()}"
-                )
-                self.conversation_state = {
-                    'operation': 'update',
-                    'pending_note': pending_note,
-                    'confirm_action': 'update',
-                    'current_note': current_note
-                }
-                self.conversation_history.append({'role': 'agent', 'text': response, 'language': language})
-                return {"operation": "update_confirm", "response": response, "requires_confirmation": True}
-            # --- Find command: update context if single note found ---
-            response = self.tools['find'].run({'query': text, 'nlp_service': self})
-            matches = response.get('matches', [])
-            if len(matches) == 1:
-                print(f"[DEBUG CONTEXT] Switching context to note: {matches[0]}")
-                self.conversation_state = {'current_note': matches[0]}
-                response_text = (
-                    "נמצאה רשומה אחת. האם תרצה לעדכן, למחוק או להוסיף תת-רשומה?"
-                    if language == 'he-IL'
-                    else "Found 1 note. Would you like to update, delete, or add a sub-note?"
-                )
-                return {
-                    "response": response_text,
-                    "matches": matches,
-                    "requires_confirmation": True
-                }
-            return response
+            # Dispatch to the handler for the current conversation state
+            key = state_key(self.conversation_state)
+            handler = self.state_handlers.get(key, self.state_handlers['idle'])
+            print(f"[DEBUG NLP] State: {key} -> {type(handler).__name__}")
+            return handler.handle(self, Turn(text, language, normalized_text, intents, escalate))
         except Exception as e:
             print(f"[AGENT ERROR] {e}\n{traceback.format_exc()}")
             # Fallback message to user
@@ -820,6 +1020,50 @@ The JSON must be in this exact format:
             self.conversation_state = None
             return {"response": fallback_msg, "error": str(e)}
 
+    def select_tool_async(self, text: str, language: str) -> Future:
+        """Ask the model which tool fits ``text``; resolves to its parsed JSON reply."""
+        current_note = (self.conversation_state or {}).get('current_note')
+        prompt = self.prompt_builder.build(self, self.tool_selection_prompt, text, language)
+        cache_key = (" ".join(normalize(text).split()), state_key(self.conversation_state),
+                     current_note['id'] if current_note else None)
+        return self.llm.generate_json(prompt, cache_key=cache_key)
+
+    def apply_tool_selection(self, selection: Dict, text: str, language: str) -> Dict:
+        """Turn a model reply from select_tool_async into a turn result (changes still ask for confirmation)."""
+        print(f"[DEBUG NLP] Model tool selection: {selection}")
+        turn = Turn(text, language, unicodedata.normalize('NFKC', text.strip()), set())
+        return self.state_handlers['idle'].apply_selection(self, turn, selection)
+
+    def process_commands(self, utterances: Iterable[str], language: str = 'en',
+                         confirm: str = 'auto_yes') -> Iterator[Dict]:
+        """Run many utterances (e.g. a dictated transcript) through process_command.
+
+        Yields one ``{'text', 'result'}`` dict per non-empty utterance. All note
+        changes are persisted once, when the generator finishes or is closed.
+        ``confirm`` decides what happens when an utterance asks for confirmation:
+        'auto_yes' / 'auto_no' answer it (the reply's result is added as
+        ``'confirmation'``), 'collect' adds the pending state as ``'pending'``
+        and clears it so the next utterance starts fresh. Unmatched lines are
+        not sent to the model, so no result carries an ``llm_future``.
+        """
+        if confirm not in ('auto_yes', 'auto_no', 'collect'):
+            raise ValueError(f"Unknown confirm policy: {confirm}")
+        yes, no = self.BATCH_REPLIES['he-IL' if language == 'he-IL' else 'en']
+        with self.batch():
+            for text in utterances:
+                text = text.strip()
+                if not text:
+                    continue
+                item = {'text': text, 'result': self.process_command(text, language, escalate=False)}
+                if state_key(self.conversation_state) in ('create', 'update', 'delete'):
+                    if confirm == 'collect':
+                        item['pending'] = self.conversation_state
+                        self.conversation_state = None
+                    else:
+                        reply = yes if confirm == 'auto_yes' else no
+                        item['confirmation'] = self.process_command(reply, language, escalate=False)
+                yield item
+
     def _migrate_notes_if_needed(self):
         """Migrate notes from old location (project root) to new location (~/.note_speaker)"""
         import os
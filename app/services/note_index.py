@@ -0,0 +1,131 @@
+from typing import Dict, List, Optional, Tuple
+
+
+class NoteIndex:
+    """Hash indexes over the in-memory notes list.
+
+    Maps id -> note, (parent_id, title) -> note and title -> ids, plus each
+    note's position: an increasing order key, so the notes list stays sorted by
+    it and a note is found by binary search instead of a scan. ``children``
+    maps id -> the note's own ``children`` list, so the adjacency and the stored
+    field are the same object. NLPService keeps it current through add_note /
+    update_note / remove_note.
+    """
+
+    def __init__(self):
+        self.by_id: Dict[str, Dict] = {}
+        self.by_parent_title: Dict[Tuple[Optional[str], str], Dict] = {}
+        self.title_ids: Dict[str, Dict[str, None]] = {}  # title -> ordered set of ids
+        self.position: Dict[str, int] = {}
+        self.next_position = 0
+        self.children: Dict[str, List[str]] = {}
+
+    def rebuild(self, notes: List[Dict]):
+        self.by_id.clear()
+        self.by_parent_title.clear()
+        self.title_ids.clear()
+        self.position.clear()
+        self.children.clear()
+        for i, note in enumerate(notes):
+            self.position[note["id"]] = i
+            self._add_keys(note)
+        self.next_position = len(notes)
+        # Repair parents whose children list misses a child (older notebooks)
+        linked = {note_id: set(ids) for note_id, ids in self.children.items()}
+        for note in notes:
+            parent_id = note.get("parent_id")
+            if parent_id in linked and note["id"] not in linked[parent_id]:
+                self.children[parent_id].append(note["id"])
+
+    def add(self, note: Dict):
+        """Index a note appended to the end of the notes list."""
+        self.position[note["id"]] = self.next_position
+        self.next_position += 1
+        self._add_keys(note)
+        self._link(note)
+
+    def remove(self, note: Dict, unlink: bool = True):
+        """Drop a note; ``unlink=False`` skips its parent's children list (parent is going too)."""
+        if unlink:
+            self._unlink(note)
+        self._remove_keys(note)
+        self.children.pop(note["id"], None)
+        self.position.pop(note["id"], None)
+
+    def update(self, note: Dict, changes: Dict):
+        # Only title and parent_id are keys; other fields can change in place
+        keyed = "title" in changes or "parent_id" in changes
+        moved = "parent_id" in changes and changes["parent_id"] != note.get("parent_id")
+        if keyed:
+            self._remove_keys(note)
+        if moved:
+            self._unlink(note)
+        note.update(changes)
+        if keyed:
+            self._add_keys(note)
+        if moved:
+            self._link(note)
+
+    def descendants(self, note_id: str) -> List[str]:
+        """Ids of a note and everything below it, parents before children."""
+        result = []
+        seen = set()
+        stack = [note_id]
+        while stack:
+            current = stack.pop()
+            if current in seen:
+                continue  # guards against corrupt, cyclic children lists
+            seen.add(current)
+            result.append(current)
+            stack.extend(reversed(self.children.get(current, ())))
+        return result
+
+    def get(self, note_id: str) -> Optional[Dict]:
+        return self.by_id.get(note_id)
+
+    def find_by_title(self, title: str) -> Optional[Dict]:
+        ids = self.title_ids.get(title)
+        return self.by_id[next(iter(ids))] if ids else None
+
+    def find_all_by_title(self, title: str) -> List[Dict]:
+        return [self.by_id[note_id] for note_id in self.title_ids.get(title, ())]
+
+    def find_child_by_title(self, parent_id: Optional[str], title: str) -> Optional[Dict]:
+        return self.by_parent_title.get((parent_id, title))
+
+    def _add_keys(self, note: Dict):
+        note_id = note["id"]
+        title = note.get("title")
+        self.by_id[note_id] = note
+        self.by_parent_title.setdefault((note.get("parent_id"), title), note)
+        self.title_ids.setdefault(title, {})[note_id] = None
+        self.children[note_id] = note.setdefault("children", [])
+
+    def _link(self, note: Dict):
+        siblings = self.children.get(note.get("parent_id"))
+        if siblings is not None:
+            siblings.append(note["id"])
+
+    def _unlink(self, note: Dict):
+        siblings = self.children.get(note.get("parent_id"))
+        if siblings is not None and note["id"] in siblings:
+            siblings.remove(note["id"])
+
+    def _remove_keys(self, note: Dict):
+        note_id = note["id"]
+        title = note.get("title")
+        key = (note.get("parent_id"), title)
+        self.by_id.pop(note_id, None)
+        ids = self.title_ids.get(title)
+        if ids is not None:
+            ids.pop(note_id, None)
+            if not ids:
+                del self.title_ids[title]
+        if self.by_parent_title.get(key) is note:
+            del self.by_parent_title[key]
+            # Hand the key over to a duplicate sibling, if the data has one
+            for other_id in ids or ():
+                other = self.by_id[other_id]
+                if other.get("parent_id") == key[0]:
+                    self.by_parent_title[key] = other
+                    break
@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class NoteJournal:
+    """Append-only change log kept next to notes.json.
+
+    Every note mutation is appended as one JSON line. On load the snapshot is
+    read first and the journal replayed on top of it. Once the journal grows
+    past ``compact_threshold`` bytes it is rotated and folded into a fresh
+    snapshot on a background thread, so the caller never pays for a full
+    rewrite.
+    """
+
+    def __init__(self, snapshot_path: str, compact_threshold: int = 256 * 1024):
+        self.snapshot_path = snapshot_path
+        self.journal_path = os.path.splitext(snapshot_path)[0] + '.journal'
+        # Journal being folded into the snapshot by the compaction thread
+        self.compacting_path = self.journal_path + '.compacting'
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self._compact_thread = None
+        self._size = os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else 0
+
+    @staticmethod
+    def put_record(note: Dict, last_note_id: int) -> Dict:
+        return {'op': 'put', 'note': note, 'last_note_id': last_note_id}
+
+    @staticmethod
+    def delete_record(note_id: str, last_note_id: int) -> Dict:
+        return {'op': 'del', 'id': note_id, 'last_note_id': last_note_id}
+
+    @staticmethod
+    def encode(records: List[Dict]) -> bytes:
+        return ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records).encode('utf-8')
+
+    def append(self, data: bytes, fsync: bool = False):
+        """Append encoded records and compact in the background if the journal got large."""
+        if not data:
+            return
+        with self._lock:
+            with open(self.journal_path, 'ab') as f:
+                f.write(data)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._size += len(data)
+            if self._size >= self.compact_threshold and not self._is_compacting():
+                self._start_compaction()
+
+    def replay(self, notes: List[Dict], last_note_id: int) -> Tuple[List[Dict], int]:
+        """Apply journaled changes (including an interrupted compaction) on top of a snapshot."""
+        self.wait()
+        by_id = {n.get('id'): n for n in notes}
+        applied = 0
+        for path in (self.compacting_path, self.journal_path):
+            last_note_id, count = self._apply_file(path, by_id, last_note_id)
+            applied += count
+        if applied:
+            print(f"[DEBUG] Replayed {applied} journal records")
+            notes = list(by_id.values())
+        return notes, last_note_id
+
+    def sync(self):
+        """fsync the journal file, if there is one."""
+        with self._lock:
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, 'ab') as f:
+                    os.fsync(f.fileno())
+
+    def write_snapshot(self, payload: str):
+        """Atomically replace the snapshot (temp file + rename) and drop the journal it supersedes."""
+        # A running compaction would overwrite the snapshot with older data
+        self.wait()
+        self._replace_snapshot(payload)
+        self.reset()
+
+    def reset(self):
+        """Drop all journal files; called after a full snapshot was written."""
+        self.wait()
+        with self._lock:
+            for path in (self.journal_path, self.compacting_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._size = 0
+
+    def wait(self):
+        """Block until a running compaction has finished."""
+        thread = self._compact_thread
+        if thread is not None:
+            thread.join()
+
+    def _is_compacting(self) -> bool:
+        return self._compact_thread is not None and self._compact_thread.is_alive()
+
+    def _start_compaction(self):
+        # Called with the lock held: rotate the journal so new appends go to a fresh file
+        if os.path.exists(self.compacting_path):
+            # A previous compaction was interrupted; fold both logs into the rotated one
+            with open(self.journal_path, 'rb') as src, open(self.compacting_path, 'ab') as dst:
+                dst.write(src.read())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, self.compacting_path)
+        self._size = 0
+        self._compact_thread = threading.Thread(target=self._compact, daemon=True)
+        self._compact_thread.start()
+
+    def _compact(self):
+        try:
+            notes, last_note_id = self._read_snapshot()
+            by_id = {n.get('id'): n for n in notes}
+            last_note_id, count = self._apply_file(self.compacting_path, by_id, last_note_id)
+            self._replace_snapshot(json.dumps({'last_note_id': last_note_id, 'notes': list(by_id.values())}, ensure_ascii=False))
+            os.remove(self.compacting_path)
+            print(f"[DEBUG] Journal compacted: {count} records folded into {self.snapshot_path}")
+        except Exception as e:
+            print(f"[DEBUG] Error compacting journal: {e}")
+
+    def _replace_snapshot(self, payload: str):
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _read_snapshot(self) -> Tuple[List[Dict], int]:
+        if not os.path.exists(self.snapshot_path):
+            return [], 0
+        with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data.get('notes', []), data.get('last_note_id') or 0
+
+    @staticmethod
+    def _apply_file(path: str, by_id: Dict[str, Dict], last_note_id: Optional[int]) -> Tuple[Optional[int], int]:
+        if not os.path.exists(path):
+            return last_note_id, 0
+        count = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn write at the tail of the log; everything before it is valid
+                    print(f"[DEBUG] Skipping corrupt journal record in {path}")
+                    break
+                if record.get('op') == 'put':
+                    note = record['note']
+                    by_id[note.get('id')] = note
+                elif record.get('op') == 'del':
+                    by_id.pop(record.get('id'), None)
+                if record.get('last_note_id') is not None:
+                    last_note_id = max(last_note_id or 0, record['last_note_id'])
+                count += 1
+        return last_note_id, count
@@ -0,0 +1,150 @@
+import atexit
+import os
+import threading
+import time
+from typing import Optional
+
+from app.services.note_journal import NoteJournal
+
+
+class NotePersister:
+    """Write-behind persistence for notes.json and its journal.
+
+    Callers hand over already-encoded journal records or snapshot payloads and
+    return immediately. A background thread waits ``coalesce_delay`` seconds so a
+    burst of changes lands in a single write, drops journal records that a later
+    snapshot supersedes, and fsyncs at most once per ``fsync_interval`` seconds
+    (0 syncs every write). ``flush()`` blocks until everything is durable.
+    ``append_to`` queues appends to other files (e.g. the version history) on
+    the same thread and the same sync schedule.
+    """
+
+    def __init__(self, journal: NoteJournal, coalesce_delay: float = 0.05, fsync_interval: float = 1.0):
+        self.journal = journal
+        self.coalesce_delay = coalesce_delay
+        self.fsync_interval = fsync_interval
+        self._cond = threading.Condition()
+        self._pending = []  # [('records', bytes) | ('snapshot', str) | ('file', (path, bytes))] in order
+        self._submitted = 0
+        self._written = 0
+        self._unsynced = False
+        self._unsynced_files = set()
+        self._last_sync = time.monotonic()
+        self._flush_requested = False
+        self._closed = False
+        self._thread = None
+        atexit.register(self.flush)
+
+    def append(self, data: bytes):
+        """Queue encoded journal records."""
+        self._submit(('records', data))
+
+    def write_snapshot(self, payload: str):
+        """Queue a full snapshot; journal records queued before it are dropped."""
+        self._submit(('snapshot', payload))
+
+    def append_to(self, path: str, data: bytes):
+        """Queue bytes to append to ``path``; snapshots never drop these."""
+        self._submit(('file', (path, data)))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write and fsync everything queued so far. Returns False on timeout."""
+        with self._cond:
+            if self._thread is None:
+                return True
+            target = self._submitted
+            self._flush_requested = True
+            self._cond.notify_all()
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while self._written < target or self._unsynced:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _submit(self, item):
+        with self._cond:
+            self._pending.append(item)
+            self._submitted += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._closed = False
+                self._thread = threading.Thread(target=self._run, name='NotePersister', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    if self._unsynced:
+                        due = self._last_sync + self.fsync_interval - time.monotonic()
+                        if due <= 0 or self._flush_requested:
+                            break
+                        self._cond.wait(due)
+                    else:
+                        self._cond.wait()
+                if self._closed and not self._pending:
+                    return
+                delay = 0 if self._flush_requested else self.coalesce_delay
+            if self._pending and delay:
+                # Let the rest of the burst arrive before touching the disk
+                time.sleep(delay)
+            with self._cond:
+                batch, self._pending = self._pending, []
+                force_sync = self._flush_requested
+            try:
+                self._write(batch, force_sync)
+            except Exception as e:
+                # Don't leave flush() waiting on a sync that keeps failing
+                self._unsynced = False
+                print(f"[DEBUG] NotePersister write failed: {e}")
+            with self._cond:
+                self._written += len(batch)
+                if self._written >= self._submitted and not self._unsynced:
+                    self._flush_requested = False
+                self._cond.notify_all()
+
+    def _write(self, batch, force_sync: bool):
+        # Journal records before the last snapshot are already contained in it
+        start = 0
+        for i, (kind, _) in enumerate(batch):
+            if kind == 'snapshot':
+                start = i
+        records = []
+        for i, (kind, payload) in enumerate(batch):
+            if kind == 'file':
+                path, data = payload
+                with open(path, 'ab') as f:
+                    f.write(data)
+                self._unsynced_files.add(path)
+            elif i < start:
+                continue
+            elif kind == 'snapshot':
+                self.journal.write_snapshot(payload)
+                self._unsynced = False
+            else:
+                records.append(payload)
+        if records:
+            self.journal.append(b''.join(records))
+            self._unsynced = True
+        if self._unsynced_files:
+            self._unsynced = True
+        now = time.monotonic()
+        if self._unsynced and (force_sync or now - self._last_sync >= self.fsync_interval):
+            self.journal.sync()
+            for path in self._unsynced_files:
+                if os.path.exists(path):  # may have been pruned since
+                    with open(path, 'ab') as f:
+                        os.fsync(f.fileno())
+            self._unsynced_files.clear()
+            self._unsynced = False
+            self._last_sync = now
+        if batch:
+            print(f"[DEBUG] NotePersister wrote {len(batch)} queued saves")
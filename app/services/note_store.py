@@ -0,0 +1,95 @@
+import json
+import sqlite3
+from typing import Dict, List, Tuple
+
+
+class NoteStore:
+    """SQLite-backed note storage.
+
+    Rows keep the indexed columns (title, parent_id, done, done_date) next to the
+    full note as JSON. The store only persists notes: lookups are answered by
+    NLPService's in-memory indexes, which also see changes not yet saved (inside
+    ``batch()``).
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS notes (
+            id TEXT PRIMARY KEY,
+            title TEXT,
+            parent_id TEXT,
+            done INTEGER NOT NULL DEFAULT 0,
+            done_date TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_notes_parent_title ON notes(parent_id, title);
+        CREATE INDEX IF NOT EXISTS idx_notes_title ON notes(title);
+        CREATE INDEX IF NOT EXISTS idx_notes_done ON notes(done);
+        CREATE INDEX IF NOT EXISTS idx_notes_done_date ON notes(done_date);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+        print(f"[DEBUG] NoteStore opened: {db_path}")
+
+    def is_empty(self) -> bool:
+        return self.conn.execute('SELECT 1 FROM notes LIMIT 1').fetchone() is None
+
+    def load(self) -> Tuple[List[Dict], int]:
+        """Load all notes (in insertion order) and the last assigned note id."""
+        notes = [json.loads(data) for (data,) in self.conn.execute('SELECT data FROM notes ORDER BY rowid')]
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'last_note_id'").fetchone()
+        last_note_id = int(row[0]) if row else 0
+        return notes, last_note_id
+
+    def save(self, changed: List[Dict], removed: List[str], last_note_id: int):
+        """Write changed notes and delete removed ones in a single transaction."""
+        with self.conn:
+            if removed:
+                self.conn.executemany('DELETE FROM notes WHERE id = ?', [(note_id,) for note_id in removed])
+            if changed:
+                self.conn.executemany(
+                    'INSERT INTO notes (id, title, parent_id, done, done_date, data) VALUES (?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT(id) DO UPDATE SET title = excluded.title, parent_id = excluded.parent_id, '
+                    'done = excluded.done, done_date = excluded.done_date, data = excluded.data',
+                    [self._row(note) for note in changed]
+                )
+            self._set_last_note_id(last_note_id)
+
+    def replace_all(self, notes: List[Dict], last_note_id: int):
+        """Replace the whole notebook, e.g. after an import or a reset."""
+        with self.conn:
+            self.conn.execute('DELETE FROM notes')
+            self.conn.executemany(
+                'INSERT INTO notes (id, title, parent_id, done, done_date, data) VALUES (?, ?, ?, ?, ?, ?)',
+                [self._row(note) for note in notes]
+            )
+            self._set_last_note_id(last_note_id)
+
+    def close(self):
+        self.conn.close()
+
+    def _set_last_note_id(self, last_note_id: int):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('last_note_id', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (str(last_note_id),)
+        )
+
+    @staticmethod
+    def _row(note: Dict) -> Tuple:
+        return (
+            note['id'],
+            note.get('title'),
+            note.get('parent_id'),
+            1 if note.get('done') else 0,
+            note.get('done_date'),
+            json.dumps(note, ensure_ascii=False)
+        )
@@ -0,0 +1,330 @@
+import copy
+import json
+import os
+import zlib
+from bisect import bisect_right
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# Hash array mapped trie: 32-way tuples indexed by 5 bits of the id's hash
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+
+
+class _Leaf:
+    """The notes whose ids share one hash (almost always a single note)."""
+
+    __slots__ = ('hash', 'items')
+
+    def __init__(self, hash_: int, items: Tuple[Tuple[str, Dict], ...]):
+        self.hash = hash_
+        self.items = items
+
+
+def _hash(key: str) -> int:
+    # Stable across runs, unlike hash() on str
+    return zlib.crc32(key.encode('utf-8'))
+
+
+def _get(node, h: int, key: str):
+    shift = 0
+    while node is not None:
+        slot = node[(h >> shift) & MASK]
+        if isinstance(slot, _Leaf):
+            if slot.hash == h:
+                for k, value in slot.items:
+                    if k == key:
+                        return value
+            return None
+        node = slot
+        shift += BITS
+    return None
+
+
+def _assoc(node, shift: int, h: int, key: str, value: Dict):
+    """A copy of ``node`` with ``key`` set; only the path to the key is copied."""
+    slots = list(node) if node is not None else [None] * WIDTH
+    i = (h >> shift) & MASK
+    slot = slots[i]
+    if slot is None:
+        slots[i] = _Leaf(h, ((key, value),))
+    elif isinstance(slot, _Leaf):
+        if slot.hash == h:
+            slots[i] = _Leaf(h, tuple((k, v) for k, v in slot.items if k != key) + ((key, value),))
+        else:
+            # Two hashes in one slot: push the old leaf one level down
+            child = [None] * WIDTH
+            child[(slot.hash >> (shift + BITS)) & MASK] = slot
+            slots[i] = _assoc(tuple(child), shift + BITS, h, key, value)
+    else:
+        slots[i] = _assoc(slot, shift + BITS, h, key, value)
+    return tuple(slots)
+
+
+def _dissoc(node, shift: int, h: int, key: str):
+    """A copy of ``node`` without ``key`` (``node`` itself if the key is absent)."""
+    if node is None:
+        return None
+    i = (h >> shift) & MASK
+    slot = node[i]
+    if slot is None:
+        return node
+    if isinstance(slot, _Leaf):
+        if slot.hash != h:
+            return node
+        items = tuple((k, v) for k, v in slot.items if k != key)
+        if len(items) == len(slot.items):
+            return node
+        new_slot = _Leaf(h, items) if items else None
+    else:
+        new_slot = _dissoc(slot, shift + BITS, h, key)
+        if new_slot is slot:
+            return node
+        if new_slot is not None:
+            # A sub-trie left holding a single leaf collapses into it
+            rest = [s for s in new_slot if s is not None]
+            if len(rest) == 1 and isinstance(rest[0], _Leaf):
+                new_slot = rest[0]
+    slots = list(node)
+    slots[i] = new_slot
+    return tuple(slots) if any(s is not None for s in slots) else None
+
+
+def _values(node):
+    stack = [node] if node is not None else []
+    while stack:
+        current = stack.pop()
+        for slot in reversed(current):
+            if isinstance(slot, _Leaf):
+                for _, value in slot.items:
+                    yield value
+            elif slot is not None:
+                stack.append(slot)
+
+
+class _Segment:
+    """The versions stored in one history file, each with its trie root."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.numbers: List[int] = []
+        self.times: List[str] = []  # ISO timestamps, ascending like ``numbers``
+        self.roots: List = []
+        self.counts: List[int] = []
+        self.base = 0  # bytes of the header and checkpoint, ahead of the logged versions
+
+    def apply(self, put: List[Dict], removed: List[str], when: str, number: int):
+        root = self.roots[-1] if self.roots else None
+        count = self.counts[-1] if self.counts else 0
+        for note_id in removed:
+            h = _hash(note_id)
+            if _get(root, h, note_id) is not None:
+                root = _dissoc(root, 0, h, note_id)
+                count -= 1
+        for note in put:
+            h = _hash(note["id"])
+            if _get(root, h, note["id"]) is None:
+                count += 1
+            root = _assoc(root, 0, h, note["id"], note)
+        self.numbers.append(number)
+        self.times.append(when)
+        self.roots.append(root)
+        self.counts.append(count)
+
+    @classmethod
+    def read(cls, path: str) -> '_Segment':
+        segment = cls(path)
+        try:
+            with open(path, 'rb') as f:
+                header = f.readline()
+                segment.base = len(header)
+                for line in f:
+                    try:
+                        entry = json.loads(line.decode('utf-8'))
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    if entry.get('checkpoint'):
+                        segment.base += len(line)
+                    segment.apply(entry['put'], entry['del'], entry['ts'], entry['v'])
+        except OSError as e:
+            print(f"[DEBUG] NoteVersions read failed: {e}")
+        return segment
+
+
+def _append_file(path: str, data: bytes):
+    with open(path, 'ab') as f:
+        f.write(data)
+
+
+def _line(entry: Dict) -> bytes:
+    return (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+class NoteVersions:
+    """Every saved state of the notebook, kept as persistent hash tries.
+
+    Each save makes a new root that shares all untouched trie nodes with the
+    previous one, so a version costs O(changed notes * log N) memory instead
+    of a copy of the notebook, and reading a note from any version is an
+    O(log N) walk. Versions are logged to segment files in ``directory`` as
+    the notes they put and the ids they deleted. Once a segment passes
+    ``segment_bytes`` a new one starts with a checkpoint of the whole notebook,
+    so startup replays only the newest segment (a checkpoint larger than
+    ``segment_bytes`` raises the limit to its own size); older ones are read when a
+    version in them is asked for, and only the last ``keep_segments`` are kept.
+    Writes go through ``write(path, data)`` (e.g. ``NotePersister.append_to``).
+    """
+
+    def __init__(self, directory: str, write: Optional[Callable[[str, bytes], None]] = None,
+                 segment_bytes: int = 256 * 1024, keep_segments: int = 20):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.keep_segments = max(2, keep_segments)
+        self._write = write or _append_file
+        self.segments: List[Tuple[int, str, str]] = []  # (first version, its time, path), oldest first
+        self.active = _Segment('')  # the newest segment, kept in memory
+        self._cached: Optional[_Segment] = None  # the last older segment that was read
+        self._size = 0  # bytes written to the active segment
+        self._base = 0  # of which the header and checkpoint
+        self._load()
+
+    @property
+    def head(self) -> int:
+        """Number of the latest version (0 before the first one)."""
+        return self.active.numbers[-1] if self.active.numbers else 0
+
+    def _load(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            names = sorted(name for name in os.listdir(self.directory) if name.endswith('.jsonl'))
+        except OSError as e:
+            print(f"[DEBUG] NoteVersions directory unavailable: {e}")
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, 'rb') as f:
+                    header = json.loads(f.readline().decode('utf-8'))
+                self.segments.append((header['first'], header['ts'], path))
+            except (OSError, ValueError, KeyError):
+                continue  # header never made it to disk
+        if self.segments:
+            path = self.segments[-1][2]
+            self.active = _Segment.read(path)
+            self._size = os.path.getsize(path)
+            self._base = self.active.base
+        print(f"[DEBUG] Loaded {len(self.active.numbers)} note versions from {self.active.path or self.directory}")
+
+    def _start_segment(self, number: int, when: str, checkpoint: Optional[List[Dict]] = None):
+        path = os.path.join(self.directory, '%08d.jsonl' % number)
+        data = _line({'first': number, 'ts': when})
+        if checkpoint is not None:
+            data += _line({'v': number, 'ts': when, 'put': checkpoint, 'del': [], 'checkpoint': True})
+        self.segments.append((number, when, path))
+        self._size = self._base = len(data)
+        self._append(path, data)
+        # Drop the oldest history; pending writes only ever target the last two segments
+        while len(self.segments) > self.keep_segments:
+            _, _, old_path = self.segments.pop(0)
+            if self._cached is not None and self._cached.path == old_path:
+                self._cached = None
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+        return path
+
+    def record(self, changed: List[Dict], removed: List[str], when: Optional[str] = None) -> int:
+        """Add a version with ``changed`` notes put and ``removed`` ids deleted; returns its number."""
+        put = [copy.deepcopy(note) for note in changed]  # stored notes are never mutated
+        removed = list(removed)
+        if not put and not removed:
+            return self.head
+        when = when or datetime.now().isoformat(timespec='seconds')
+        if self.active.times and when < self.active.times[-1]:
+            when = self.active.times[-1]  # keep the times sorted if the clock went back
+        number = self.head + 1
+        if not self.segments:
+            self.active.path = self._start_segment(number, when)
+        self.active.apply(put, removed, when, number)
+        data = _line({'v': number, 'ts': when, 'put': put, 'del': removed})
+        self._size += len(data)
+        self._append(self.active.path, data)
+        if self._size - self._base >= max(self.segment_bytes, self._base):
+            self._checkpoint()
+        return number
+
+    def _append(self, path: str, data: bytes):
+        try:
+            self._write(path, data)
+        except OSError as e:
+            print(f"[DEBUG] NoteVersions write failed: {e}")
+
+    def _checkpoint(self):
+        """Start a new segment whose first version is the whole current notebook."""
+        number, when = self.head, self.active.times[-1]
+        root, count = self.active.roots[-1], self.active.counts[-1]
+        previous = self.active
+        self.active = _Segment(self._start_segment(number, when, list(_values(root))))
+        self.active.numbers.append(number)
+        self.active.times.append(when)
+        self.active.roots.append(root)
+        self.active.counts.append(count)
+        # Its tail may still be queued, so keep it in memory rather than re-reading it
+        self._cached = previous
+
+    def sync(self, notes: List[Dict]) -> int:
+        """Record whatever differs between the latest version and ``notes`` (on load)."""
+        root = self.active.roots[-1] if self.active.roots else None
+        changed = [note for note in notes if _get(root, _hash(note["id"]), note["id"]) != note]
+        ids = {note["id"] for note in notes}
+        removed = [note["id"] for note in _values(root) if note["id"] not in ids]
+        return self.record(changed, removed)
+
+    def _segment(self, version: Optional[int], when: Optional[str]) -> Optional[_Segment]:
+        if when is not None:
+            i = bisect_right([ts for _, ts, _ in self.segments], when) - 1
+        elif version is not None:
+            i = bisect_right([first for first, _, _ in self.segments], version) - 1
+        else:
+            i = len(self.segments) - 1
+        if i < 0:
+            return None
+        if i == len(self.segments) - 1:
+            return self.active
+        path = self.segments[i][2]
+        if self._cached is None or self._cached.path != path:
+            self._cached = _Segment.read(path)
+        return self._cached
+
+    def _root(self, version: Optional[int] = None, when: Union[str, datetime, None] = None):
+        """Root of ``version``, or of the last version saved at or before ``when``; None if there is none."""
+        if isinstance(when, datetime):
+            when = when.isoformat(timespec='seconds')
+        segment = self._segment(version, when)
+        if segment is None:
+            return None, 0
+        if when is not None:
+            i = bisect_right(segment.times, when) - 1
+        elif version is not None:
+            i = bisect_right(segment.numbers, version) - 1
+        else:
+            i = len(segment.roots) - 1
+        return (segment.roots[i], segment.counts[i]) if i >= 0 else (None, 0)
+
+    def get(self, note_id: str, version: Optional[int] = None,
+            when: Union[str, datetime, None] = None) -> Optional[Dict]:
+        root, _ = self._root(version, when)
+        note = _get(root, _hash(note_id), note_id)
+        return copy.deepcopy(note) if note is not None else None
+
+    def notes_at(self, version: Optional[int] = None, when: Union[str, datetime, None] = None) -> List[Dict]:
+        """The notebook as of a version or a point in time, ordered by id; [] if it was pruned."""
+        root, _ = self._root(version, when)
+        notes = [copy.deepcopy(note) for note in _values(root)]
+        notes.sort(key=lambda note: (len(note["id"]), note["id"]))
+        return notes
+
+    def count_at(self, version: Optional[int] = None, when: Union[str, datetime, None] = None) -> int:
+        return self._root(version, when)[1]
@@ -0,0 +1,102 @@
+from typing import Dict, List, Optional
+
+
+class PromptBuilder:
+    """Builds the tool-selection prompt from a bounded slice of the notebook.
+
+    Context is added in priority order: the current note, its ancestors, its
+    children, the top-k search hits for the utterance, then recent turns.
+    Lines that would push the context past ``budget_chars`` are left out, so
+    the request size does not depend on how many notes exist. ``last_stats``
+    records what was kept and cut for the latest prompt; ``totals`` adds them
+    up over the session.
+    """
+
+    DESCRIPTION_CHARS = 80
+    MAX_ANCESTORS = 8
+
+    def __init__(self, budget_chars: int = 2000, top_k: int = 5, history_turns: int = 4):
+        self.budget_chars = budget_chars
+        self.top_k = top_k
+        self.history_turns = history_turns
+        self.last_stats: Dict[str, int] = {}
+        self.totals = {"prompts": 0, "lines_kept": 0, "lines_cut": 0, "chars_cut": 0}
+
+    def build(self, nlp, system_prompt: str, text: str, language: str) -> str:
+        current_note = (nlp.conversation_state or {}).get('current_note')
+        sections = []
+        seen = set()
+        if current_note:
+            sections.append(("Current note", [self.note_line(current_note)]))
+            seen.add(current_note['id'])
+            ancestors = self._ancestors(nlp, current_note, seen)
+            if ancestors:
+                sections.append(("Its parents (nearest first)", [self.note_line(n) for n in ancestors]))
+            children = [nlp.get_note_by_id(i) for i in current_note.get('children', []) if i not in seen]
+            children = [n for n in children if n]
+            seen.update(n['id'] for n in children)
+            if children:
+                sections.append(("Its sub-notes", [self.note_line(n) for n in children]))
+        hits = [nlp.get_note_by_id(note_id) for note_id, _ in
+                nlp.text_index.rank(text, self.top_k, nlp.index.position) if note_id not in seen]
+        if hits:
+            sections.append(("Notes matching the request", [self.note_line(n) for n in hits if n]))
+        # The utterance itself was just appended to the history; it goes last on its own
+        history = nlp.conversation_history[-(self.history_turns + 1):-1]
+        if history:
+            sections.append(("Recent conversation", [f"{turn['role']}: {turn['text']}" for turn in history]))
+
+        context, kept, cut, chars_cut = self._fit(sections)
+        self.last_stats = {"lines_kept": kept, "lines_cut": cut, "chars_cut": chars_cut,
+                           "context_chars": len(context), "budget_chars": self.budget_chars}
+        self.totals["prompts"] += 1
+        self.totals["lines_kept"] += kept
+        self.totals["lines_cut"] += cut
+        self.totals["chars_cut"] += chars_cut
+        print(f"[DEBUG LLM] Prompt context: {self.last_stats}")
+        return f"{system_prompt}\n{context}\nUser ({language}): {text}\n"
+
+    def note_line(self, note: Dict) -> str:
+        line = f'- id={note["id"]} title="{note.get("title") or ""}"'
+        if note.get('parent_id'):
+            line += f' parent={note["parent_id"]}'
+        description = (note.get('description') or '').replace('\n', ' ')
+        if description:
+            if len(description) > self.DESCRIPTION_CHARS:
+                description = description[:self.DESCRIPTION_CHARS] + '…'
+            line += f' description="{description}"'
+        return line
+
+    def _ancestors(self, nlp, note: Dict, seen: set) -> List[Dict]:
+        result = []
+        parent_id: Optional[str] = note.get('parent_id')
+        while parent_id and parent_id not in seen and len(result) < self.MAX_ANCESTORS:
+            parent = nlp.get_note_by_id(parent_id)
+            if not parent:
+                break
+            seen.add(parent_id)
+            result.append(parent)
+            parent_id = parent.get('parent_id')
+        return result
+
+    def _fit(self, sections):
+        """Join sections in order, dropping lines (and empty headers) once over budget."""
+        lines, used, kept, cut, chars_cut = [], 0, 0, 0, 0
+        for header, section_lines in sections:
+            header_line = f"{header}:"
+            added_header = False
+            for line in section_lines:
+                cost = len(line) + 1 + (0 if added_header else len(header_line) + 1)
+                if used + cost > self.budget_chars:
+                    cut += 1
+                    chars_cut += len(line) + 1
+                    continue
+                if not added_header:
+                    lines.append(header_line)
+                    added_header = True
+                lines.append(line)
+                used += cost
+                kept += 1
+        if not lines:
+            lines.append("Current note: none")
+        return "\n".join(lines), kept, cut, chars_cut
@@ -0,0 +1,62 @@
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Relation kinds a subgraph can be expanded through
+NEIGHBOR_KINDS = ('parent', 'children', 'depends_on', 'dependents')
+
+
+class RelationIndex:
+    """The graph edges between notes, kept current as notes change.
+
+    Holds parent -> child edges and prerequisite -> dependent edges as
+    ``{"source", "target", "type"}`` dicts. Every edge belongs to its target
+    note, so a change to one note replaces only that note's incoming edges;
+    ``outgoing`` lets a removed note drop the edges it is the source of.
+    """
+
+    def __init__(self):
+        self.edges: Dict[Tuple[str, str, str], Dict] = {}  # insertion ordered
+        self.incoming: Dict[str, Set[Tuple[str, str, str]]] = {}
+        self.outgoing: Dict[str, Set[Tuple[str, str, str]]] = {}
+
+    def rebuild(self, notes: Iterable[Dict], depends_on: Dict[str, Set[str]]):
+        self.edges.clear()
+        self.incoming.clear()
+        self.outgoing.clear()
+        for note in notes:
+            self.sync(note, depends_on.get(note["id"], ()))
+
+    def sync(self, note: Dict, prerequisites: Iterable[str] = ()):
+        """Replace the edges pointing at ``note`` with its current parent and prerequisites."""
+        note_id = note["id"]
+        wanted = set()
+        if note.get("parent_id"):
+            wanted.add((note["parent_id"], note_id, 'child'))
+        wanted.update((prerequisite, note_id, 'depends_on') for prerequisite in prerequisites)
+        current = self.incoming.get(note_id, set())
+        if wanted == current:
+            return
+        for key in current - wanted:
+            self._drop(key)
+        for key in sorted(wanted - current):
+            self.edges[key] = {"source": key[0], "target": key[1], "type": key[2]}
+            self.outgoing.setdefault(key[0], set()).add(key)
+        self.incoming[note_id] = wanted
+
+    def remove(self, note_id: str):
+        for key in list(self.incoming.pop(note_id, ())) + list(self.outgoing.pop(note_id, ())):
+            self._drop(key)
+
+    def _drop(self, key: Tuple[str, str, str]):
+        if self.edges.pop(key, None) is None:
+            return
+        self.outgoing.get(key[0], set()).discard(key)
+        self.incoming.get(key[1], set()).discard(key)
+
+    def relations(self) -> List[Dict]:
+        # A new list each call: the graph widget clears the list it was given
+        return list(self.edges.values())
+
+    def between(self, note_ids: Set[str]) -> List[Dict]:
+        """Edges whose two ends are both in ``note_ids``, via each note's incoming edges."""
+        return [self.edges[key] for note_id in note_ids
+                for key in sorted(self.incoming.get(note_id, ())) if key[0] in note_ids]
@@ -0,0 +1,132 @@
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+STOPWORDS = {
+    'the', 'a', 'an', 'and', 'or', 'to', 'of', 'for', 'in', 'on', 'at', 'with', 'is', 'it', 'this', 'that', 'be',
+    'את', 'של', 'על', 'עם', 'זה', 'זאת', 'גם', 'או', 'כל', 'לא', 'יש', 'אם', 'כי', 'רק', 'עוד', 'אני', 'הוא', 'היא'
+}
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+|\n+')
+# Key terms are spoken back, so they keep their written form (no final-letter folding)
+WORD_RE = re.compile(r'\w+')
+
+
+def words(text: str) -> List[str]:
+    return WORD_RE.findall(text.casefold())
+
+
+class SummaryService:
+    """Per-note subtree summaries, built bottom-up and cached on each node.
+
+    A summary combines the node's own fields with its children's cached
+    summaries, so after the first build a mutation only invalidates the path
+    from the changed note to the root and a request recomputes O(depth) nodes.
+    Key terms keep the top TERMS_KEPT counts per node, so they are exact for
+    small subtrees and approximate (but bounded) for large ones.
+    """
+
+    TERMS_KEPT = 20
+    KEY_TERMS = 5
+    EXTRACT_SENTENCES = 2
+
+    def __init__(self, nlp_service):
+        self.nlp = nlp_service
+        self.cache: Dict[str, Dict] = {}
+        self.computed = 0  # nodes (re)computed, for checking the incremental cost
+
+    def clear(self):
+        self.cache.clear()
+
+    def invalidate(self, note_id: Optional[str]):
+        """Drop cached summaries of a note and all its ancestors."""
+        seen = set()
+        while note_id and note_id not in seen:
+            seen.add(note_id)
+            self.cache.pop(note_id, None)
+            note = self.nlp.get_note_by_id(note_id)
+            note_id = note.get('parent_id') if note else None
+
+    def summary(self, note_id: str) -> Optional[Dict]:
+        return self._summary(note_id, set())
+
+    def _summary(self, note_id: str, visiting: set) -> Optional[Dict]:
+        cached = self.cache.get(note_id)
+        if cached is not None:
+            return cached
+        note = self.nlp.get_note_by_id(note_id)
+        if note is None or note_id in visiting:
+            return None
+        visiting.add(note_id)
+        children = [s for s in (self._summary(child_id, visiting) for child_id in note.get('children', [])) if s]
+        visiting.discard(note_id)
+
+        terms = Counter(t for t in words(f"{note.get('title') or ''} {note.get('description') or ''}")
+                        if len(t) > 1 and t not in STOPWORDS)
+        for child in children:
+            terms.update(child['terms'])
+        terms = dict(Counter(terms).most_common(self.TERMS_KEPT))
+
+        if children:
+            leaves = sum(c['leaves'] for c in children)
+            done_leaves = sum(c['done_leaves'] for c in children)
+        else:
+            leaves, done_leaves = 1, 1 if note.get('done') else 0
+        done_dates = [c['latest_done'] for c in children if c['latest_done']]
+        if note.get('done') and note.get('done_date'):
+            done_dates.append(note['done_date'])
+
+        sentences = [s.strip() for s in SENTENCE_RE.split(note.get('description') or '') if s.strip()]
+        for child in children:
+            sentences.extend(child['extract'])
+        extract = self._extract(sentences, terms)
+
+        summary = {
+            'id': note_id,
+            'title': note.get('title'),
+            'notes': 1 + sum(c['notes'] for c in children),
+            'leaves': leaves,
+            'open_leaves': leaves - done_leaves,
+            'done_leaves': done_leaves,
+            'latest_done': max(done_dates) if done_dates else None,
+            'terms': terms,
+            'key_terms': list(terms)[:self.KEY_TERMS],
+            'extract': extract
+        }
+        self.cache[note_id] = summary
+        self.computed += 1
+        return summary
+
+    def _extract(self, sentences: List[str], terms: Dict[str, int]) -> List[str]:
+        """The highest-scoring sentences by key-term weight, in their original order."""
+        if len(sentences) <= self.EXTRACT_SENTENCES:
+            return sentences
+        scored = []
+        for i, sentence in enumerate(sentences):
+            tokens = words(sentence)
+            score = sum(terms.get(t, 0) for t in tokens) / (len(tokens) or 1)
+            scored.append((score, -i, sentence))
+        best = sorted(scored, reverse=True)[:self.EXTRACT_SENTENCES]
+        return [sentence for _, _, sentence in sorted(best, key=lambda item: -item[1])]
+
+    def describe(self, note_id: str, is_hebrew: bool) -> str:
+        """Spoken summary of a note's subtree."""
+        s = self.summary(note_id)
+        if s is None:
+            return "רשומה לא נמצאה" if is_hebrew else "Note not found"
+        if is_hebrew:
+            text = (f"{s['title']}: {s['notes']} רשומות, {s['open_leaves']} משימות פתוחות "
+                    f"ו-{s['done_leaves']} שהושלמו.")
+            if s['latest_done']:
+                text += f" הושלמה לאחרונה ב-{s['latest_done'][:10]}."
+            if s['key_terms']:
+                text += f" נושאים: {', '.join(s['key_terms'])}."
+        else:
+            text = (f"{s['title']}: {s['notes']} notes, {s['open_leaves']} open and "
+                    f"{s['done_leaves']} done tasks.")
+            if s['latest_done']:
+                text += f" Last completed on {s['latest_done'][:10]}."
+            if s['key_terms']:
+                text += f" Key terms: {', '.join(s['key_terms'])}."
+        if s['extract']:
+            text += " " + " ".join(s['extract'])
+        return text
@@ -0,0 +1,164 @@
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.services.text_index import is_hebrew, normalize
+
+# Spoken filler around a tag query: "show me all urgent maintenance notes", "notes tagged urgent"
+TAG_QUERY_EN_RE = re.compile(
+    r'^(?:show|find|list|search)?\s*(?:me\s+)?(?:all\s+)?(?:the\s+)?(?:notes?\s+)?(?:(?:tagged|with\s+tags?)\s+)?'
+    r'(.+?)(?:\s+notes?)?$',
+    re.IGNORECASE
+)
+TAG_QUERY_HE_RE = re.compile(
+    r'^(?:(?:תמצא|תמצאי|מצא|חפש|הראה|תראה)(?:\s+לי)?\s+)?(?:את\s+)?(?:כל\s+)?(?:ה?רשומות\s+)?'
+    r'(?:(?:עם\s+)?(?:ה?תגית|ה?תגיות|מתויגות|שמתויגות)\s+)?(.+)$'
+)
+AND_WORDS = {'and', 'וגם', 'גם'}
+OR_WORDS = {'or', 'או'}
+NOT_WORDS = {'not', 'without', 'except', 'בלי', 'ללא', 'לא', 'חוץ'}
+PARENS = {'(', ')'}
+
+
+class TagIndex:
+    """Tag -> note ids posting sets, kept current on every note change.
+
+    Tags are compared normalized (case, niqqud, Hebrew final letters).
+    ``query`` evaluates AND / OR / NOT expressions as set operations on the
+    posting sets; NOT is applied as a difference when it is ANDed with
+    something, so only a bare NOT touches every note id.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Set[str]] = {}
+        self.doc_tags: Dict[str, Set[str]] = {}
+        self.all_ids: Set[str] = set()
+        self._pos = 0  # parser position in the token list
+
+    def rebuild(self, notes: List[Dict]):
+        self.postings.clear()
+        self.doc_tags.clear()
+        self.all_ids.clear()
+        for note in notes:
+            self.add(note)
+
+    def add(self, note: Dict):
+        note_id = note["id"]
+        self.all_ids.add(note_id)
+        tags = {normalize(tag) for tag in note.get('tags') or [] if str(tag).strip()}
+        self.doc_tags[note_id] = tags
+        for tag in tags:
+            self.postings.setdefault(tag, set()).add(note_id)
+
+    def remove(self, note_id: str):
+        self.all_ids.discard(note_id)
+        for tag in self.doc_tags.pop(note_id, ()):
+            ids = self.postings.get(tag)
+            if ids is not None:
+                ids.discard(note_id)
+                if not ids:
+                    del self.postings[tag]
+
+    def update(self, note: Dict):
+        self.remove(note["id"])
+        self.add(note)
+
+    def ids_with(self, tag: str) -> Set[str]:
+        return self.postings.get(normalize(tag), set())
+
+    # --- queries ---
+
+    def query(self, text: str) -> Optional[Set[str]]:
+        """Ids matching a spoken tag expression, or None if ``text`` is not one.
+
+        Plain words next to each other are ANDed ("urgent maintenance"). Every
+        word must be a known tag or an operator, so ordinary searches fall
+        through to the title index.
+        """
+        match = (TAG_QUERY_HE_RE if is_hebrew(text) else TAG_QUERY_EN_RE).match(text.strip())
+        tokens = self._tokens(match.group(1) if match else text)
+        if not tokens or not any(kind == 'tag' for kind, _ in tokens):
+            return None
+        self._pos = 0
+        try:
+            ids, negated = self._parse_or(tokens)
+        except (IndexError, ValueError):
+            return None
+        if self._pos != len(tokens):
+            return None
+        return self.all_ids - ids if negated else set(ids)
+
+    def _tokens(self, text: str) -> Optional[List[Tuple[str, str]]]:
+        tokens = []
+        for word in re.findall(r'[()]|[^\s(),]+', text):
+            key = normalize(word)
+            if word in PARENS:
+                tokens.append(('paren', word))
+            elif key in self.postings:
+                tokens.append(('tag', key))
+            elif key in AND_WORDS or key == '&':
+                tokens.append(('and', key))
+            elif key in OR_WORDS or key == '|':
+                tokens.append(('or', key))
+            elif key in NOT_WORDS or key == '-':
+                tokens.append(('not', key))
+            elif key.startswith('ו') and key[1:] in self.postings:
+                # Hebrew "ו" prefix: "דחוף ותחזוקה" is urgent AND maintenance
+                tokens += [('and', 'ו'), ('tag', key[1:])]
+            elif key.startswith('ו') and normalize(key[1:]) in NOT_WORDS:
+                tokens += [('and', 'ו'), ('not', key[1:])]
+            else:
+                return None
+        return tokens
+
+    # Each parse step returns (ids, negated): negated means "every note except ids"
+
+    def _parse_or(self, tokens):
+        ids, negated = self._parse_and(tokens)
+        while self._pos < len(tokens) and tokens[self._pos][0] == 'or':
+            self._pos += 1
+            other, other_negated = self._parse_and(tokens)
+            if not negated and not other_negated:
+                ids = ids | other
+            elif negated and other_negated:
+                ids = ids & other
+            elif negated:
+                ids = ids - other
+            else:
+                ids, negated = other - ids, True
+        return ids, negated
+
+    def _parse_and(self, tokens):
+        ids, negated = self._parse_not(tokens)
+        # Adjacent terms without an operator are ANDed too
+        while self._pos < len(tokens) and (tokens[self._pos][0] in ('and', 'tag', 'not')
+                                           or tokens[self._pos] == ('paren', '(')):
+            if tokens[self._pos][0] == 'and':
+                self._pos += 1
+            other, other_negated = self._parse_not(tokens)
+            if not negated and not other_negated:
+                ids = ids & other
+            elif not negated:
+                ids = ids - other
+            elif not other_negated:
+                ids, negated = other - ids, False
+            else:
+                ids = ids | other
+        return ids, negated
+
+    def _parse_not(self, tokens):
+        kind, value = tokens[self._pos]
+        if kind == 'not':
+            self._pos += 1
+            ids, negated = self._parse_not(tokens)
+            return ids, not negated
+        if kind == 'paren' and value == '(':
+            self._pos += 1
+            result = self._parse_or(tokens)
+            if tokens[self._pos] != ('paren', ')'):
+                raise ValueError("unbalanced parentheses")
+            self._pos += 1
+            return result
+        if kind == 'tag':
+            self._pos += 1
+            return self.postings[value], False
+        raise ValueError(f"unexpected {value}")
@@ -0,0 +1,256 @@
+import heapq
+import math
+import re
+import zlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Hebrew points and cantillation marks (niqqud)
+NIQQUD_RE = re.compile('[\u0591-\u05BD\u05BF\u05C1\u05C2\u05C4\u05C5\u05C7]')
+TOKEN_RE = re.compile(r'\w+')
+# Final letter forms map to their regular forms so 'שלום' matches 'שלומו'
+FINAL_LETTERS = str.maketrans('ךםןףץ', 'כמנפצ')
+# One-letter prefixes: ה (the), ו (and), ב (in), ל (to), מ (from), ש (that), כ (as)
+HEBREW_PREFIXES = 'הובלמשכ'
+MAX_PREFIXES = 3
+MIN_STEM = 2
+# BM25 parameters; title tokens count TITLE_WEIGHT times in a note's term frequencies
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 3.0
+EXACT_TITLE_BOOST = 10.0
+
+
+def is_hebrew(text: str) -> bool:
+    return any('\u05D0' <= c <= '\u05EA' for c in text)
+
+
+def normalize(text: str) -> str:
+    """Strip niqqud, fold final letters and case-fold English."""
+    return NIQQUD_RE.sub('', text).translate(FINAL_LETTERS).casefold()
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(normalize(text or ''))
+
+
+def char_ngram_ids(text: str, dim: int, sizes: Iterable[int] = (2, 3, 4)) -> List[int]:
+    """Hashed character n-grams of the normalized text, padded with spaces at word edges.
+
+    Uses crc32 so ids are stable across runs (Python's str hash is salted).
+    """
+    padded = f" {' '.join(tokenize(text))} "
+    ids = []
+    for n in sizes:
+        for i in range(len(padded) - n + 1):
+            ids.append(zlib.crc32(padded[i:i + n].encode('utf-8')) % dim)
+    return ids
+
+
+def token_variants(token: str) -> List[str]:
+    """The token plus its forms with up to MAX_PREFIXES Hebrew prefix letters removed."""
+    variants = [token]
+    if not is_hebrew(token):
+        return variants
+    stem = token
+    for _ in range(MAX_PREFIXES):
+        if stem[0] not in HEBREW_PREFIXES or len(stem) - 1 < MIN_STEM:
+            break
+        stem = stem[1:]
+        variants.append(stem)
+    return variants
+
+
+class InvertedIndex:
+    """Word-level inverted index over note titles and descriptions.
+
+    Every token is posted under all of its prefix variants, so 'לרשימה' and
+    'הרשימה' both reach notes containing 'רשימה'. A query is the intersection
+    of the postings of its tokens, smallest posting set first. ``rank`` scores
+    notes with BM25 instead, counting title tokens TITLE_WEIGHT times.
+    """
+
+    def __init__(self, fields: Iterable[str] = ('title', 'description')):
+        self.fields = tuple(fields)
+        self.postings: Dict[str, Set[str]] = {}
+        self.doc_terms: Dict[str, Dict[str, float]] = {}  # id -> term -> weighted frequency
+        self.doc_len: Dict[str, float] = {}
+        self.doc_title: Dict[str, Tuple[str, ...]] = {}
+        self.total_len = 0.0
+
+    def rebuild(self, notes: List[Dict]):
+        self.postings.clear()
+        self.doc_terms.clear()
+        self.doc_len.clear()
+        self.doc_title.clear()
+        self.total_len = 0.0
+        for note in notes:
+            self.add(note)
+
+    def add(self, note: Dict):
+        note_id = note["id"]
+        terms: Dict[str, float] = {}
+        length = 0.0
+        for field in self.fields:
+            weight = TITLE_WEIGHT if field == 'title' else 1.0
+            tokens = tokenize(note.get(field))
+            length += weight * len(tokens)
+            for token in tokens:
+                for variant in token_variants(token):
+                    terms[variant] = terms.get(variant, 0.0) + weight
+        for term in terms:
+            self.postings.setdefault(term, set()).add(note_id)
+        self.doc_terms[note_id] = terms
+        self.doc_len[note_id] = length
+        self.doc_title[note_id] = tuple(tokenize(note.get('title')))
+        self.total_len += length
+
+    def remove(self, note_id: str):
+        self.total_len -= self.doc_len.pop(note_id, 0.0)
+        self.doc_title.pop(note_id, None)
+        for term in self.doc_terms.pop(note_id, ()):
+            ids = self.postings.get(term)
+            if ids is not None:
+                ids.discard(note_id)
+                if not ids:
+                    del self.postings[term]
+
+    def update(self, note: Dict):
+        self.remove(note["id"])
+        self.add(note)
+
+    def search(self, query: str) -> Set[str]:
+        """Ids of notes containing every query word (in any prefixed form)."""
+        per_token = []
+        for token in tokenize(query):
+            ids = set()
+            for variant in token_variants(token):
+                ids |= self.postings.get(variant, set())
+            if not ids:
+                return set()
+            per_token.append(ids)
+        if not per_token:
+            return set()
+        per_token.sort(key=len)
+        result = set(per_token[0])
+        for ids in per_token[1:]:
+            result &= ids
+            if not result:
+                break
+        return result
+
+    def rank(self, query: str, k: int = 5, order: Optional[Dict[str, int]] = None) -> List[Tuple[str, float]]:
+        """Top ``k`` (id, score) pairs by BM25, best first; ties go to the earlier note in ``order``.
+
+        A note only needs one query word to be scored. Each query word scores
+        through its best-matching prefix variant. Notes whose whole title is the
+        query get EXACT_TITLE_BOOST on top.
+        """
+        tokens = tokenize(query)
+        if not tokens or not self.doc_terms:
+            return []
+        n_docs = len(self.doc_terms)
+        avg_len = (self.total_len / n_docs) or 1.0
+        scores: Dict[str, float] = {}
+        for token in tokens:
+            best: Dict[str, float] = {}
+            for variant in token_variants(token):
+                ids = self.postings.get(variant)
+                if not ids:
+                    continue
+                idf = math.log(1 + (n_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+                for note_id in ids:
+                    tf = self.doc_terms[note_id][variant]
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[note_id] / avg_len)
+                    score = idf * tf * (BM25_K1 + 1) / (tf + norm)
+                    if score > best.get(note_id, 0.0):
+                        best[note_id] = score
+            for note_id, score in best.items():
+                scores[note_id] = scores.get(note_id, 0.0) + score
+        query_title = tuple(tokens)
+        for note_id in scores:
+            if self.doc_title[note_id] == query_title:
+                scores[note_id] += EXACT_TITLE_BOOST
+        order = order or {}
+        return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -order.get(item[0], 0)))
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Trigram postings for substring search over note titles and descriptions.
+
+    Keeps FindNoteTool's substring semantics (English case-insensitive, Hebrew
+    exact) without scanning all text: the postings of the query's trigrams are
+    intersected into a candidate set, and only the candidates are checked with
+    a real substring test. Queries shorter than three characters have no
+    trigrams and fall back to checking every note.
+    """
+
+    def __init__(self, fields: Iterable[str] = ('title', 'description')):
+        self.fields = tuple(fields)
+        self.postings: Dict[str, Set[str]] = {}
+        self.doc_grams: Dict[str, Set[str]] = {}
+        self.texts: Dict[str, List[str]] = {}
+
+    def rebuild(self, notes: List[Dict]):
+        self.postings.clear()
+        self.doc_grams.clear()
+        self.texts.clear()
+        for note in notes:
+            self.add(note)
+
+    def add(self, note: Dict):
+        note_id = note["id"]
+        texts = [note.get(field) or "" for field in self.fields]
+        grams = set()
+        for text in texts:
+            grams |= trigrams(text.lower())
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(note_id)
+        self.doc_grams[note_id] = grams
+        self.texts[note_id] = texts
+
+    def remove(self, note_id: str):
+        self.texts.pop(note_id, None)
+        for gram in self.doc_grams.pop(note_id, ()):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(note_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def update(self, note: Dict):
+        self.remove(note["id"])
+        self.add(note)
+
+    def search(self, query: str) -> Set[str]:
+        """Ids of notes whose title or description contains ``query``."""
+        if not query:
+            return set()
+        folded = query.lower()
+        grams = trigrams(folded)
+        if grams:
+            candidate_sets = []
+            for gram in grams:
+                ids = self.postings.get(gram)
+                if not ids:
+                    return set()
+                candidate_sets.append(ids)
+            candidate_sets.sort(key=len)
+            candidates = set(candidate_sets[0])
+            for ids in candidate_sets[1:]:
+                candidates &= ids
+                if not candidates:
+                    return set()
+        else:
+            candidates = self.texts.keys()
+        hebrew = is_hebrew(query)
+        result = set()
+        for note_id in candidates:
+            for text in self.texts[note_id]:
+                if (query in text) if hebrew else (folded in text.lower()):
+                    result.add(note_id)
+                    break
+        return result
@@ -0,0 +1,76 @@
+import copy
+import json
+from collections import deque
+from typing import Dict, List, Optional
+
+
+class UndoHistory:
+    """Undo/redo stacks of note changes, stored as deltas.
+
+    NLPService reports every add/update/remove; the deltas gathered between
+    two saves form one step, which is what one voice command changes. A delta
+    holds only what is needed to reverse it (the created note, the changed
+    fields before and after, or the removed note), so undoing costs time in
+    proportion to the change. Steps are sized once as encoded JSON; when the
+    total passes ``budget_bytes`` the oldest steps are dropped.
+    """
+
+    def __init__(self, budget_bytes: int = 256 * 1024):
+        self.budget_bytes = budget_bytes
+        self.undo_steps: deque = deque()  # (deltas, size), oldest first
+        self.redo_steps: List = []
+        self.size = 0
+        self.suspended = False  # set while an undo/redo is being applied
+        self._pending: List[Dict] = []
+
+    def record_add(self, note: Dict):
+        if not self.suspended:
+            self._pending.append({'op': 'add', 'note': copy.deepcopy(note)})
+
+    def record_update(self, note: Dict, changes: Dict):
+        if not self.suspended:
+            before = {key: copy.deepcopy(note.get(key)) for key in changes}
+            self._pending.append({'op': 'update', 'id': note["id"], 'before': before, 'after': copy.deepcopy(changes)})
+
+    def record_remove(self, note: Dict, position: Optional[int]):
+        """``position`` is the note's index among its parent's children, or None if the parent goes too."""
+        if not self.suspended:
+            self._pending.append({'op': 'remove', 'note': copy.deepcopy(note), 'position': position})
+
+    def seal(self):
+        """Close the current step (called on every save)."""
+        if not self._pending:
+            return
+        deltas, self._pending = self._pending, []
+        self.redo_steps.clear()
+        self._push(deltas)
+
+    def _push(self, deltas: List[Dict]):
+        size = len(json.dumps(deltas, ensure_ascii=False))
+        self.undo_steps.append((deltas, size))
+        self.size += size
+        while self.size > self.budget_bytes and len(self.undo_steps) > 1:
+            _, dropped = self.undo_steps.popleft()
+            self.size -= dropped
+
+    def pop_undo(self) -> Optional[List[Dict]]:
+        self.seal()
+        if not self.undo_steps:
+            return None
+        deltas, size = self.undo_steps.pop()
+        self.size -= size
+        self.redo_steps.append(deltas)
+        return deltas
+
+    def pop_redo(self) -> Optional[List[Dict]]:
+        if not self.redo_steps:
+            return None
+        deltas = self.redo_steps.pop()
+        self._push(deltas)
+        return deltas
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+        self.size = 0
+        self._pending = []
@@ -0,0 +1,72 @@
+import re
+from typing import Callable, Dict, List, Optional
+
+# "add milk, eggs and bread to shopping list"
+ADD_EN_RE = re.compile(r'^(?:please\s+)?(?:add|create|put)\s+(.+)$', re.IGNORECASE)
+PARENT_EN_RE = re.compile(r'\s+(?:to|under|into)\s+(?:the\s+)?(?:note\s+)?', re.IGNORECASE)
+ITEMS_EN_RE = re.compile(r'\s*,\s*(?:and\s+)?|\s+and\s+', re.IGNORECASE)
+# "הוסף חלב, ביצים ולחם לרשימת קניות"
+ADD_HE_RE = re.compile(r'^(?:הוסף|תוסיף|תוסיפי|צור|תיצור|תיצרי)\s+(.+)$')
+PARENT_HE_WORDS = ('אל', 'תחת', 'ל')
+ITEMS_HE_RE = re.compile(r'\s*,\s*')
+# The conjunction ו glued to the last item ("ביצים ולחם"). Many nouns start with ו too
+# ("וטרינר", "ויטמינים"), so it is only split off the last part of a comma separated list
+AND_HE_RE = re.compile(r'\s+ו(?=\S{2,}$)')
+
+
+def split_items(text: str, is_hebrew: bool) -> List[str]:
+    """Split a spoken list ("a, b and c" / "א, ב וג") into its items."""
+    parts = (ITEMS_HE_RE if is_hebrew else ITEMS_EN_RE).split(text)
+    if is_hebrew and len(parts) > 1:
+        # ...and only when the item before it is no longer than the others ("חלב, טיפול אצל וטרינר")
+        last = AND_HE_RE.split(parts[-1].strip())
+        if len(last) == 2 and len(last[0].split()) <= max(len(part.split()) for part in parts[:-1]):
+            parts[-1:] = last
+    items = []
+    for item in parts:
+        item = item.strip(" .'\"")
+        if item and item not in items:
+            items.append(item)
+    return items
+
+
+def parse_multi_create(text: str, is_hebrew: bool, resolve_parent: Callable[[str], Optional[Dict]],
+                       current_note: Optional[Dict] = None) -> Optional[Dict]:
+    """Turn "add X, Y and Z to <parent>" into ``{'titles': [...], 'parent': note}``.
+
+    The parent is the first "to <title>" / "ל<title>" whose title names an
+    existing note; without one, the list goes under ``current_note`` (and must
+    then have at least two items). Returns None when the utterance is not a
+    list to add.
+    """
+    match = (ADD_HE_RE if is_hebrew else ADD_EN_RE).match(text.strip())
+    if not match:
+        return None
+    rest = match.group(1)
+    items_text, parent = rest, None
+    if is_hebrew:
+        words = rest.split()
+        for i in range(1, len(words)):
+            word = words[i]
+            if word in PARENT_HE_WORDS:
+                candidate = " ".join(words[i + 1:])
+            elif word.startswith('ל') and len(word) > 2:
+                candidate = " ".join([word[1:]] + words[i + 1:])
+            else:
+                continue
+            parent = resolve_parent(candidate) if candidate else None
+            if parent:
+                items_text = " ".join(words[:i])
+                break
+    else:
+        for sep in PARENT_EN_RE.finditer(rest):
+            parent = resolve_parent(rest[sep.end():])
+            if parent:
+                items_text = rest[:sep.start()]
+                break
+    if parent is None and current_note is None:
+        return None
+    items = split_items(items_text, is_hebrew)
+    if not items or (parent is None and len(items) < 2):
+        return None
+    return {'titles': items, 'parent': parent or current_note}
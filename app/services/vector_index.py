@@ -0,0 +1,96 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.services.text_index import char_ngram_ids
+
+TITLE_WEIGHT = 2.0
+
+
+class VectorIndex:
+    """Hashed character n-gram vectors of notes in one contiguous NumPy matrix.
+
+    Each row is a note's L2-normalized log term-frequency vector (title grams
+    count double). IDF changes with every note, so it is not baked into the
+    rows: the query is weighted by idf squared instead, which gives the same
+    ranking signal as TF-IDF on both sides at the cost of a single mat-vec.
+    Rows are added and removed in O(dim); a removed row is filled with the
+    last one, and the matrix doubles when full.
+    """
+
+    def __init__(self, dim: int = 1024, capacity: int = 64):
+        self.dim = dim
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.row_ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.df = np.zeros(dim, dtype=np.float32)  # notes containing each feature
+        self._features: Dict[str, np.ndarray] = {}  # id -> feature ids present, for df upkeep
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def rebuild(self, notes: List[Dict]):
+        self.matrix = np.zeros((max(64, len(notes)), self.dim), dtype=np.float32)
+        self.row_ids = []
+        self.rows = {}
+        self.df[:] = 0
+        self._features = {}
+        for note in notes:
+            self.add(note)
+
+    def vectorize(self, note: Dict) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        np.add.at(vector, char_ngram_ids(note.get('title') or '', self.dim), TITLE_WEIGHT)
+        np.add.at(vector, char_ngram_ids(note.get('description') or '', self.dim), 1.0)
+        return vector
+
+    def add(self, note: Dict):
+        note_id = note["id"]
+        if note_id in self.rows:
+            self.remove(note_id)
+        counts = self.vectorize(note)
+        present = np.flatnonzero(counts)
+        row = np.log1p(counts)
+        norm = np.linalg.norm(row)
+        if norm:
+            row /= norm
+        if len(self.row_ids) == self.matrix.shape[0]:
+            self.matrix = np.vstack([self.matrix, np.zeros_like(self.matrix)])
+        self.matrix[len(self.row_ids)] = row
+        self.rows[note_id] = len(self.row_ids)
+        self.row_ids.append(note_id)
+        self.df[present] += 1
+        self._features[note_id] = present
+
+    def remove(self, note_id: str):
+        row = self.rows.pop(note_id, None)
+        if row is None:
+            return
+        self.df[self._features.pop(note_id)] -= 1
+        last = len(self.row_ids) - 1
+        if row != last:
+            self.matrix[row] = self.matrix[last]
+            moved = self.row_ids[last]
+            self.row_ids[row] = moved
+            self.rows[moved] = row
+        self.matrix[last] = 0
+        self.row_ids.pop()
+
+    def update(self, note: Dict):
+        self.add(note)
+
+    def search(self, query: str, k: int = 5, min_score: float = 0.1) -> List[Tuple[str, float]]:
+        """Top ``k`` (id, cosine-like score) pairs, best first."""
+        n = len(self.row_ids)
+        ids = char_ngram_ids(query, self.dim)
+        if not n or not ids:
+            return []
+        counts = np.bincount(ids, minlength=self.dim).astype(np.float32)
+        idf = np.log((1 + n) / (1 + self.df)) + 1
+        q = np.log1p(counts) * idf * idf
+        q /= np.linalg.norm(q)
+        scores = self.matrix[:n] @ q
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.row_ids[i], float(scores[i])) for i in top if scores[i] >= min_score]
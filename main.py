@@ -165,7 +165,15 @@ class NoteSpeakerApp(MDApp):
         # Get API key from config or environment
         api_key = self.get_gemini_api_key()
         
-        self.nlp_service = NLPService(api_key=api_key)
+        self.nlp_service = NLPService(
+            api_key=api_key,
+            storage_backend=self.config_service.get('storage_backend', 'json'),
+            fsync_interval=self.config_service.get('fsync_interval', 1.0),
+            substring_search=self.config_service.get('substring_search', True),
+            search_mode=self.config_service.get('search_mode', 'match'),
+            llm_context_budget=self.config_service.get('llm_context_budget', 2000),
+            note_history=self.config_service.get('note_history', False)
+        )
         
         # Initialize screens
         self.screen_manager = None
@@ -201,8 +209,7 @@ class NoteSpeakerApp(MDApp):
         print(f"Loaded saved language: {saved_language}")
         print(f"Config file location: {self.config_service.config_file}")
         
-        # Ensure notes are loaded
-        self.nlp_service.notes, self.nlp_service.last_note_id = self.nlp_service._load_notes_and_last_id()
+        # NLPService loaded the notes when it was created
         print(f"[DEBUG] Loaded {len(self.nlp_service.notes)} notes at startup")
         
         # Create the main layout
@@ -239,9 +246,27 @@ class NoteSpeakerApp(MDApp):
         
         # Start persistent logging to file
         LogService()
+
+        # Daily digest at the configured time, built on the main thread like every other note read
+        from kivy.clock import Clock
+        self.nlp_service.digests.start(
+            self.config_service.get('digest_time', '21:00'),
+            on_ready=self.on_digest_ready,
+            dispatch=lambda fn: Clock.schedule_once(lambda dt: fn(), 0)
+        )
         
         return self.main_layout
     
+    def on_stop(self):
+        """Make sure queued note writes reach the disk before exiting"""
+        self.nlp_service.digests.stop()
+        self.nlp_service.flush()
+
+    def on_digest_ready(self, digest):
+        """Called on the main thread once the daily digest is built; show (and speak) it"""
+        is_hebrew = self.main_screen.get_language().startswith('he')
+        self.main_screen.add_chat_message('agent', self.nlp_service.digests.describe(is_hebrew, digest))
+    
     def show_side_menu(self, instance=None):
         """Show the side menu with animation"""
         # Animate menu sliding in
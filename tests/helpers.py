@@ -0,0 +1,39 @@
+import os
+import shutil
+import tempfile
+import unittest
+from typing import Dict
+from unittest import mock
+
+from app.services.nlp_service import NLPService
+
+
+class NotebookTestCase(unittest.TestCase):
+    """A fresh NLPService per test, with its notebook in a temporary directory.
+
+    ``service_options`` are passed to NLPService; every NLPService made during
+    the test (e.g. one reloading from disk) uses the same notes file.
+    """
+
+    service_options: Dict = {}
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.notes_file = os.path.join(self.temp_dir, 'notes.json')
+        patcher = mock.patch.object(NLPService, '_get_notes_file_path', lambda service: self.notes_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.nlp = NLPService(api_key=None, **self.service_options)
+
+    def tearDown(self):
+        # Wait for the background persister before removing its files
+        self.nlp.flush()
+        if self.nlp.note_store:
+            self.nlp.note_store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def create(self, title, parent_id=None, description=''):
+        """Create a note through the create tool; returns its id."""
+        self.nlp.tools['create'].run({'title': title, 'parent_id': parent_id, 'description': description,
+                                      'nlp_service': self.nlp})
+        return self.nlp.find_child_by_title(parent_id, title)['id']
@@ -0,0 +1,64 @@
+import unittest
+from app.services.nlp_service import NLPService
+from app.services.utterance_splitter import split_items
+from tests.helpers import NotebookTestCase
+
+class TestBatchCommands(NotebookTestCase):
+    def setUp(self):
+        super().setUp()
+        self.appends = []
+        append = self.nlp.persister.append
+        self.nlp.persister.append = lambda data: (self.appends.append(data), append(data))
+
+    def test_auto_yes_persists_once(self):
+        lines = ["צור רשימת קניות", "", "תמצא רשימת קניות", "הוסף תת רשומה חלב", "צור תיקון רכב"]
+        results = list(self.nlp.process_commands(lines, language="he-IL"))
+        self.assertEqual(len(results), 4)
+        self.assertEqual(sorted(n['title'] for n in self.nlp.notes), ['חלב', 'רשימת קניות', 'תיקון רכב'])
+        self.assertEqual(len(self.appends), 1)
+        self.assertEqual(self.nlp.conversation_history, [])
+
+        self.nlp.flush()
+        reloaded = NLPService(api_key=None)
+        self.assertEqual(len(reloaded.notes), 3)
+
+    def test_bulk_lines_are_not_sent_to_the_model(self):
+        nlp = NLPService(api_key='test-key')
+        asked = []
+        nlp.select_tool_async = lambda text, language: asked.append(text)
+        results = list(nlp.process_commands(["call mom", "xyzzy plugh"], language="en"))
+        self.assertEqual(asked, [])
+        self.assertFalse(any('llm_future' in r['result'] for r in results))
+        nlp.process_command("call mom", "en")
+        self.assertEqual(asked, ["call mom"])
+
+    def test_collect_leaves_notes_untouched(self):
+        results = list(self.nlp.process_commands(["צור א", "צור ב"], language="he-IL", confirm='collect'))
+        self.assertEqual([r['pending']['pending_title'] for r in results], ['א', 'ב'])
+        self.assertEqual(self.nlp.notes, [])
+        self.assertEqual(self.appends, [])
+
+    def test_list_utterance_creates_sub_notes_in_one_save(self):
+        self.nlp.tools['create'].run({'title': 'רשימת קניות', 'nlp_service': self.nlp})
+        del self.appends[:]
+        response = self.nlp.process_command("הוסף חלב, ביצים ולחם לרשימת קניות", language="he-IL")
+        self.assertIn("3 תת-רשומות", response['response'])
+        self.nlp.process_command("כן", language="he-IL")
+        parent = self.nlp.find_note_by_title('רשימת קניות')
+        self.assertEqual([self.nlp.get_note_by_id(i)['title'] for i in parent['children']], ['חלב', 'ביצים', 'לחם'])
+        self.assertEqual(len(self.appends), 1)
+
+    def test_vav_initial_words_are_not_split(self):
+        self.assertEqual(split_items("טיפול אצל וטרינר", True), ["טיפול אצל וטרינר"])
+        self.assertEqual(split_items("ויטמינים, חלב", True), ["ויטמינים", "חלב"])
+        self.assertEqual(split_items("חלב, טיפול אצל וטרינר", True), ["חלב", "טיפול אצל וטרינר"])
+        self.assertEqual(split_items("שמן מנוע, פילטר אוויר ומגבים", True), ["שמן מנוע", "פילטר אוויר", "מגבים"])
+
+    def test_list_as_new_content_updates_the_note(self):
+        self.nlp.tools['create'].run({'title': 'groceries', 'nlp_service': self.nlp})
+        self.nlp.process_command("find groceries", language="en-US")
+        response = self.nlp.process_command("add to description: bread, milk", language="en-US")
+        self.assertEqual(response['operation'], 'update_ask_content')
+
+if __name__ == "__main__":
+    unittest.main()
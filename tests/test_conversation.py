@@ -16,7 +16,13 @@ class TestConversationHebrewFindAndUpdateDescription(unittest.TestCase):
         self.nlp._save_notes()
 
     def tearDown(self):
+        # Wait for the background persister before removing its files
+        self.nlp.flush()
         os.unlink(self.temp_notes_file.name)
+        # Files kept next to the notes: journal, change feed and digest state
+        for path in (self.nlp.journal.journal_path, self.nlp.change_feed.path, self.nlp.digests.state_path):
+            if os.path.exists(path):
+                os.unlink(path)
 
     def test_find_and_update_description_hebrew(self):
         """
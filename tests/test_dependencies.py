@@ -0,0 +1,106 @@
+import random
+import unittest
+
+from app.services.dependency_graph import DependencyCycleError, DependencyGraph
+from app.services.nlp_service import NLPService
+from tests.helpers import NotebookTestCase
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def setUp(self):
+        self.notes = {str(i): {'id': str(i), 'title': f'task {i}', 'children': [], 'done': False} for i in range(8)}
+        self.graph = DependencyGraph(self.notes.get)
+        self.graph.rebuild(list(self.notes.values()))
+
+    def assert_topological(self):
+        for note_id, prerequisites in self.graph.depends_on.items():
+            for prerequisite in prerequisites:
+                self.assertLess(self.graph.order[prerequisite], self.graph.order[note_id])
+
+    def test_back_edges_reorder_and_cycles_are_rejected(self):
+        # 7 -> 5 -> 3 -> 1 runs against the initial order
+        self.graph.add_edge('7', '5')
+        self.graph.add_edge('5', '3')
+        self.graph.add_edge('3', '1')
+        self.assert_topological()
+        with self.assertRaises(DependencyCycleError):
+            self.graph.add_edge('1', '7')
+        self.assertTrue(self.graph.creates_cycle('1', '5'))
+        self.assertFalse(self.graph.creates_cycle('7', '1'))
+        self.assert_topological()
+
+    def test_random_edges_keep_a_valid_order(self):
+        rng = random.Random(3)
+        for _ in range(60):
+            a, b = rng.sample(sorted(self.notes), 2)
+            try:
+                self.graph.add_edge(a, b)
+            except DependencyCycleError:
+                pass
+            self.assert_topological()
+
+    def test_ready_set_follows_done_state(self):
+        self.graph.add_edge('1', '2')
+        self.graph.add_edge('2', '3')
+        self.assertNotIn('2', self.graph.ready)
+        self.assertNotIn('3', self.graph.ready)
+        self.notes['1']['done'] = True
+        self.graph.update(self.notes['1'])
+        self.assertIn('2', self.graph.ready)
+        self.assertNotIn('1', self.graph.ready)
+        self.assertEqual(self.graph.next_tasks(k=3), ['0', '2', '4'])
+
+
+class TestDependencyCommands(NotebookTestCase):
+    def setUp(self):
+        super().setUp()
+        for title in ('Fix AirBox', 'Buy Airbox', 'Change Oil'):
+            self.nlp.tools['create'].run({'title': title, 'nlp_service': self.nlp})
+
+    def test_depends_on_and_next_tasks(self):
+        response = self.nlp.process_command("fix airbox depends on buy airbox", "en-US")
+        self.assertEqual(response['response'], "'Fix AirBox' now depends on 'Buy Airbox'")
+        response = self.nlp.process_command("buy airbox depends on fix airbox", "en-US")
+        self.assertIn("cycle", response['response'])
+
+        response = self.nlp.process_command("what can I do next", "en-US")
+        self.assertEqual([n['title'] for n in response['matches']], ['Buy Airbox', 'Change Oil'])
+
+        buy = self.nlp.find_note_by_title('Buy Airbox')
+        self.nlp.tools['update'].run({'target_id': buy['id'], 'updates': {'done': True}, 'nlp_service': self.nlp})
+        self.assertEqual([n['title'] for n in self.nlp.next_tasks()], ['Fix AirBox', 'Change Oil'])
+
+        # The edge is stored in relations['depends_on'] and rebuilt on load
+        self.nlp.flush()
+        reloaded = NLPService(api_key=None)
+        fix = reloaded.find_note_by_title('Fix AirBox')
+        self.assertEqual(fix['relations']['depends_on'], [buy['id']])
+        self.assertTrue(reloaded.dependencies.creates_cycle(fix['id'], buy['id']))
+
+    def test_undo_delete_restores_dependents(self):
+        self.nlp.process_command("fix airbox depends on buy airbox", "en-US")
+        fix, buy = self.nlp.find_note_by_title('Fix AirBox'), self.nlp.find_note_by_title('Buy Airbox')
+        edge = {'source': buy['id'], 'target': fix['id'], 'type': 'depends_on'}
+        self.nlp.tools['delete'].run({'target_id': 'Buy Airbox', 'nlp_service': self.nlp})
+        self.assertNotIn(edge, self.nlp.get_relations())
+        self.nlp.undo()
+        self.assertIn(edge, self.nlp.get_relations())
+        self.assertEqual([n['title'] for n in self.nlp.next_tasks()], ['Buy Airbox', 'Change Oil'])
+        self.assertTrue(self.nlp.dependencies.creates_cycle(fix['id'], buy['id']))
+
+    def test_delete_prunes_stored_dependencies(self):
+        self.nlp.process_command("fix airbox depends on buy airbox", "en-US")
+        fix, buy = self.nlp.find_note_by_title('Fix AirBox'), self.nlp.find_note_by_title('Buy Airbox')
+        self.nlp.tools['delete'].run({'target_id': 'Buy Airbox', 'nlp_service': self.nlp})
+        self.assertEqual(fix['relations']['depends_on'], [])
+        self.nlp.flush()
+        reloaded = NLPService(api_key=None)
+        self.assertEqual(reloaded.find_note_by_title('Fix AirBox')['relations']['depends_on'], [])
+        # One undo step brings back the note and the stored edge
+        self.nlp.undo()
+        self.assertEqual(fix['relations']['depends_on'], [buy['id']])
+        self.assertIn(fix['id'], self.nlp.dependencies.dependents[buy['id']])
+
+
+if __name__ == "__main__":
+    unittest.main()
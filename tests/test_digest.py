@@ -0,0 +1,98 @@
+import unittest
+from datetime import datetime
+
+from app.services.nlp_service import NLPService
+from tests.helpers import NotebookTestCase
+
+
+class TestDailyDigest(NotebookTestCase):
+    def update(self, note_id, **updates):
+        self.nlp.tools['update'].run({'target_id': note_id, 'updates': updates, 'nlp_service': self.nlp})
+
+    def test_digest_covers_only_changes_since_last_digest(self):
+        milk = self.create('Milk')
+        bread = self.create('Bread')
+        self.create('Typo')
+        self.nlp.tools['delete'].run({'target_id': 'Typo', 'nlp_service': self.nlp})
+        self.update(bread, done=True, done_date='2024-05-01T09:00:00')
+
+        digest = self.nlp.digests.build(datetime(2024, 5, 1, 21, 0))
+        self.assertEqual(digest['created'], ['Milk', 'Bread'])
+        self.assertEqual(digest['completed'], ['Bread'])
+        self.assertEqual(digest['deleted'], [])
+
+        self.update(milk, description='2 liters')
+        digest = self.nlp.digests.build(datetime(2024, 5, 2, 21, 0))
+        self.assertEqual((digest['created'], digest['updated'], digest['changes']), ([], ['Milk'], 1))
+        self.assertEqual(digest['since'], '2024-05-01T21:00:00')
+
+        # The cached digest and feed offset survive a restart
+        self.nlp.flush()
+        reloaded = NLPService(api_key=None)
+        self.assertEqual(reloaded.digests.digest['updated'], ['Milk'])
+        self.assertEqual(reloaded.digests.build()['changes'], 0)
+
+    def test_digest_command_reads_cached_digest(self):
+        self.create('Milk')
+        self.nlp.digests.build()
+        response = self.nlp.process_command("daily digest", "en-US")
+        self.assertEqual(response['operation'], 'digest')
+        self.assertEqual(response['response'], "Created 1: Milk. Open tasks: 1.")
+        response = self.nlp.process_command("סיכום יומי", "he-IL")
+        self.assertEqual(response['response'], "נוצרו 1: Milk. משימות פתוחות: 1.")
+
+    def test_scheduled_build_runs_through_dispatch(self):
+        self.create('Milk')
+        queued, ready = [], []
+        self.nlp.digests.start('21:00', on_ready=ready.append, dispatch=queued.append)
+        self.nlp.digests.stop()
+        # The missed digest is handed to the main thread, not built on the caller's
+        self.assertEqual((len(queued), ready, self.nlp.digests.digest), (1, [], None))
+        queued[0]()
+        self.assertEqual(ready[0]['created'], ['Milk'])
+
+    def test_done_date_index_answers_range_queries(self):
+        ids = [self.create(title) for title in ('Oil', 'Tires', 'Brakes', 'Wipers')]
+        for note_id, date in zip(ids, ['2024-05-06T10:00:00', '2024-05-08T09:00:00', '2024-05-08T18:00:00', None]):
+            self.update(note_id, done=True, done_date=date)
+        index = self.nlp.done_index
+        self.assertEqual(index.range('2024-05-07', '2024-05-09'), [ids[1], ids[2]])
+        self.assertEqual(index.count('2024-05-01', '2024-05-08'), 1)
+        self.assertEqual(index.histogram(), {'2024-05-06': 1, '2024-05-08': 2})
+        self.assertEqual(index.undated, {ids[3]})
+
+        self.update(ids[1], done=False, done_date=None)
+        self.assertEqual(index.range(), [ids[0], ids[2]])
+        self.assertEqual(index.open, {ids[1]})
+        self.nlp.tools['delete'].run({'target_id': 'Brakes', 'nlp_service': self.nlp})
+        self.assertEqual(index.count(), 1)
+
+    def test_mark_done_and_ask_what_was_finished(self):
+        self.create('Oil')
+        self.nlp.process_command("find oil", "en-US")
+        response = self.nlp.process_command("mark as done", "en-US")
+        self.assertEqual(response['response'], "Marked 'Oil' as done")
+        self.assertTrue(self.nlp.find_note_by_title('Oil')['done_date'])
+        response = self.nlp.process_command("what did I finish today", "en-US")
+        self.assertEqual(response['response'], "You finished 1 tasks today: Oil")
+        response = self.nlp.process_command("מה סיימתי השבוע", "he-IL")
+        self.assertEqual(response['response'], "סיימת 1 משימות השבוע: Oil")
+        response = self.nlp.process_command("progress report", "en-US")
+        self.assertTrue(response['response'].startswith("1 tasks done in the last days ("))
+
+    def test_progress_and_done_words_inside_searches_are_not_commands(self):
+        project = self.create('התקדמות פרויקט')
+        marked = self.create('tasks marked as done')
+        for text, language, note_id in (("התקדמות פרויקט", 'he-IL', project),
+                                        ("find tasks marked as done", 'en-US', marked)):
+            self.nlp.conversation_state = None
+            response = self.nlp.process_command(text, language)
+            self.assertNotIn(response.get('operation'), ('progress', 'done'), text)
+            self.assertEqual([n['id'] for n in response['matches']], [note_id], text)
+        self.assertFalse(self.nlp.get_note_by_id(marked).get('done'))
+        self.nlp.conversation_state = None
+        self.assertEqual(self.nlp.process_command("התקדמות", 'he-IL')['operation'], 'progress')
+
+
+if __name__ == "__main__":
+    unittest.main()
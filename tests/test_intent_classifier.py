@@ -0,0 +1,52 @@
+import unittest
+from app.services.intent_classifier import default_classifier
+from tests.helpers import NotebookTestCase
+
+class TestIntentClassifier(unittest.TestCase):
+    def setUp(self):
+        self.classifier = default_classifier()
+
+    def test_unseen_phrasings(self):
+        cases = {
+            "תמחק את הרשומה בבקשה": 'delete',
+            "remove the note please": 'delete',
+            "add a sub note called cheese": 'add_sub_note',
+            "תשנה את התיאור": 'update',
+            "איפה הפתק על הבנק": 'find',
+            "כן בטח": 'yes',
+        }
+        for text, intent in cases.items():
+            self.assertEqual(self.classifier.confident(text), intent, text)
+
+    def test_unsure_about_out_of_domain(self):
+        self.assertIsNone(self.classifier.confident("זה בסדר תמשיך"))
+
+    def test_probabilities(self):
+        probs = self.classifier.predict_proba("תוסיף תת רשומה עגבניות")
+        self.assertAlmostEqual(float(probs.sum()), 1.0, places=5)
+        self.assertEqual(self.classifier.classify("תוסיף תת רשומה עגבניות")[0], 'add_sub_note')
+        # No n-grams at all: every intent equally likely, so nothing is confident
+        self.assertIsNone(self.classifier.confident(""))
+
+class TestClassifierFallback(NotebookTestCase):
+    """With a note in focus, a plain title is still a search."""
+
+    def test_plain_titles_are_found_while_a_note_is_in_focus(self):
+        shopping = self.create('רשימת קניות')
+        groceries = self.create('groceries')
+        for title, parent_id in (('ביצים', shopping), ('לחם', shopping), ('eggs', groceries), ('car', None)):
+            self.create(title, parent_id)
+        for text, language, focus in (("ביצים", "he-IL", "תמצא רשימת קניות"), ("לחם", "he-IL", "תמצא רשימת קניות"),
+                                      ("eggs", "en-US", "find groceries"), ("car", "en-US", "find groceries")):
+            self.nlp.process_command(focus, language)
+            response = self.nlp.process_command(text, language)
+            self.assertEqual([n['title'] for n in response['matches']], [text], text)
+
+    def test_classifier_still_catches_unlisted_phrasings(self):
+        self.create('groceries')
+        self.nlp.process_command("find groceries", "en-US")
+        response = self.nlp.process_command("get rid of this note", "en-US")
+        self.assertEqual(response['response'], "Delete the note groceries?")
+
+if __name__ == "__main__":
+    unittest.main()
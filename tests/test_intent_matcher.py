@@ -0,0 +1,34 @@
+import re
+import unittest
+
+from app.services.intent_matcher import INTENT_PHRASES, WHOLE_WORD_INTENTS, detect_intents
+
+
+def occurs(intent, phrase, text):
+    if intent in WHOLE_WORD_INTENTS:
+        return re.search(r'(?<!\w)' + re.escape(phrase) + r'(?!\w)', text) is not None
+    return phrase in text
+
+
+def scan(text):
+    """The per-phrase substring checks detect_intents replaced."""
+    return {intent for intent, phrases in INTENT_PHRASES.items() if any(occurs(intent, p, text) for p in phrases)}
+
+
+class TestIntentMatcher(unittest.TestCase):
+    def test_matches_per_phrase_scan(self):
+        phrases = [phrase for phrases in INTENT_PHRASES.values() for phrase in phrases]
+        texts = phrases + [f"please {phrase} the shopping list" for phrase in phrases]
+        texts += [f"{a} {b}" for a, b in zip(phrases, reversed(phrases))]
+        texts += ["", "nothing to see here", "רשימת קניות"]
+        for text in texts:
+            self.assertEqual(detect_intents(text), scan(text), text)
+
+    def test_whole_word_triggers(self):
+        self.assertNotIn('summarize_he', detect_intents("תמצא הסכם שכירות"))
+        self.assertIn('summarize_he', detect_intents("סכם את הסכם שכירות"))
+        self.assertEqual(detect_intents("findings"), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
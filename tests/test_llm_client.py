@@ -0,0 +1,76 @@
+import unittest
+import json
+import threading
+import time
+from concurrent.futures import CancelledError
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from app.services.llm_client import LLMClient, LLMError
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    """Answers generateContent like the Gemini REST API, echoing a canned tool choice."""
+    reply = {"tool": "find", "params": {"query": "חלב"}, "response": "", "requires_confirmation": False}
+    delay = 0.0
+    calls = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        FakeGeminiHandler.calls.append((self.path, body))
+        time.sleep(FakeGeminiHandler.delay)
+        text = "```json\n" + json.dumps(FakeGeminiHandler.reply, ensure_ascii=False) + "\n```"
+        payload = json.dumps({"candidates": [{"content": {"parts": [{"text": text}]}}]}).encode('utf-8')
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (deadline test)
+
+    def log_message(self, *args):
+        pass
+
+class TestLLMClient(unittest.TestCase):
+    def setUp(self):
+        FakeGeminiHandler.calls = []
+        FakeGeminiHandler.delay = 0.0
+        self.server = HTTPServer(('127.0.0.1', 0), FakeGeminiHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.client = LLMClient('test-key', base_url=base_url, timeout=2.0, max_workers=1)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_parses_reply_and_caches_it(self):
+        result = self.client.generate_json("prompt", cache_key=("חלב", "idle")).result(timeout=5)
+        self.assertEqual(result["params"]["query"], "חלב")
+        path, body = FakeGeminiHandler.calls[0]
+        self.assertIn("gemini-2.0-flash:generateContent?key=test-key", path)
+        self.assertEqual(body["contents"][0]["parts"][0]["text"], "prompt")
+
+        again = self.client.generate_json("prompt", cache_key=("חלב", "idle")).result(timeout=5)
+        self.assertEqual(again, result)
+        self.assertEqual(len(FakeGeminiHandler.calls), 1)
+
+    def test_deadline(self):
+        FakeGeminiHandler.delay = 0.5
+        future = self.client.generate_json("prompt", timeout=0.1)
+        with self.assertRaises(LLMError):
+            future.result(timeout=5)
+
+    def test_cancel_pending(self):
+        FakeGeminiHandler.delay = 0.3
+        in_flight = self.client.generate_json("first")
+        queued = self.client.generate_json("second")
+        time.sleep(0.1)
+        self.client.cancel_pending()
+        self.assertTrue(queued.cancelled())
+        with self.assertRaises(CancelledError):
+            in_flight.result(timeout=5)
+        self.assertEqual(len(FakeGeminiHandler.calls), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from app.services.nlp_service import NLPService
+from app.services.note_index import NoteIndex
+from tests.helpers import NotebookTestCase
+
+
+class TestNoteIndex(unittest.TestCase):
+    def test_lookups(self):
+        notes = [
+            {'id': '1', 'title': 'list', 'parent_id': None, 'children': ['2']},
+            {'id': '2', 'title': 'milk', 'parent_id': '1', 'children': []},
+            {'id': '3', 'title': 'milk', 'parent_id': None, 'children': []},
+        ]
+        index = NoteIndex()
+        index.rebuild(notes)
+        self.assertIs(index.get('2'), notes[1])
+        self.assertIs(index.find_child_by_title('1', 'milk'), notes[1])
+        self.assertIs(index.find_child_by_title(None, 'milk'), notes[2])
+        self.assertEqual([n['id'] for n in index.find_all_by_title('milk')], ['2', '3'])
+
+        index.update(notes[1], {'title': 'oat milk'})
+        self.assertIsNone(index.find_child_by_title('1', 'milk'))
+        self.assertEqual([n['id'] for n in index.find_all_by_title('milk')], ['3'])
+        index.remove(notes[1])
+        self.assertEqual(notes[0]['children'], [])
+        self.assertIsNone(index.get('2'))
+
+
+class TestNotebookOrder(NotebookTestCase):
+    def titles(self, nlp=None):
+        return [n['title'] for n in (nlp or self.nlp).notes]
+
+    def test_delete_keeps_insertion_order(self):
+        for title in 'abcdef':
+            self.create(title)
+        car = self.create('car')
+        self.create('oil', car)
+        self.create('g')
+        self.nlp.tools['delete'].run({'target_id': 'b', 'nlp_service': self.nlp})
+        self.nlp.delete_subtree(self.nlp.find_note_by_title('car'))
+        self.nlp.tools['delete'].run({'target_id': 'f', 'nlp_service': self.nlp})
+        self.assertEqual(self.titles(), ['a', 'c', 'd', 'e', 'g'])
+        self.create('h')
+        self.nlp.tools['delete'].run({'target_id': 'a', 'nlp_service': self.nlp})
+        self.assertEqual(self.titles(), ['c', 'd', 'e', 'g', 'h'])
+
+        # Replaying the journal after a restart gives the order the session showed
+        self.nlp.flush()
+        self.assertEqual(self.titles(NLPService(api_key=None)), self.titles())
+
+
+if __name__ == "__main__":
+    unittest.main()
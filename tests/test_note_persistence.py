@@ -0,0 +1,91 @@
+import unittest
+import os
+from app.services.nlp_service import NLPService
+from app.services.note_journal import NoteJournal
+from tests.helpers import NotebookTestCase
+
+class TestNotePersistence(NotebookTestCase):
+    def reload(self):
+        self.nlp.flush()
+        return NLPService(api_key=None)
+
+    def test_journal_replayed_on_load(self):
+        """Created, updated and deleted notes survive a restart without a full snapshot."""
+        self.nlp.tools['create'].run({'title': 'רשימת קניות', 'nlp_service': self.nlp})
+        self.nlp.tools['create'].run({'title': 'חלב', 'parent_id': '1', 'nlp_service': self.nlp})
+        self.nlp.tools['create'].run({'title': 'temp', 'nlp_service': self.nlp})
+        self.nlp.tools['update'].run({'target_id': '1', 'updates': 'weekly', 'nlp_service': self.nlp})
+        self.nlp.tools['delete'].run({'target_id': 'temp', 'nlp_service': self.nlp})
+        self.nlp.flush()
+        self.assertTrue(os.path.exists(self.nlp.journal.journal_path))
+
+        reloaded = self.reload()
+        self.assertEqual(reloaded.last_note_id, 3)
+        self.assertEqual([n['title'] for n in reloaded.notes], ['רשימת קניות', 'חלב'])
+        self.assertEqual(reloaded.notes[0]['description'], 'weekly')
+        self.assertEqual(reloaded.notes[0]['children'], ['2'])
+
+    def test_journal_replayed_without_snapshot(self):
+        """Journal entries written before the first notes.json snapshot are not lost."""
+        self.nlp.tools['create'].run({'title': 'a', 'nlp_service': self.nlp})
+        self.nlp.flush()
+        self.assertFalse(os.path.exists(self.nlp.notes_file))
+        reloaded = self.reload()
+        self.assertEqual([n['title'] for n in reloaded.notes], ['a'])
+        self.assertEqual(reloaded.last_note_id, 1)
+
+    def test_snapshot_supersedes_journal(self):
+        """A full save folds everything into notes.json and clears the journal."""
+        self.nlp.tools['create'].run({'title': 'a', 'nlp_service': self.nlp})
+        self.nlp._save_notes()
+        self.nlp.flush()
+        self.assertFalse(os.path.exists(self.nlp.journal.journal_path))
+        self.assertEqual([n['title'] for n in self.reload().notes], ['a'])
+
+    def test_compaction_keeps_all_changes(self):
+        """Changes written while the journal is being compacted are not lost."""
+        self.nlp.journal.compact_threshold = 512
+        for i in range(50):
+            self.nlp.tools['create'].run({'title': f'note {i}', 'nlp_service': self.nlp})
+        self.nlp.flush()
+        self.nlp.journal.wait()
+        reloaded = self.reload()
+        self.assertEqual(len(reloaded.notes), 50)
+        self.assertEqual(reloaded.last_note_id, 50)
+
+    def test_torn_journal_tail_is_ignored(self):
+        self.nlp.tools['create'].run({'title': 'a', 'nlp_service': self.nlp})
+        self.nlp.flush()
+        with open(self.nlp.journal.journal_path, 'ab') as f:
+            f.write(NoteJournal.encode([{'op': 'put'}])[:5])
+        self.assertEqual([n['title'] for n in self.reload().notes], ['a'])
+
+class TestSqliteStore(NotebookTestCase):
+    service_options = {'storage_backend': 'sqlite'}
+
+    def test_changes_survive_a_restart(self):
+        self.nlp.tools['create'].run({'title': 'list', 'nlp_service': self.nlp})
+        self.nlp.tools['create'].run({'title': 'milk', 'parent_id': '1', 'nlp_service': self.nlp})
+        self.nlp.tools['create'].run({'title': 'temp', 'nlp_service': self.nlp})
+        self.nlp.tools['update'].run({'target_id': '1', 'updates': 'weekly', 'nlp_service': self.nlp})
+        self.nlp.tools['delete'].run({'target_id': 'temp', 'nlp_service': self.nlp})
+        self.nlp.note_store.close()
+        self.nlp = NLPService(api_key=None, storage_backend='sqlite')
+        self.assertEqual([n['title'] for n in self.nlp.notes], ['list', 'milk'])
+        self.assertEqual(self.nlp.notes[0]['description'], 'weekly')
+        self.assertEqual(self.nlp.find_child_by_title('1', 'milk')['id'], '2')
+        self.assertEqual(self.nlp.last_note_id, 3)
+
+    def test_lookups_see_unsaved_changes_in_a_batch(self):
+        self.nlp.tools['create'].run({'title': 'list', 'nlp_service': self.nlp})
+        result = self.nlp.tools['create'].run({'titles': ['milk', 'milk'], 'parent_id': '1', 'nlp_service': self.nlp})
+        self.assertEqual((result['created'], result['skipped']), (['milk'], ['milk']))
+        with self.nlp.batch():
+            self.nlp.delete_subtree(self.nlp.find_note_by_title('list'))
+            self.assertIsNone(self.nlp.find_note_by_title('list'))
+            self.assertIsNone(self.nlp.get_note_by_id('2'))
+        self.assertTrue(self.nlp.note_store.is_empty())
+
+
+if __name__ == "__main__":
+    unittest.main()
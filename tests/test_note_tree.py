@@ -0,0 +1,92 @@
+import unittest
+from app.services.nlp_service import NLPService
+from tests.helpers import NotebookTestCase
+
+class TestNoteTree(NotebookTestCase):
+    def setUp(self):
+        super().setUp()
+        # Fiat Tipo example tree from the README
+        self.fiat = self.create('Fiat Tipo')
+        self.test = self.create('Make yearly test', self.fiat)
+        self.steering = self.create('Fix steering', self.test)
+        self.create('Send to repair', self.steering)
+        self.airbox = self.create('Fix AirBox', self.test)
+        self.create('Buy Airbox', self.airbox)
+        self.oil = self.create('Change Oil', self.fiat)
+        self.other = self.create('Groceries')
+
+    def test_children_field_tracks_creation(self):
+        self.assertEqual(self.nlp.get_note_by_id(self.fiat)['children'], [self.test, self.oil])
+        self.assertEqual(self.nlp.get_note_by_id(self.test)['children'], [self.steering, self.airbox])
+
+    def test_delete_removes_subtree_and_unlinks_parent(self):
+        result = self.nlp.tools['delete'].run({'target_id': 'Make yearly test', 'nlp_service': self.nlp})
+        self.assertEqual(len(result['deleted_ids']), 5)
+        self.assertEqual(sorted(n['title'] for n in self.nlp.notes), ['Change Oil', 'Fiat Tipo', 'Groceries'])
+        self.assertEqual(self.nlp.get_note_by_id(self.fiat)['children'], [self.oil])
+        self.assertIsNone(self.nlp.find_note_by_title('Buy Airbox'))
+
+        self.nlp.flush()
+        reloaded = NLPService(api_key=None)
+        self.assertEqual(sorted(n['title'] for n in reloaded.notes), ['Change Oil', 'Fiat Tipo', 'Groceries'])
+        self.assertEqual(reloaded.get_note_by_id(self.fiat)['children'], [self.oil])
+
+    def test_update_keeps_title_index_current(self):
+        self.nlp.tools['update'].run({'target_id': self.oil, 'updates': {'title': 'Change oil filter'}, 'nlp_service': self.nlp})
+        self.assertIsNone(self.nlp.find_note_by_title('Change Oil'))
+        self.assertEqual(self.nlp.find_child_by_title(self.fiat, 'Change oil filter')['id'], self.oil)
+
+    def test_summary_recomputes_only_the_changed_path(self):
+        summary = self.nlp.summaries.summary(self.fiat)
+        self.assertEqual((summary['notes'], summary['leaves'], summary['open_leaves']), (7, 3, 3))
+        self.nlp.summaries.computed = 0
+        self.nlp.tools['update'].run({'target_id': self.find('Buy Airbox'), 'nlp_service': self.nlp,
+                                      'updates': {'done': True, 'done_date': '2024-05-01T10:00:00'}})
+        summary = self.nlp.summaries.summary(self.fiat)
+        # Buy Airbox -> Fix AirBox -> Make yearly test -> Fiat Tipo
+        self.assertEqual(self.nlp.summaries.computed, 4)
+        self.assertEqual((summary['open_leaves'], summary['done_leaves']), (2, 1))
+        self.assertEqual(summary['latest_done'], '2024-05-01T10:00:00')
+
+        self.nlp.summaries.computed = 0
+        self.nlp.tools['delete'].run({'target_id': 'Fix steering', 'nlp_service': self.nlp})
+        self.assertEqual(self.nlp.summaries.summary(self.fiat)['notes'], 5)
+        self.assertEqual(self.nlp.summaries.computed, 2)
+
+    def test_summarize_command(self):
+        response = self.nlp.process_command("summarize Fiat Tipo", "en-US")
+        self.assertEqual(response['operation'], 'summarize')
+        self.assertTrue(response['response'].startswith("Fiat Tipo: 7 notes, 3 open and 0 done tasks."))
+
+    def test_summarize_words_inside_searches_are_not_commands(self):
+        lease = self.create('הסכם שכירות')
+        meeting = self.create('summary of meeting')
+        for text, language, note_id in (("הסכם שכירות", 'he-IL', lease), ("תמצא הסכם שכירות", 'he-IL', lease),
+                                        ("find summary of meeting", 'en-US', meeting)):
+            self.nlp.conversation_state = None
+            response = self.nlp.process_command(text, language)
+            self.assertNotEqual(response.get('operation'), 'summarize', text)
+            self.assertEqual([n['id'] for n in response['matches']], [note_id], text)
+        response = self.nlp.process_command("סכם את הסכם שכירות", 'he-IL')
+        self.assertEqual(response['operation'], 'summarize')
+
+    def test_relations_follow_changes_and_subgraph(self):
+        self.assertIn({'source': self.fiat, 'target': self.oil, 'type': 'child'}, self.nlp.get_relations())
+        self.nlp.add_dependency(self.nlp.get_note_by_id(self.oil), self.nlp.get_note_by_id(self.airbox))
+        self.assertIn({'source': self.airbox, 'target': self.oil, 'type': 'depends_on'}, self.nlp.get_relations())
+
+        subgraph = self.nlp.subgraph([self.test])
+        self.assertEqual([n['title'] for n in subgraph['notes']],
+                         ['Fiat Tipo', 'Make yearly test', 'Fix steering', 'Fix AirBox'])
+        self.assertEqual(len(subgraph['relations']), 3)
+        subgraph = self.nlp.subgraph([self.oil], hops=2, include=('depends_on', 'parent'))
+        self.assertEqual([n['title'] for n in subgraph['notes']], ['Fiat Tipo', 'Make yearly test', 'Fix AirBox', 'Change Oil'])
+
+        self.nlp.tools['delete'].run({'target_id': 'Make yearly test', 'nlp_service': self.nlp})
+        self.assertEqual(sorted((r['source'], r['target']) for r in self.nlp.get_relations()), [(self.fiat, self.oil)])
+
+    def find(self, title):
+        return self.nlp.find_note_by_title(title)['id']
+
+if __name__ == "__main__":
+    unittest.main()
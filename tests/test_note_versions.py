@@ -0,0 +1,103 @@
+import os
+import random
+import unittest
+
+from app.services.nlp_service import NLPService
+from app.services.note_versions import NoteVersions
+from tests.helpers import NotebookTestCase
+
+
+class TestNoteVersions(NotebookTestCase):
+    service_options = {'note_history': True}
+
+    def test_old_versions_stay_readable(self):
+        car = self.create('Car')
+        first = self.nlp.versions.head
+        oil = self.create('Oil', car)
+        self.nlp.tools['update'].run({'target_id': car, 'updates': {'title': 'Fiat'}, 'nlp_service': self.nlp})
+        self.nlp.tools['delete'].run({'target_id': 'Oil', 'nlp_service': self.nlp})
+
+        self.assertEqual([n['title'] for n in self.nlp.notes_at(first)], ['Car'])
+        self.assertEqual([n['title'] for n in self.nlp.notes_at(first + 1)], ['Car', 'Oil'])
+        self.assertEqual(self.nlp.versions.get(car, first + 1)['children'], [oil])
+        self.assertEqual(self.nlp.versions.get(car)['children'], [])
+        self.assertEqual([n['title'] for n in self.nlp.notes_at()], ['Fiat'])
+        self.assertEqual(self.nlp.notes_at(when='1999-01-01T00:00:00'), [])
+        # Reading an old version returns copies; the stored version does not change
+        self.nlp.notes_at(first)[0]['title'] = 'Bike'
+        self.assertEqual(self.nlp.versions.get(car, first)['title'], 'Car')
+
+        # The history is rebuilt from the log after a restart
+        self.nlp.flush()
+        reloaded = NLPService(api_key=None, note_history=True)
+        self.assertEqual(reloaded.versions.head, self.nlp.versions.head)
+        self.assertEqual([n['title'] for n in reloaded.notes_at(first + 1)], ['Car', 'Oil'])
+
+    def test_flush_writes_history_with_sqlite(self):
+        nlp = NLPService(api_key=None, storage_backend='sqlite', note_history=True)
+        nlp.persister.coalesce_delay = 0.5  # the writes are still queued when flush() is called
+        nlp.tools['create'].run({'title': 'Car', 'nlp_service': nlp})
+        nlp.tools['create'].run({'title': 'Oil', 'nlp_service': nlp})
+        nlp.flush()
+        on_disk = NoteVersions(nlp.versions.directory)
+        self.assertEqual(on_disk.head, nlp.versions.head)
+        self.assertEqual(sorted(n['title'] for n in on_disk.notes_at()), ['Car', 'Oil'])
+        nlp.note_store.close()
+
+    def test_versions_share_unchanged_nodes(self):
+        versions = NoteVersions(os.path.join(self.temp_dir, 'shared'))
+        versions.record([{'id': str(i), 'title': 'n%d' % i} for i in range(2000)], [])
+        versions.record([{'id': '7', 'title': 'changed'}], [])
+        old, new = versions.active.roots
+        self.assertEqual(sum(a is b for a, b in zip(old, new)), len(old) - 1)
+        self.assertEqual((versions.count_at(1), versions.count_at(2)), (2000, 2000))
+
+    def test_trie_matches_a_plain_dict(self):
+        versions = NoteVersions(os.path.join(self.temp_dir, 'random'), segment_bytes=4000, keep_segments=100)
+        rng = random.Random(7)
+        expected, snapshots = {}, []
+        for _ in range(300):
+            note_id = str(rng.randrange(400))
+            if note_id in expected and rng.random() < 0.4:
+                del expected[note_id]
+                versions.record([], [note_id])
+            else:
+                expected[note_id] = {'id': note_id, 'title': str(rng.random())}
+                versions.record([expected[note_id]], [])
+            snapshots.append(dict(expected))
+        for number in (1, 50, 150, 300):
+            notes = versions.notes_at(number)
+            self.assertEqual({n['id']: n for n in notes}, snapshots[number - 1])
+            self.assertEqual(versions.count_at(number), len(notes))
+        # The same holds after a restart, which replays only the newest segment
+        reloaded = NoteVersions(os.path.join(self.temp_dir, 'random'), segment_bytes=4000, keep_segments=100)
+        self.assertGreater(reloaded.active.numbers[0], 1)
+        for number in (1, 50, 150, 300):
+            self.assertEqual({n['id']: n for n in reloaded.notes_at(number)}, snapshots[number - 1])
+
+    def test_checkpoints_bound_the_log(self):
+        directory = os.path.join(self.temp_dir, 'bounded')
+        versions = NoteVersions(directory, segment_bytes=500, keep_segments=3)
+        for i in range(200):
+            versions.record([{'id': str(i % 5), 'title': 'title %d' % i}], [])
+        self.assertEqual(len(os.listdir(directory)), 3)
+        self.assertEqual(len(versions.segments), 3)
+        # Versions in pruned segments are gone, the retained ones are complete
+        self.assertEqual(versions.notes_at(1), [])
+        first = versions.segments[0][0]
+        self.assertEqual(versions.count_at(first), 5)
+        self.assertEqual(versions.get('4', 200)['title'], 'title 199')
+
+    def test_writes_go_through_the_persister(self):
+        written = []
+        versions = NoteVersions(os.path.join(self.temp_dir, 'queued'), write=lambda path, data: written.append(path))
+        versions.record([{'id': '1', 'title': 'a'}], [])
+        self.assertEqual(written, [versions.active.path] * 2)  # segment header, then the version
+        self.assertFalse(os.path.exists(versions.active.path))
+
+    def test_history_is_off_by_default(self):
+        self.assertIsNone(NLPService(api_key=None).versions)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+from tests.helpers import NotebookTestCase
+
+class TestPromptBuilder(NotebookTestCase):
+    service_options = {'llm_context_budget': 600}
+
+    def setUp(self):
+        super().setUp()
+        with self.nlp.batch():
+            self.create('Car')
+            self.create('Fiat Tipo', '1')
+            self.create('Change oil', '2', 'Buy 5W-30 oil ' * 20)
+            for i in range(300):
+                self.create(f'oil filter {i}', '3')
+
+    def test_context_is_bounded_and_prioritized(self):
+        self.nlp.conversation_state = {'current_note': self.nlp.get_note_by_id('3')}
+        prompt = self.nlp.prompt_builder.build(self.nlp, "SYSTEM", "which oil", "en")
+        stats = self.nlp.prompt_builder.last_stats
+        self.assertLessEqual(stats['context_chars'], 600)
+        self.assertGreater(stats['lines_cut'], 0)
+        self.assertIn('id=3 title="Change oil"', prompt)
+        self.assertIn('id=2 title="Fiat Tipo"', prompt)
+        self.assertIn('id=1 title="Car"', prompt)
+        self.assertTrue(prompt.endswith("User (en): which oil\n"))
+
+if __name__ == "__main__":
+    unittest.main()
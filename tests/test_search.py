@@ -0,0 +1,85 @@
+import unittest
+from app.services.nlp_service import NLPService
+from tests.helpers import NotebookTestCase
+
+class TestNoteSearch(NotebookTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create('רשימת קניות', description='חלב ולחם לשבת')
+        self.create('Groceries', description='Milk and bread')
+        self.create('תיקון רכב', description='להחליף שמן')
+
+    def find(self, query):
+        result = self.nlp.tools['find'].run({'query': query, 'nlp_service': self.nlp})
+        return [n['title'] for n in result['matches']]
+
+    def test_hebrew_prefixes_are_stripped(self):
+        self.assertEqual(self.find('הקניות'), ['רשימת קניות'])
+        self.assertEqual(self.find('לחם'), ['רשימת קניות'])
+        self.assertEqual(self.find('השמן'), ['תיקון רכב'])
+
+    def test_english_is_case_insensitive(self):
+        self.assertEqual(self.find('find BREAD'), ['Groceries'])
+        self.assertEqual(self.find('milk bread'), ['Groceries'])
+        self.assertEqual(self.find('milk oil'), [])
+
+    def test_title_fragments_match_as_substrings(self):
+        self.assertEqual(self.find('ocer'), ['Groceries'])
+        self.assertEqual(self.find('קנ'), ['רשימת קניות'])
+        self.assertEqual(self.find('ת קני'), ['רשימת קניות'])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.nlp.tools['update'].run({'target_id': 'Groceries', 'updates': {'title': 'Shopping'}, 'nlp_service': self.nlp})
+        self.assertEqual(self.find('groceries'), [])
+        self.assertEqual(self.find('shopping'), ['Shopping'])
+        self.nlp.tools['delete'].run({'target_id': 'Shopping', 'nlp_service': self.nlp})
+        self.assertEqual(self.find('milk'), [])
+
+    def test_ranked_mode_picks_dominant_match(self):
+        self.nlp.search_mode = 'ranked'
+        self.create('Bread recipes', description='sourdough')
+        self.create('Car trip', description='bring bread')
+        self.assertEqual(self.find('bread recipes'), ['Bread recipes'])
+        self.assertEqual(self.find('bread'), ['Bread recipes', 'Groceries', 'Car trip'])
+
+    def test_cache_hits_until_notebook_changes(self):
+        self.assertEqual(self.find('find milk'), ['Groceries'])
+        self.assertEqual(self.find('find  milk'), ['Groceries'])
+        self.assertEqual(self.nlp.search_cache.hits, 1)
+        self.create('Milk shake')
+        self.assertEqual(self.find('find milk'), ['Groceries', 'Milk shake'])
+        self.assertEqual(self.nlp.search_cache.stats()['misses'], 2)
+
+    def test_tag_queries_use_set_algebra(self):
+        self.nlp.process_command("find groceries", "en-US")
+        response = self.nlp.process_command("add tag urgent and weekly", "en-US")
+        self.assertEqual(response['response'], "Tagged 'Groceries' with urgent, weekly")
+        self.nlp.process_command("add tag maintenance to note תיקון רכב", "en-US")
+        self.nlp.process_command("הוסף תגית דחוף לרשומה תיקון רכב", "he-IL")
+        self.nlp.add_tags(self.nlp.find_note_by_title('תיקון רכב'), ['Urgent'])
+
+        self.assertEqual(self.find('show urgent maintenance notes'), ['תיקון רכב'])
+        self.assertEqual(self.find('urgent'), ['Groceries', 'תיקון רכב'])
+        self.assertEqual(self.find('urgent and not maintenance'), ['Groceries'])
+        self.assertEqual(self.find('weekly or maintenance'), ['Groceries', 'תיקון רכב'])
+        self.assertEqual(self.find('not urgent'), ['רשימת קניות'])
+        self.assertEqual(self.find('הראה רשומות עם תגית דחוף'), ['תיקון רכב'])
+        # Words that are not tags are a normal search
+        self.assertEqual(self.find('urgent bread'), [])
+        self.assertEqual(self.find('milk'), ['Groceries'])
+
+        self.nlp.update_note(self.nlp.find_note_by_title('Groceries'), {'tags': ['weekly']})
+        self.assertEqual(self.find('urgent'), ['תיקון רכב'])
+
+    def test_semantic_mode_matches_word_forms(self):
+        self.create('Car yearly inspection', description='test at the garage')
+        self.nlp.flush()
+        nlp = NLPService(api_key=None, search_mode='semantic')
+        result = nlp.tools['find'].run({'query': 'where did I write about the car inspections', 'nlp_service': nlp})
+        self.assertEqual([n['title'] for n in result['matches']], ['Car yearly inspection'])
+        nlp.tools['delete'].run({'target_id': 'Car yearly inspection', 'nlp_service': nlp})
+        self.assertEqual(len(nlp.vector_index), 3)
+        nlp.flush()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+from app.services.undo_history import UndoHistory
+from tests.helpers import NotebookTestCase
+
+
+class TestUndoRedo(NotebookTestCase):
+    def titles(self):
+        return sorted(note['title'] for note in self.nlp.notes)
+
+    def test_undo_and_redo_create_and_update(self):
+        milk = self.create('Milk')
+        self.nlp.tools['update'].run({'target_id': milk, 'updates': {'description': '2 liters'}, 'nlp_service': self.nlp})
+        self.assertEqual(self.nlp.undo()[0]['op'], 'update')
+        self.assertEqual(self.nlp.get_note_by_id(milk).get('description', ''), '')
+        self.nlp.undo()
+        self.assertIsNone(self.nlp.get_note_by_id(milk))
+        self.assertIsNone(self.nlp.undo())
+
+        self.nlp.redo()
+        self.nlp.redo()
+        self.assertEqual(self.nlp.get_note_by_id(milk)['description'], '2 liters')
+        self.assertIsNone(self.nlp.redo())
+        # A new change drops the redo steps
+        self.nlp.undo()
+        self.create('Bread')
+        self.assertIsNone(self.nlp.redo())
+
+    def test_undo_subtree_delete_restores_order(self):
+        car = self.create('Car')
+        oil = self.create('Oil', car)
+        tires = self.create('Tires', car)
+        self.create('Filter', oil)
+        self.nlp.delete_subtree(self.nlp.get_note_by_id(car))
+        self.assertEqual(self.titles(), [])
+
+        self.nlp.undo()
+        self.assertEqual(self.titles(), ['Car', 'Filter', 'Oil', 'Tires'])
+        self.assertEqual(self.nlp.get_note_by_id(car)['children'], [oil, tires])
+        self.assertEqual(self.nlp.find_note_by_title('Filter')['parent_id'], oil)
+        self.assertEqual(self.nlp.tools['find'].run({'query': 'Filter', 'nlp_service': self.nlp})['matches'][0]['id'],
+                         self.nlp.find_note_by_title('Filter')['id'])
+
+        # A deleted child goes back to its old place among its siblings
+        self.nlp.delete_subtree(self.nlp.get_note_by_id(oil))
+        self.nlp.undo()
+        self.assertEqual(self.nlp.get_note_by_id(car)['children'], [oil, tires])
+
+    def test_undo_command(self):
+        self.create('Milk')
+        response = self.nlp.process_command("undo", "en-US")
+        self.assertEqual(response['response'], "Removed the new note 'Milk'")
+        self.assertEqual(self.titles(), [])
+        response = self.nlp.process_command("redo", "en-US")
+        self.assertEqual(response['response'], "Created again 'Milk'")
+        response = self.nlp.process_command("בטל פעולה אחרונה", "he-IL")
+        self.assertEqual(response['response'], "בוטלה יצירת 'Milk'")
+        response = self.nlp.process_command("בטל פעולה אחרונה", "he-IL")
+        self.assertEqual(response['response'], "אין פעולה לביטול.")
+
+    def test_undo_words_inside_searches_are_not_commands(self):
+        self.create('redo list')
+        self.create('Milk')
+        self.assertNotEqual(self.nlp.process_command("find the redo list", "en-US").get('operation'), 'redo')
+        response = self.nlp.process_command("find redo list", "en-US")
+        self.assertEqual([n['title'] for n in response['matches']], ['redo list'])
+        self.nlp.conversation_state = None
+        self.assertEqual(self.nlp.process_command("redo list", "en-US")['matches'][0]['title'], 'redo list')
+        self.assertEqual(self.titles(), ['Milk', 'redo list'])
+        self.nlp.conversation_state = None
+        self.assertEqual(self.nlp.process_command("please undo", "en-US")['operation'], 'undo')
+
+    def test_budget_drops_oldest_steps(self):
+        history = UndoHistory(budget_bytes=300)
+        for i in range(10):
+            history.record_add({'id': str(i), 'title': 'note %d' % i, 'children': []})
+            history.seal()
+        self.assertLessEqual(history.size, 300)
+        self.assertLess(len(history.undo_steps), 10)
+        self.assertEqual(history.pop_undo()[0]['note']['id'], '9')
+
+
+if __name__ == "__main__":
+    unittest.main()